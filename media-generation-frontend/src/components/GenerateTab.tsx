@@ -14,7 +14,8 @@ import {
   Palette,
   Zap,
   CheckCircle,
-  AlertCircle
+  AlertCircle,
+  XCircle
 } from 'lucide-react';
 import { apiClient } from '@/lib/api';
 import { jobPollingService } from '@/lib/polling';
@@ -88,6 +89,17 @@ export function GenerateTab({ onJobCreated }: GenerateTabProps) {
     }
   };
 
+  const handleCancel = async () => {
+    if (!currentJob) return;
+
+    try {
+      // The status stream reports the cancellation and ends the generation
+      setCurrentJob(await apiClient.cancelJob(currentJob.id));
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'Failed to cancel generation');
+    }
+  };
+
   const handleGenerateNew = () => {
     setPrompt('');
     setCurrentJob(null);
@@ -119,6 +131,8 @@ export function GenerateTab({ onJobCreated }: GenerateTabProps) {
         return 'Image generated successfully!';
       case 'failed':
         return `Generation failed: ${currentJob.error_message}`;
+      case 'cancelled':
+        return 'Generation cancelled';
       default:
         return '';
     }
@@ -136,6 +150,8 @@ export function GenerateTab({ onJobCreated }: GenerateTabProps) {
         return <CheckCircle className="w-4 h-4 text-green-500" />;
       case 'failed':
         return <AlertCircle className="w-4 h-4 text-red-500" />;
+      case 'cancelled':
+        return <XCircle className="w-4 h-4 text-gray-500" />;
       default:
         return null;
     }
@@ -254,6 +270,18 @@ export function GenerateTab({ onJobCreated }: GenerateTabProps) {
                 )}
               </Button>
               
+              {isLoading && currentJob && (currentJob.status === 'pending' || currentJob.status === 'processing') && (
+                <Button 
+                  type="button" 
+                  variant="outline"
+                  onClick={handleCancel}
+                  className="h-12 px-6 border-2 border-primary/20 hover:border-primary/50 hover:bg-primary/5 transition-all duration-300"
+                >
+                  <XCircle className="w-5 h-5 mr-2" />
+                  Cancel
+                </Button>
+              )}
+              
               {(generatedImage || currentJob) && (
                 <Button 
                   type="button" 
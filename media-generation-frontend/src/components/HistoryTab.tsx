@@ -16,14 +16,14 @@ import {
   Sparkles
 } from 'lucide-react';
 import { apiClient } from '@/lib/api';
-import type { JobStatusResponse } from '@/types/api';
+import type { JobSummary } from '@/types/api';
 
 interface HistoryTabProps {
   refreshTrigger?: number;
 }
 
 export function HistoryTab({ refreshTrigger }: HistoryTabProps) {
-  const [jobs, setJobs] = useState<JobStatusResponse[]>([]);
+  const [jobs, setJobs] = useState<JobSummary[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
@@ -62,6 +62,8 @@ export function HistoryTab({ refreshTrigger }: HistoryTabProps) {
         return <CheckCircle className="w-5 h-5 text-green-500" />;
       case 'failed':
         return <XCircle className="w-5 h-5 text-red-500" />;
+      case 'cancelled':
+        return <XCircle className="w-5 h-5 text-gray-500" />;
       case 'processing':
         return <Loader2 className="w-5 h-5 text-blue-500 animate-spin" />;
       default:
@@ -75,6 +77,8 @@ export function HistoryTab({ refreshTrigger }: HistoryTabProps) {
         return 'Completed';
       case 'failed':
         return 'Failed';
+      case 'cancelled':
+        return 'Cancelled';
       case 'processing':
         return 'Processing';
       default:
@@ -88,6 +92,8 @@ export function HistoryTab({ refreshTrigger }: HistoryTabProps) {
         return 'text-green-600 dark:text-green-400';
       case 'failed':
         return 'text-red-600 dark:text-red-400';
+      case 'cancelled':
+        return 'text-gray-600 dark:text-gray-400';
       case 'processing':
         return 'text-blue-600 dark:text-blue-400';
       default:
@@ -280,8 +286,9 @@ export function HistoryTab({ refreshTrigger }: HistoryTabProps) {
                       <div className="relative group">
                         <div className="aspect-square relative overflow-hidden rounded-xl bg-muted">
                           <img
-                            src={apiClient.getImageUrl(job.media_path)}
+                            src={apiClient.getThumbnailUrl(job.media_path)}
                             alt={job.prompt}
+                            loading="lazy"
                             className="w-full h-full object-cover transition-transform duration-300 group-hover:scale-110"
                             onError={(e) => {
                               const target = e.target as HTMLImageElement;
@@ -336,7 +343,7 @@ export function HistoryTab({ refreshTrigger }: HistoryTabProps) {
                           <Button
                             variant="outline"
                             size="sm"
-                            onClick={() => handleImageDownload(job.media_path!, job.prompt)}
+                            onClick={() => handleImageDownload(job.media_path!, job.prompt ?? '')}
                             className="flex-1 h-9 border-2 border-primary/20 hover:border-primary/50 hover:bg-primary/5 transition-all duration-300"
                           >
                             <Download className="w-4 h-4 mr-1" />
@@ -1,4 +1,4 @@
-import type { GenerateRequest, JobResponse, JobStatusResponse, ApiError } from '@/types/api';
+import type { GenerateRequest, JobResponse, JobStatusResponse, JobSummary, ApiError } from '@/types/api';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000/api/v1';
 
@@ -42,12 +42,22 @@ class ApiClient {
     return this.request<JobStatusResponse>(`/status/${jobId}`);
   }
 
-  async getRecentJobs(skip = 0, limit = 20): Promise<JobStatusResponse[]> {
-    return this.request<JobStatusResponse[]>(`/jobs?skip=${skip}&limit=${limit}`);
+  async cancelJob(jobId: string): Promise<JobStatusResponse> {
+    return this.request<JobStatusResponse>(`/jobs/${jobId}/cancel`, {
+      method: 'POST',
+    });
+  }
+
+  getJobEventsUrl(jobIds: string[]): string {
+    return `${API_BASE_URL}/events/jobs?job_ids=${jobIds.map(encodeURIComponent).join(',')}`;
+  }
+
+  async getRecentJobs(skip = 0, limit = 20, fields = 'prompt'): Promise<JobSummary[]> {
+    return this.request<JobSummary[]>(`/jobs?skip=${skip}&limit=${limit}&fields=${fields}`);
   }
 
-  async getCompletedJobs(skip = 0, limit = 20): Promise<JobStatusResponse[]> {
-    return this.request<JobStatusResponse[]>(`/jobs/completed?skip=${skip}&limit=${limit}`);
+  async getCompletedJobs(skip = 0, limit = 20, fields = 'prompt'): Promise<JobSummary[]> {
+    return this.request<JobSummary[]>(`/jobs/completed?skip=${skip}&limit=${limit}&fields=${fields}`);
   }
 
   getImageUrl(mediaPath: string): string {
@@ -65,6 +75,14 @@ class ApiClient {
     const filename = mediaPath.split('/').pop();
     return `${API_BASE_URL}/images/${filename}`;
   }
+
+  getThumbnailUrl(mediaPath: string, width = 512, format = 'webp'): string {
+    // CDN results can't be resized by the API
+    if (mediaPath.startsWith('http://') || mediaPath.startsWith('https://')) {
+      return mediaPath;
+    }
+    return `${this.getImageUrl(mediaPath)}?w=${width}&fmt=${format}`;
+  }
 }
 
 export const apiClient = new ApiClient(); 
\ No newline at end of file
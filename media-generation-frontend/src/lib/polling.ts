@@ -6,7 +6,8 @@ type JobCompleteCallback = (job: JobStatusResponse) => void;
 
 interface PollingJob {
   jobId: string;
-  intervalId: number;
+  intervalId?: number;
+  eventSource?: EventSource;
   onStatusUpdate?: JobStatusCallback;
   onComplete?: JobCompleteCallback;
 }
@@ -16,7 +17,8 @@ class JobPollingService {
   private pollInterval = 3000; // 3 seconds
 
   /**
-   * Start polling for a job's status
+   * Start following a job's status.
+   * Uses the server-sent event stream when available and falls back to polling.
    */
   startPolling(
     jobId: string, 
@@ -28,6 +30,66 @@ class JobPollingService {
       return;
     }
 
+    if (typeof EventSource !== 'undefined') {
+      this.startStreaming(jobId, onStatusUpdate, onComplete);
+    } else {
+      this.startIntervalPolling(jobId, onStatusUpdate, onComplete);
+    }
+  }
+
+  /**
+   * Follow a job over the /events/jobs stream; falls back to polling if the stream fails
+   */
+  private startStreaming(
+    jobId: string,
+    onStatusUpdate?: JobStatusCallback,
+    onComplete?: JobCompleteCallback
+  ): void {
+    const eventSource = new EventSource(apiClient.getJobEventsUrl([jobId]));
+
+    eventSource.addEventListener('status', (event) => {
+      const job: JobStatusResponse = JSON.parse((event as MessageEvent).data);
+
+      if (onStatusUpdate) {
+        onStatusUpdate(job);
+      }
+
+      if (job.status === 'completed' || job.status === 'failed' || job.status === 'cancelled') {
+        this.stopPolling(jobId);
+
+        if (onComplete) {
+          onComplete(job);
+        }
+      }
+    });
+
+    eventSource.onerror = () => {
+      // Stream unavailable or dropped: switch to plain polling
+      if (this.activePolls.get(jobId)?.eventSource === eventSource) {
+        console.warn(`Event stream for job ${jobId} failed, falling back to polling`);
+        this.stopPolling(jobId);
+        this.startIntervalPolling(jobId, onStatusUpdate, onComplete);
+      }
+    };
+
+    this.activePolls.set(jobId, {
+      jobId,
+      eventSource,
+      onStatusUpdate,
+      onComplete
+    });
+
+    console.log(`Started streaming for job ${jobId}`);
+  }
+
+  /**
+   * Poll a job's status on a fixed interval
+   */
+  private startIntervalPolling(
+    jobId: string,
+    onStatusUpdate?: JobStatusCallback,
+    onComplete?: JobCompleteCallback
+  ): void {
     const intervalId = window.setInterval(async () => {
       try {
         const job = await apiClient.getJobStatus(jobId);
@@ -38,7 +100,7 @@ class JobPollingService {
         }
 
         // Check if job is complete
-        if (job.status === 'completed' || job.status === 'failed') {
+        if (job.status === 'completed' || job.status === 'failed' || job.status === 'cancelled') {
           this.stopPolling(jobId);
           
           // Call completion callback
@@ -69,7 +131,10 @@ class JobPollingService {
   stopPolling(jobId: string): void {
     const pollingJob = this.activePolls.get(jobId);
     if (pollingJob) {
-      clearInterval(pollingJob.intervalId);
+      if (pollingJob.intervalId !== undefined) {
+        clearInterval(pollingJob.intervalId);
+      }
+      pollingJob.eventSource?.close();
       this.activePolls.delete(jobId);
       console.log(`Stopped polling for job ${jobId}`);
     }
@@ -2,12 +2,14 @@ export interface GenerateRequest {
   prompt: string;
   model: string;
   parameters?: Record<string, any>;
+  dedupe?: boolean;
 }
 
 export interface JobResponse {
   job_id: string;
   status: string;
   message: string;
+  media_path?: string | null;
 }
 
 export interface JobStatusResponse {
@@ -15,13 +17,21 @@ export interface JobStatusResponse {
   prompt: string;
   model: string;
   parameters: Record<string, any>;
-  status: 'pending' | 'processing' | 'completed' | 'failed';
+  status: 'pending' | 'processing' | 'completed' | 'failed' | 'cancelled';
   created_at: string;
   updated_at: string;
   media_path?: string;
+  mime_type?: string;
+  byte_size?: number;
   error_message?: string;
 }
 
+// Job list entries (/jobs, /jobs/completed); prompt and parameters only when requested via ?fields=
+export type JobSummary = Omit<JobStatusResponse, 'prompt' | 'parameters'> & {
+  prompt?: string;
+  parameters?: Record<string, any>;
+};
+
 export interface ApiError {
   detail: string;
 } 
\ No newline at end of file
@@ -1,43 +1,143 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_async_db
-from app.models.schemas import GenerateRequest, JobResponse, JobStatusResponse, JobCreate
-from app.services.job_service import AsyncJobService
-from app.tasks.celery_tasks import process_media_generation
-from typing import List
+from app.core import tracing
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, get_async_db
+from app.models.schemas import (
+    BatchGenerateRequest,
+    BatchResponse,
+    BatchStatusResponse,
+    CancelJobsRequest,
+    CancelJobsResponse,
+    DedupStatsResponse,
+    GenerateRequest,
+    JobCreate,
+    JobResponse,
+    JobStatus,
+    JobStatusResponse,
+    JobSummaryResponse,
+    LatencyStatsResponse,
+    MaintenanceRunRequest,
+    MaintenanceRunResponse,
+    QueueStatsResponse,
+)
+from app.services.job_service import AsyncJobService, CANCELLABLE_STATUSES, JOB_LIST_OPTIONAL_COLUMNS
+from app.services import cancellation, dedup, image_variants, maintenance, rate_limit, scheduler, status_cache
+from app.services.artifacts import mime_type_for
+from app.services.file_responses import immutable_file_response, redirect_response
+from app.services.storage import generated_dir, generated_key, get_storage, variant_key
+from app.services.job_events import iter_job_events, job_event_broker
+from app.services.media_client import (
+    TERMINAL_PREDICTION_STATUSES,
+    parse_prediction_payload,
+    verify_webhook_signature,
+)
+from app.tasks.celery_tasks import cancel_predictions, finalize_prediction, run_maintenance
+from typing import Dict, List, Optional, Tuple, Union
+import asyncio
 import logging
+import orjson
 import os
-from pathlib import Path
+import uuid
+from datetime import datetime, timedelta, timezone
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+async def _check_admission(new_jobs: int) -> None:
+    """Reject new work with 429 while the backlog to Replicate is saturated."""
+    retry_after = await rate_limit.check_admission(new_jobs)
+    if retry_after is not None:
+        logger.warning(f"Rejecting {new_jobs} new jobs: queue saturated, retry after {retry_after}s")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={
+                "message": "Generation queue is saturated, please retry later",
+                "retry_after": retry_after,
+            },
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+def _tenant_for(http_request: Request) -> str:
+    """Tenant a request is scheduled as: the tenant header, else the client address."""
+    tenant = http_request.headers.get(settings.tenant_header)
+    if not tenant and http_request.client:
+        tenant = http_request.client.host
+    return scheduler.normalize_tenant(tenant)
+
+
 @router.post("/generate", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
 async def generate_media(
     request: GenerateRequest,
+    http_request: Request,
     db: AsyncSession = Depends(get_async_db)
 ):
-    """Submit a new image generation job."""
+    """Submit a new image generation job.
+
+    With ``dedupe`` set, an identical completed or in-flight job is returned
+    instead of starting a new prediction (with its ``media_path`` once completed).
+    """
     try:
-        # Create job in database
-        job_data = JobCreate(**request.model_dump())
-        job = await AsyncJobService.create_job(db, job_data)
-        
-        # Enqueue background task
-        process_media_generation.delay(
-            job_id=job.id,
-            model=job.model,
-            input_data={"prompt": job.prompt, **job.parameters}
+        job_data = JobCreate(
+            **request.model_dump(),
+            request_hash=dedup.request_hash(request.model, request.prompt, request.parameters),
+            tenant_id=_tenant_for(http_request)
         )
+        job_id = str(uuid.uuid4())
+        claimed = False
         
-        logger.info(f"Enqueued job {job.id} for processing")
+        if request.dedupe:
+            existing = (await AsyncJobService.find_reusable_jobs(db, [job_data.request_hash])).get(job_data.request_hash)
+            if existing is None:
+                # Single-flight: an identical request may be between claim and commit
+                owner_id = await dedup.claim(job_data.request_hash, job_id)
+                if owner_id and owner_id != job_id:
+                    existing = await AsyncJobService.get_job(db, owner_id)
+                    if existing is None:
+                        # The owner has not committed yet; its job will exist shortly
+                        await dedup.record(hits=1)
+                        logger.info(f"Deduplicated request onto uncommitted job {owner_id}")
+                        return JobResponse(
+                            job_id=owner_id,
+                            status=JobStatus.PENDING.value,
+                            message="Identical request in progress; reusing its job"
+                        )
+                else:
+                    claimed = True
+            if existing is not None:
+                await dedup.record(hits=1)
+                logger.info(f"Deduplicated request onto job {existing.id} ({existing.status})")
+                return JobResponse(
+                    job_id=existing.id,
+                    status=existing.status,
+                    message="Identical request found; reusing existing job",
+                    media_path=existing.media_path
+                )
+            await dedup.record(misses=1)
+        
+        try:
+            await _check_admission(1)
+            
+            # Create the job and its outbox entry in one commit; the outbox relay enqueues it
+            with tracing.span("create_job", job_id=job_id, model=job_data.model):
+                job = await AsyncJobService.create_job(db, job_data, job_id=job_id)
+        except Exception:
+            # Don't leave identical requests pointing at a job that will never exist
+            if claimed:
+                await dedup.release(job_data.request_hash, job_id)
+            raise
+        
+        logger.info(f"Accepted job {job.id} for processing")
         return JobResponse(
             job_id=job.id,
             status=job.status,
             message="Job accepted for processing"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to create job: {e}", exc_info=True)
         raise HTTPException(
@@ -46,53 +146,488 @@ async def generate_media(
         )
 
 
-@router.get("/status/{job_id}", response_model=JobStatusResponse, tags=["Jobs"])
+@router.post("/generate/batch", response_model=BatchResponse, status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def generate_media_batch(
+    request: BatchGenerateRequest,
+    http_request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Submit many image generation jobs at once.
+
+    All jobs are inserted with one statement and committed together with
+    their outbox entries; the outbox relay enqueues them in batches.
+    Track them together with GET /batches/{batch_id}. Items with ``dedupe``
+    set may point at existing jobs, which are not counted in the batch.
+    """
+    try:
+        batch_id = str(uuid.uuid4())
+        tenant_id = _tenant_for(http_request)
+        jobs_data = [
+            JobCreate(
+                **item.model_dump(),
+                request_hash=dedup.request_hash(item.model, item.prompt, item.parameters),
+                tenant_id=tenant_id
+            )
+            for item in request.requests
+        ]
+        
+        # Deduplicated items reuse an existing job or the first identical item in this
+        # batch. Each slot holds either a reused job ID or an index into to_create.
+        reused = await AsyncJobService.find_reusable_jobs(
+            db, [job_data.request_hash for job_data, item in zip(jobs_data, request.requests) if item.dedupe]
+        )
+        slots: List[Union[str, int]] = []
+        to_create: List[JobCreate] = []
+        created_by_hash: Dict[str, int] = {}
+        hits = misses = 0
+        for job_data, item in zip(jobs_data, request.requests):
+            if item.dedupe and job_data.request_hash in reused:
+                slots.append(reused[job_data.request_hash].id)
+                hits += 1
+            elif item.dedupe and job_data.request_hash in created_by_hash:
+                slots.append(created_by_hash[job_data.request_hash])
+                hits += 1
+            else:
+                if item.dedupe:
+                    created_by_hash[job_data.request_hash] = len(to_create)
+                    misses += 1
+                slots.append(len(to_create))
+                to_create.append(job_data)
+        
+        if to_create:
+            await _check_admission(len(to_create))
+        with tracing.span("create_jobs", **{"batch.id": batch_id, "batch.size": len(to_create)}):
+            jobs = await AsyncJobService.create_jobs(db, to_create, batch_id) if to_create else []
+        job_ids = [slot if isinstance(slot, str) else jobs[slot].id for slot in slots]
+        if hits or misses:
+            await dedup.record(hits=hits, misses=misses)
+        
+        logger.info(f"Accepted batch {batch_id} with {len(jobs)} jobs for processing")
+        return BatchResponse(
+            batch_id=batch_id,
+            job_ids=job_ids,
+            status=JobStatus.PENDING.value,
+            message=f"{len(jobs)} jobs accepted for processing"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to create batch: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred while creating the batch."
+        )
+
+
+@router.get("/batches/{batch_id}", response_model=BatchStatusResponse, tags=["Jobs"])
+async def get_batch_status(
+    batch_id: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get aggregate status counts for a batch.
+
+    The batch is done once every job is finished for good; a failed job still
+    awaiting a retry keeps it open.
+    """
+    counts, finished = await AsyncJobService.get_batch_counts(db, batch_id)
+    if not counts:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Batch not found"
+        )
+    
+    total = sum(counts.values())
+    return BatchStatusResponse(
+        batch_id=batch_id,
+        total=total,
+        counts=counts,
+        done=finished == total
+    )
+
+
+@router.get(
+    "/status/{job_id}",
+    response_model=JobStatusResponse,
+    responses={304: {"description": "Status unchanged since the given ETag"}},
+    tags=["Jobs"]
+)
 async def get_job_status(
     job_id: str,
+    request: Request,
     db: AsyncSession = Depends(get_async_db)
 ):
-    """Get the status and result of a specific job."""
-    job = await AsyncJobService.get_job(db, job_id)
-    if not job:
+    """Get the status and result of a specific job.
+
+    Served from the Redis status cache when possible, falling back to the
+    database on a miss. Supports ``If-None-Match`` so unchanged polls get 304.
+    """
+    payload = await status_cache.async_get_job_status(job_id)
+    if payload is None:
+        job = await AsyncJobService.get_job(db, job_id)
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found"
+            )
+        payload = status_cache.serialize_job(job)
+        await status_cache.async_cache_job_status(job, payload)
+    
+    etag = status_cache.make_etag(payload)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if status_cache.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+
+def _parse_job_ids(job_ids: str) -> List[str]:
+    """Split and validate a comma-separated job_ids query parameter."""
+    ids = list(dict.fromkeys(job_id.strip() for job_id in job_ids.split(",") if job_id.strip()))
+    if not ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="job_ids must contain at least one job ID"
+        )
+    if len(ids) > settings.job_events_max_jobs:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot follow more than {settings.job_events_max_jobs} jobs per connection"
+        )
+    return ids
+
+
+async def _load_job_snapshot(db: AsyncSession, job_ids: List[str]) -> Dict[str, bytes]:
+    """Current status payload per existing job, from the cache with a DB fallback."""
+    snapshot = await status_cache.async_get_job_statuses(job_ids)
+    missing = [job_id for job_id in job_ids if job_id not in snapshot]
+    for job in await AsyncJobService.get_jobs(db, missing):
+        snapshot[job.id] = status_cache.serialize_job(job)
+    return snapshot
+
+
+@router.get("/events/jobs", tags=["Jobs"])
+async def stream_job_events(
+    request: Request,
+    job_ids: str = Query(..., description="Comma-separated job IDs to follow"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Stream status transitions for one or more jobs as Server-Sent Events.
+
+    Sends each job's current status first, then every transition as it is
+    written by the worker. The stream ends once every job is completed,
+    cancelled, or failed with no retries left.
+    """
+    ids = _parse_job_ids(job_ids)
+    
+    # Subscribe before taking the snapshot so no transition falls in between
+    queue = await job_event_broker.subscribe(ids)
+    try:
+        snapshot = await _load_job_snapshot(db, ids)
+    except Exception:
+        await job_event_broker.unsubscribe(ids, queue)
+        raise
+    if not snapshot:
+        await job_event_broker.unsubscribe(ids, queue)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Job not found"
         )
-    return JobStatusResponse.model_validate(job)
+    
+    async def event_source():
+        try:
+            async for payload in iter_job_events(
+                list(snapshot), queue, snapshot, settings.job_events_heartbeat
+            ):
+                if await request.is_disconnected():
+                    break
+                if payload is None:
+                    yield b": keepalive\n\n"
+                else:
+                    yield b"event: status\ndata: " + payload + b"\n\n"
+            else:
+                yield b"event: end\ndata: {}\n\n"
+        finally:
+            await job_event_broker.unsubscribe(ids, queue)
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
-@router.get("/jobs", response_model=List[JobStatusResponse], tags=["Jobs"])
-async def get_recent_jobs(
-    skip: int = 0,
-    limit: int = 20,
+@router.websocket("/ws/jobs")
+async def job_events_websocket(websocket: WebSocket, job_ids: str):
+    """WebSocket variant of /events/jobs: one JSON status message per transition."""
+    try:
+        ids = _parse_job_ids(job_ids)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    
+    await websocket.accept()
+    queue = await job_event_broker.subscribe(ids)
+    try:
+        async with AsyncSessionLocal() as db:
+            snapshot = await _load_job_snapshot(db, ids)
+        
+        async for payload in iter_job_events(
+            list(snapshot), queue, snapshot, settings.job_events_heartbeat
+        ):
+            if payload is not None:
+                await websocket.send_text(payload.decode())
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await job_event_broker.unsubscribe(ids, queue)
+
+
+@router.get("/stats/dedup", response_model=DedupStatsResponse, tags=["Stats"])
+async def get_dedup_stats():
+    """Hit rate of request deduplication."""
+    return DedupStatsResponse(**await dedup.get_stats())
+
+
+@router.get("/stats/queues", response_model=QueueStatsResponse, tags=["Stats"])
+async def get_queue_stats():
+    """Depth and oldest-job age of each (model, tenant) scheduler lane, plus in-flight jobs per tenant."""
+    return QueueStatsResponse(**await scheduler.get_lane_stats())
+
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+MAX_LATENCY_BUCKETS = 500
+
+
+def _parse_duration(value: str, name: str) -> int:
+    """Parse a duration like ``90s``, ``15m``, ``24h`` or ``7d`` into seconds."""
+    try:
+        seconds = int(value[:-1]) * DURATION_UNITS[value[-1]]
+    except (KeyError, ValueError, IndexError):
+        seconds = 0
+    if seconds <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid {name} '{value}', expected e.g. 15m, 24h or 7d"
+        )
+    return seconds
+
+
+@router.get("/stats", response_model=LatencyStatsResponse, tags=["Stats"])
+async def get_latency_stats(
+    window: str = Query("24h", description="How far back to look, e.g. 1h, 24h, 7d"),
+    bucket: Optional[str] = Query(None, description="Also split the window into buckets of this size, e.g. 1h"),
+    model: Optional[str] = Query(None, description="Only this model"),
     db: AsyncSession = Depends(get_async_db)
 ):
-    """Get a list of recent jobs (all statuses)."""
+    """Latency percentiles per model and stage for jobs completed in the window.
+
+    Stages (seconds): scheduler_wait (created → enqueued), queue_wait
+    (enqueued → started, first attempts), submit (started → prediction
+    created), prediction (created → finished), store (finished → stored)
+    and total (created → stored).
+    """
+    window_seconds = _parse_duration(window, "window")
+    bucket_seconds = _parse_duration(bucket, "bucket") if bucket else None
+    if bucket_seconds and window_seconds / bucket_seconds > MAX_LATENCY_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many buckets, use at most {MAX_LATENCY_BUCKETS} per window"
+        )
+
+    since = datetime.now(timezone.utc) - timedelta(seconds=window_seconds)
+    rows = await AsyncJobService.get_latency_stats(db, since, bucket_seconds, model)
+    return LatencyStatsResponse(window_seconds=window_seconds, bucket_seconds=bucket_seconds, models=rows)
+
+
+def _parse_cursor(after: Optional[str]) -> Optional[Tuple[datetime, str]]:
+    """Parse an ``<created_at>,<id>`` keyset cursor."""
+    if after is None:
+        return None
+    try:
+        created_at, job_id = after.rsplit(",", 1)
+        # An unencoded "+" in the UTC offset arrives as a space
+        return datetime.fromisoformat(created_at.replace(" ", "+")), job_id
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor, expected '<created_at>,<id>'"
+        )
+
+
+def _parse_fields(fields: Optional[str]) -> List[str]:
+    """Parse ``?fields=prompt,parameters`` into the optional list columns to include."""
+    if not fields:
+        return []
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in JOB_LIST_OPTIONAL_COLUMNS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields {unknown}, expected any of {sorted(JOB_LIST_OPTIONAL_COLUMNS)}"
+        )
+    return list(dict.fromkeys(requested))
+
+
+def _job_list_response(keys: List[str], rows: List[tuple], limit: int) -> Response:
+    """Serialize a page of job rows straight to JSON.
+
+    The rows come from a column select, so there is nothing to validate;
+    orjson writes them in one pass. Full pages carry the next keyset cursor
+    in ``X-Next-Cursor``.
+    """
+    body = orjson.dumps([dict(zip(keys, row)) for row in rows], option=orjson.OPT_UTC_Z)
+    response = Response(content=body, media_type="application/json")
+    if rows and len(rows) == limit:
+        last = dict(zip(keys, rows[-1]))
+        if last["created_at"] is not None:
+            response.headers["X-Next-Cursor"] = f"{last['created_at'].isoformat()},{last['id']}"
+    return response
+
+
+def _validate_page(skip: int, limit: int, after: Optional[str]) -> None:
     if limit > 100:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Limit cannot exceed 100"
         )
+    if after is not None and skip:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either skip or after, not both"
+        )
+
+
+@router.get("/jobs", response_model=List[JobSummaryResponse], tags=["Jobs"])
+async def get_recent_jobs(
+    skip: int = 0,
+    limit: int = 20,
+    after: Optional[str] = Query(None, description="Keyset cursor '<created_at>,<id>' from X-Next-Cursor"),
+    fields: Optional[str] = Query(None, description="Extra fields to include: prompt, parameters"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a list of recent jobs (all statuses).
+
+    Prefer ``after`` over ``skip`` for deep pages; the next cursor is returned
+    in the ``X-Next-Cursor`` header. ``prompt`` and ``parameters`` are left out
+    unless listed in ``fields``.
+    """
+    _validate_page(skip, limit, after)
     
-    jobs = await AsyncJobService.get_recent_jobs(db, skip=skip, limit=limit)
-    return [JobStatusResponse.model_validate(job) for job in jobs]
+    keys, rows = await AsyncJobService.get_job_rows(
+        db, _parse_fields(fields), skip=skip, limit=limit, after=_parse_cursor(after)
+    )
+    return _job_list_response(keys, rows, limit)
 
 
-@router.get("/jobs/completed", response_model=List[JobStatusResponse], tags=["Jobs"])
+@router.get("/jobs/completed", response_model=List[JobSummaryResponse], tags=["Jobs"])
 async def get_completed_jobs(
     skip: int = 0,
     limit: int = 20,
+    after: Optional[str] = Query(None, description="Keyset cursor '<created_at>,<id>' from X-Next-Cursor"),
+    fields: Optional[str] = Query(None, description="Extra fields to include: prompt, parameters"),
     db: AsyncSession = Depends(get_async_db)
 ):
-    """Get a list of recent completed jobs only."""
-    if limit > 100:
+    """Get a list of recent completed jobs only (same pagination and ``fields``)."""
+    _validate_page(skip, limit, after)
+    
+    keys, rows = await AsyncJobService.get_job_rows(
+        db, _parse_fields(fields), completed_only=True, skip=skip, limit=limit, after=_parse_cursor(after)
+    )
+    return _job_list_response(keys, rows, limit)
+
+
+async def _cancel_jobs(db: AsyncSession, **filters) -> Tuple[list, int]:
+    """Cancel matching jobs and stop their work.
+
+    Jobs are cancelled ``cancel_batch_size`` at a time, each chunk in its own
+    short transaction. Queued jobs leave the scheduler lanes, workers running
+    the others are signalled, and a ``cancel_predictions`` task per chunk
+    cancels the predictions still in flight on Replicate. Returns the
+    cancelled jobs and how many predictions are being cancelled.
+    """
+    cancelled, predictions = [], 0
+    while True:
+        jobs = await AsyncJobService.cancel_jobs(db, limit=settings.cancel_batch_size, **filters)
+        if not jobs:
+            break
+        cancelled += jobs
+        job_ids = [job.id for job in jobs]
+        await cancellation.async_request(job_ids)
+        if settings.scheduler_enabled:
+            await scheduler.async_remove(job_ids)
+        prediction_ids = [
+            job.replicate_prediction_id for job in jobs
+            if job.replicate_prediction_id and not job.prediction_output_url
+        ]
+        if prediction_ids:
+            cancel_predictions.delay(prediction_ids=prediction_ids)
+            predictions += len(prediction_ids)
+        if len(jobs) < settings.cancel_batch_size:
+            break
+    return cancelled, predictions
+
+
+@router.post("/jobs/cancel", response_model=CancelJobsResponse, tags=["Jobs"])
+async def cancel_jobs(
+    request: CancelJobsRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Cancel every unfinished job matching the filters (job IDs, batch, model, tenant).
+
+    Completed, cancelled and permanently failed jobs are left alone.
+    """
+    if not (request.job_ids or request.batch_id or request.model or request.tenant_id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Limit cannot exceed 100"
+            detail="Give at least one of job_ids, batch_id, model or tenant_id"
+        )
+    if request.statuses and not set(request.statuses) <= set(CANCELLABLE_STATUSES):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="statuses may only contain pending, processing and failed"
         )
     
-    jobs = await AsyncJobService.get_completed_jobs(db, skip=skip, limit=limit)
-    return [JobStatusResponse.model_validate(job) for job in jobs]
+    jobs, predictions_cancelled = await _cancel_jobs(
+        db,
+        job_ids=request.job_ids,
+        batch_id=request.batch_id,
+        model=request.model,
+        tenant_id=scheduler.normalize_tenant(request.tenant_id) if request.tenant_id else None,
+        statuses=request.statuses
+    )
+    return CancelJobsResponse(
+        cancelled=len(jobs),
+        job_ids=[job.id for job in jobs],
+        predictions_cancelled=predictions_cancelled
+    )
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobStatusResponse, tags=["Jobs"])
+async def cancel_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Cancel a job: it won't be started or retried, a running worker stops
+    waiting on it, and its Replicate prediction is cancelled.
+
+    Cancelling a cancelled job again is a no-op; a finished job gives 409.
+    """
+    jobs, _ = await _cancel_jobs(db, job_ids=[job_id])
+    if jobs:
+        return jobs[0]
+    
+    job = await AsyncJobService.get_job(db, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    if job.status != JobStatus.CANCELLED.value:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job is already {job.status}"
+        )
+    return job
 
 
 @router.delete("/jobs/failed", tags=["Jobs"])
@@ -119,18 +654,6 @@ async def delete_jobs_with_broken_images(
     }
 
 
-@router.delete("/jobs/missing-images", tags=["Jobs"])
-async def delete_jobs_with_missing_images(
-    db: AsyncSession = Depends(get_async_db)
-):
-    """Delete completed jobs where the image file doesn't exist on disk."""
-    deleted_count = await AsyncJobService.delete_jobs_with_missing_images(db)
-    return {
-        "message": f"Successfully deleted {deleted_count} jobs with missing image files",
-        "deleted_count": deleted_count
-    }
-
-
 @router.delete("/jobs/broken-local-paths", tags=["Jobs"])
 async def delete_jobs_with_broken_local_paths(
     db: AsyncSession = Depends(get_async_db)
@@ -145,10 +668,12 @@ async def delete_jobs_with_broken_local_paths(
         delete(Job).where(
             (Job.status == JobStatus.COMPLETED.value) &
             (Job.media_path.like('/images/%'))
-        )
+        ).returning(Job.id)
     )
+    deleted_ids = list(result.scalars().all())
     await db.commit()
-    deleted_count = result.rowcount or 0
+    await status_cache.async_invalidate(deleted_ids)
+    deleted_count = len(deleted_ids)
     
     return {
         "message": f"Successfully deleted {deleted_count} jobs with broken local image paths",
@@ -156,34 +681,151 @@ async def delete_jobs_with_broken_local_paths(
     }
 
 
-@router.post("/jobs/fix-paths", tags=["Jobs"])
-async def fix_incorrect_image_paths(
-    db: AsyncSession = Depends(get_async_db)
+@router.post(
+    "/maintenance/runs",
+    response_model=MaintenanceRunResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Maintenance"]
+)
+async def start_maintenance_run(request: MaintenanceRunRequest):
+    """Queue a maintenance run on a worker: ``fix_paths`` (legacy media paths),
+    ``missing_artifacts`` (delete jobs whose artifact is gone) and
+    ``orphaned_files`` (reclaim artifacts no job references).
+
+    With ``dry_run`` nothing is changed and the report says what would be.
+    Follow progress on GET /maintenance/runs/{run_id}.
+    """
+    try:
+        operations = maintenance.parse_operations(request.operations)
+    except maintenance.MaintenanceError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    run_id = str(uuid.uuid4())
+    report = await maintenance.record_queued(run_id, operations, request.dry_run)
+    run_maintenance.apply_async(kwargs={"operations": operations, "dry_run": request.dry_run}, task_id=run_id)
+    logger.info(f"Queued maintenance run {run_id}: {operations} (dry_run={request.dry_run})")
+    return MaintenanceRunResponse(**report)
+
+
+@router.get("/maintenance/runs/latest", response_model=MaintenanceRunResponse, tags=["Maintenance"])
+async def get_latest_maintenance_run():
+    """Report of the most recent maintenance run (scheduled or on demand)."""
+    report = await maintenance.get_run()
+    if report is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No maintenance runs recorded")
+    return MaintenanceRunResponse(**report)
+
+
+@router.get("/maintenance/runs/{run_id}", response_model=MaintenanceRunResponse, tags=["Maintenance"])
+async def get_maintenance_run(run_id: str):
+    """Progress, or final counts, of a maintenance run."""
+    report = await maintenance.get_run(run_id)
+    if report is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Maintenance run not found")
+    return MaintenanceRunResponse(**report)
+
+
+async def _redirect_to_stored_image(storage, filename: str, w: Optional[int], fmt: Optional[str]) -> Response:
+    """Redirect to an image in remote storage, preferring the requested variant if it was stored."""
+    key = generated_key(filename)
+    if w is not None or fmt is not None:
+        try:
+            variant_format = image_variants.normalize_format(fmt or settings.thumbnail_format)
+        except image_variants.VariantError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        variant_width = image_variants.normalize_width(w or max(image_variants.allowed_widths()))
+        candidate = variant_key(image_variants.variant_filename(filename, variant_width, variant_format))
+        if await asyncio.to_thread(storage.exists, candidate):
+            key = candidate
+    return redirect_response(await asyncio.to_thread(storage.url, key))
+
+
+@router.api_route("/images/{filename}", methods=["GET", "HEAD"], tags=["Images"])
+async def serve_image(
+    request: Request,
+    filename: str,
+    w: Optional[int] = Query(None, ge=1, le=4096, description="Resize to this width (snapped to a standard size)"),
+    fmt: Optional[str] = Query(None, description="Transcode to webp, jpeg or png")
 ):
-    """Fix jobs with incorrect image paths (./storage/generated/ format)."""
-    fixed_count = await AsyncJobService.fix_incorrect_image_paths(db)
-    return {
-        "message": f"Successfully fixed {fixed_count} jobs with incorrect image paths",
-        "fixed_count": fixed_count
-    }
+    """Serve generated images from local storage, optionally as a resized/transcoded variant.
+
+    Files are immutable, so responses carry a strong ETag and a long-lived
+    Cache-Control, and support conditional and byte-range requests. With
+    remote storage the client is redirected to the object instead.
+    """
+    storage = get_storage()
+    if not storage.is_local:
+        return await _redirect_to_stored_image(storage, filename, w, fmt)
+    
+    if w is None and fmt is None:
+        return await immutable_file_response(
+            request.headers,
+            generated_dir() / filename,
+            media_type=mime_type_for(filename),
+            filename=filename
+        )
+    
+    try:
+        variant_format = image_variants.normalize_format(fmt or settings.thumbnail_format)
+        variant_width = image_variants.normalize_width(w or max(image_variants.allowed_widths()))
+        variant_path = await image_variants.get_variant(filename, variant_width, variant_format)
+    except image_variants.VariantError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found")
+    
+    return await immutable_file_response(
+        request.headers,
+        variant_path,
+        media_type=image_variants.variant_media_type(variant_format)
+    )
 
 
-@router.get("/images/{filename}", tags=["Images"])
-async def serve_image(filename: str):
-    """Serve generated images from local storage."""
-    image_path = Path("storage/generated") / filename
+@router.post("/webhooks/replicate", tags=["Webhooks"])
+async def replicate_webhook(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Receive a completed prediction from Replicate and finish its job.
+
+    The job is looked up by ``replicate_prediction_id`` and handed to a worker
+    to download the result, so no polling is needed. Only signed callbacks
+    are accepted; without REPLICATE_WEBHOOK_SECRET every call is rejected.
+    """
+    body = await request.body()
     
-    if not image_path.exists():
+    if not settings.replicate_webhook_secret or not verify_webhook_signature(
+        body,
+        request.headers.get("webhook-id"),
+        request.headers.get("webhook-timestamp"),
+        request.headers.get("webhook-signature"),
+        settings.replicate_webhook_secret
+    ):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Image not found"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid webhook signature"
         )
     
-    return FileResponse(
-        path=str(image_path),
-        media_type="image/png",
-        filename=filename
-    )
+    try:
+        prediction = parse_prediction_payload(await request.json())
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid webhook payload"
+        )
+    
+    if not prediction["id"] or prediction["status"] not in TERMINAL_PREDICTION_STATUSES:
+        return {"status": "ignored"}
+    
+    job = await AsyncJobService.get_job_by_prediction_id(db, prediction["id"])
+    if not job:
+        # Acknowledge anyway so Replicate doesn't keep retrying an unknown prediction
+        logger.warning(f"Webhook for unknown prediction {prediction['id']}")
+        return {"status": "ignored"}
+    
+    finalize_prediction.delay(job_id=job.id, prediction=prediction)
+    logger.info(f"Webhook received for job {job.id} (prediction {prediction['id']}: {prediction['status']})")
+    return {"status": "accepted", "job_id": job.id}
 
 
 @router.get("/health", tags=["Health"])
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 import os
 
 
@@ -17,8 +17,69 @@ class Settings(BaseSettings):
     # Redis Configuration
     redis_url: str = "redis://localhost:6379/0"
     
+    # Job status cache (Redis, write-through from workers)
+    status_cache_enabled: bool = True
+    status_cache_ttl: int = 3600  # seconds to keep completed/failed jobs
+    status_cache_active_ttl: int = 86400  # upper bound for pending/processing jobs
+    
+    # Request deduplication (opt-in per request)
+    dedup_claim_ttl: int = 60  # seconds a new job holds its hash before it is committed
+    dedup_cdn_ttl: int = 3600  # reuse window for jobs whose result is a Replicate CDN URL
+    
+    # Job event streaming (SSE / WebSocket)
+    job_events_heartbeat: float = 15.0  # seconds between keep-alives on idle streams
+    job_events_max_jobs: int = 100  # jobs one connection may follow
+    
     # Replicate API Configuration
     replicate_api_token: str = "your_replicate_token_here"
+    replicate_base_url: Optional[str] = None  # override to point at a fake/local Replicate
+    
+    # Replicate rate limiting (distributed token bucket in Redis, shared by all workers)
+    replicate_rate_limit: float = 5.0  # prediction creates per second, account-wide (0 disables)
+    replicate_rate_burst: int = 10
+    # Per-model creates per second on top of the account-wide limit, as JSON: {"owner/model:version": 1.0}
+    replicate_model_rate_limits: Dict[str, float] = {}
+    throttle_default_retry_after: float = 5.0  # pause after a 429 without Retry-After
+    throttle_sleep_threshold: float = 1.0  # shorter waits sleep in the task instead of requeueing
+    # Backpressure: reject new jobs (429) when the backlog would take longer than
+    # this many seconds to reach Replicate (0 disables)
+    admission_max_wait: float = 300.0
+    
+    # Fair scheduling: new jobs wait in per-(model, tenant) lanes and are released
+    # to workers in weighted fair order, so one busy model or tenant can't starve the rest
+    scheduler_enabled: bool = True
+    # Relative shares as JSON, e.g. {"owner/model:version": 2.0}; unlisted entries weigh 1
+    scheduler_model_weights: Dict[str, float] = {}
+    scheduler_tenant_weights: Dict[str, float] = {}
+    scheduler_max_inflight: int = 50  # dispatched but unfinished jobs, all tenants (0 = unlimited)
+    tenant_max_inflight: int = 10  # dispatched but unfinished jobs per tenant (0 = unlimited)
+    scheduler_inflight_ttl: int = 3600  # forget in-flight jobs never released (crashed workers)
+    scheduler_dispatch_interval: float = 5.0  # seconds between safety-net dispatch runs
+    tenant_header: str = "X-Tenant-ID"  # request header naming the tenant; falls back to client IP
+    
+    # Transactional outbox: new jobs are written to job_outbox in the same commit
+    # as the job, and the relay (python -m worker.relay) publishes them in batches
+    outbox_batch_size: int = 500  # outbox rows claimed and published per round trip
+    outbox_poll_interval: float = 5.0  # relay re-checks the outbox this often without a notification
+    outbox_sweep_interval: float = 30.0  # seconds between Celery beat relay runs, a safety net (0 disables)
+    
+    # Outbound HTTP (connection pools shared by Replicate calls and downloads)
+    replicate_max_connections: int = 50  # pool for the Replicate API host
+    http_max_connections: int = 100  # pool for artifact downloads
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_connect_timeout: float = 5.0
+    http_read_timeout: float = 30.0
+    http_pool_timeout: float = 10.0
+    http2_enabled: bool = True  # used only when the h2 package is installed
+    
+    # Replicate Webhooks
+    # Public base URL of this API as seen by Replicate (e.g. https://api.example.com).
+    # Required for the "webhook" execution mode.
+    public_base_url: Optional[str] = None
+    replicate_webhook_secret: Optional[str] = None  # "whsec_..." signing secret
+    webhook_sweep_interval: int = 300  # seconds between safety-net sweeps
+    webhook_sweep_grace: int = 120  # prediction age before the sweep checks it
     
     # Application Settings
     debug: bool = True
@@ -26,12 +87,83 @@ class Settings(BaseSettings):
     api_v1_prefix: str = "/api/v1"
     
     # File Storage
-    storage_path: str = "./storage"
+    # "local" keeps artifacts under storage_path (single host, served by the API);
+    # "s3" keeps them in an S3-compatible bucket and the API redirects to them
+    storage_backend: str = "local"
+    storage_path: str = "./storage"  # local artifacts, plus scratch space for ingest
+    max_artifact_bytes: int = 50 * 1024 * 1024  # reject larger downloads
+    ingest_chunk_size: int = 1024 * 1024  # write buffer for artifact ingest
+    
+    # S3-compatible storage (STORAGE_BACKEND=s3)
+    s3_bucket: Optional[str] = None
+    s3_prefix: str = ""  # prepended to every object key
+    s3_endpoint_url: Optional[str] = None  # e.g. http://localhost:9000 for MinIO
+    s3_region: Optional[str] = None
+    s3_access_key_id: Optional[str] = None  # falls back to the standard AWS credential chain
+    s3_secret_access_key: Optional[str] = None
+    s3_addressing_style: str = "auto"  # "path" for MinIO
+    s3_public_base_url: Optional[str] = None  # public bucket/CDN base; otherwise URLs are presigned
+    s3_presign_ttl: int = 3600  # seconds a presigned URL stays valid
+    s3_max_connections: int = 20
+    s3_multipart_chunk_size: int = 8 * 1024 * 1024
+    s3_upload_concurrency: int = 4
+    
+    # Image variants (resized / transcoded copies served by GET /images/{filename}?w=&fmt=)
+    variant_widths: str = "128,256,512,1024,2048"  # requested widths snap up to these
+    variant_cache_max_bytes: int = 512 * 1024 * 1024  # LRU disk cache budget
+    variant_workers: int = 2  # render processes per API process (0 = one per CPU)
+    thumbnail_width: int = 512  # gallery thumbnail rendered when a job completes
+    thumbnail_format: str = "webp"
+    pregenerate_thumbnails: bool = True
+    
+    # Maintenance (Celery beat, see app/services/maintenance.py): rewrite legacy
+    # media paths, delete jobs whose artifact is gone, reclaim unreferenced artifacts
+    maintenance_interval: int = 86400  # seconds between scheduled runs (0 disables)
+    maintenance_operations: str = "fix_paths,missing_artifacts,orphaned_files"  # scheduled runs
+    maintenance_dry_run: bool = False  # scheduled runs only report what they would change
+    maintenance_chunk_size: int = 1000  # rows per fetch / delete round trip
+    maintenance_orphan_grace: int = 3600  # never reclaim artifacts younger than this (seconds)
+    
+    # Metrics (the API serves Prometheus metrics on /metrics)
+    worker_metrics_port: int = 9808  # Celery workers serve them here (0 disables)
+    
+    # Tracing (OpenTelemetry spans from the API through Celery to Replicate)
+    tracing_exporter: str = "none"  # none | console | file | otlp
+    tracing_file_path: str = "./traces/spans.jsonl"  # JSON lines, for TRACING_EXPORTER=file
+    tracing_otlp_endpoint: Optional[str] = None  # e.g. http://localhost:4318/v1/traces (defaults to OTEL_EXPORTER_OTLP_* env)
+    tracing_sample_ratio: float = 1.0  # fraction of new traces recorded
     
     # Celery Task Settings
     max_retries: int = 3
     retry_backoff_base: float = 2.0
     
+    # Job Execution Settings
+    # "blocking" keeps one worker process busy for the whole prediction,
+    # "reconcile" submits the prediction and polls it from short rescheduled tasks,
+    # "webhook" submits the prediction and waits for Replicate to call us back
+    execution_mode: str = "blocking"
+    prediction_timeout: int = 600
+    reconcile_poll_interval: float = 2.0
+    reconcile_poll_interval_max: float = 10.0
+    
+    # Stuck-job reaper (Celery beat): workers keep a heartbeat for their processing
+    # jobs in Redis, and jobs whose heartbeat goes stale (worker OOM-killed,
+    # redeployed) are retried, re-attaching to their prediction if they have one
+    job_heartbeat_interval: float = 30.0  # seconds between a worker's batched heartbeats
+    job_stale_after: float = 180.0  # heartbeat age at which a processing job counts as stuck (0 disables the reaper)
+    reaper_interval: float = 60.0  # seconds between reaper runs
+    reaper_batch_size: int = 500  # stuck jobs handled per run
+    
+    # Cancellation (POST /jobs/{id}/cancel, POST /jobs/cancel): workers check a
+    # Redis flag while they wait on a prediction and cancel it upstream
+    job_cancel_signal_ttl: int = 3600  # seconds a cancellation stays visible to running workers
+    cancel_batch_size: int = 1000  # jobs cancelled per transaction (and per upstream cancel task) in bulk cancels
+    
+    # Asyncio worker (python -m worker.async_worker): runs blocking-mode jobs as
+    # coroutines, many per process, instead of one job per prefork process
+    async_worker_concurrency: int = 200  # jobs in progress per process
+    async_worker_drain_timeout: float = 120.0  # on shutdown, seconds running jobs get to finish before they are handed back
+    
     # CORS Settings (comma-separated string that gets split into a list)
     allowed_origins: str = "http://localhost:5173,http://localhost:3000"
     
@@ -45,6 +177,12 @@ class Settings(BaseSettings):
         # Allow extra fields to be ignored instead of raising an error
         extra = "ignore"
     
+    def get_replicate_webhook_url(self) -> Optional[str]:
+        """URL Replicate should call when a prediction completes, if configured."""
+        if not self.public_base_url:
+            return None
+        return f"{self.public_base_url.rstrip('/')}{self.api_v1_prefix}/webhooks/replicate"
+    
     def get_database_url(self) -> str:
         """Get the database URL, constructing it from individual fields if DATABASE_URL is not set."""
         # If DATABASE_URL is explicitly set and not the default, use it
@@ -3,6 +3,7 @@ from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.metrics import instrument_engine
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +15,7 @@ async_engine = create_async_engine(
     pool_pre_ping=True,
     pool_recycle=300,
 )
+instrument_engine(async_engine.sync_engine, "async")
 
 # Async session factory
 AsyncSessionLocal = async_sessionmaker(
@@ -30,12 +32,15 @@ sync_engine = create_engine(
     pool_pre_ping=True,
     pool_recycle=300,
 )
+instrument_engine(sync_engine, "sync")
 
 # Sync session factory for Celery workers
 SyncSessionLocal = sessionmaker(
     bind=sync_engine,
     autocommit=False,
     autoflush=False,
+    # Rows returned by UPDATE ... RETURNING stay usable after commit without a re-SELECT
+    expire_on_commit=False,
 )
 
 
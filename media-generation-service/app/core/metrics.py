@@ -0,0 +1,176 @@
+import logging
+import os
+import time
+from typing import Optional
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from sqlalchemy import event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Prometheus metrics shared by the API and the workers. The API serves them on
+# /metrics, workers on WORKER_METRICS_PORT. Processes that fork (Celery prefork,
+# multiple uvicorn workers) must set PROMETHEUS_MULTIPROC_DIR so every child
+# writes to a shared directory that is aggregated at scrape time.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+JOB_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time until the API starts its response, by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds",
+    "Database statement execution time",
+    ["engine", "statement"],
+    buckets=DB_BUCKETS,
+)
+REPLICATE_REQUEST_SECONDS = Histogram(
+    "replicate_request_duration_seconds",
+    "Replicate API call latency",
+    ["operation", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+JOB_QUEUE_SECONDS = Histogram(
+    "job_queue_seconds",
+    "Time from job creation until a worker first starts it",
+    ["model"],
+    buckets=JOB_BUCKETS,
+)
+JOB_RUN_SECONDS = Histogram(
+    "job_run_seconds",
+    "Time a worker spends on a job, from start until it completes, fails or is cancelled",
+    ["model", "outcome"],
+    buckets=JOB_BUCKETS,
+)
+JOB_RETRIES = Counter("job_retries_total", "Jobs put back in line", ["model", "reason"])
+JOB_FAILURES = Counter("job_failures_total", "Jobs that failed permanently", ["model"])
+ARTIFACT_DOWNLOAD_BYTES = Counter("artifact_download_bytes_total", "Bytes of generated artifacts downloaded")
+ARTIFACT_DOWNLOAD_SECONDS = Histogram(
+    "artifact_download_seconds",
+    "Time to stream a generated artifact to local disk",
+    buckets=LATENCY_BUCKETS,
+)
+QUEUE_DEPTH = Gauge(
+    "queue_depth",
+    "Jobs waiting, per Celery queue and in the fair scheduler",
+    ["queue"],
+    multiprocess_mode="livemostrecent",
+)
+SCHEDULER_INFLIGHT = Gauge(
+    "scheduler_inflight_jobs",
+    "Jobs dispatched by the fair scheduler and not yet finished",
+    multiprocess_mode="livemostrecent",
+)
+
+
+def multiprocess_enabled() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def get_registry() -> CollectorRegistry:
+    """Registry to expose: this process's, or the aggregate of all processes."""
+    if not multiprocess_enabled():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_latest() -> bytes:
+    return generate_latest(get_registry())
+
+
+def start_metrics_server(port: int) -> None:
+    """Serve /metrics from a background thread (Celery workers)."""
+    start_http_server(port, registry=get_registry())
+    logger.info(f"Serving worker metrics on port {port}")
+
+
+def mark_process_dead(pid: Optional[int] = None) -> None:
+    """Drop a finished child's live gauges from the multiprocess aggregate."""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+def statement_kind(statement: str) -> str:
+    """First keyword of a SQL statement, as a low-cardinality label."""
+    keyword = statement.lstrip()[:8].split(None, 1)
+    keyword = keyword[0].upper() if keyword else ""
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+def instrument_engine(engine, name: str) -> None:
+    """Time every statement run through ``engine`` (a sync Engine).
+
+    For an AsyncEngine pass ``async_engine.sync_engine``.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("query_start", None)
+        if started is not None:
+            DB_QUERY_SECONDS.labels(name, statement_kind(statement)).observe(time.perf_counter() - started)
+
+
+def route_label(scope: Scope) -> str:
+    """Route template for a request, never the raw path (which would explode cardinality)."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if scope.get("endpoint") is not None and scope.get("root_path"):
+        # Mounted app, e.g. the /images static files
+        return f"{scope['root_path']}/{{path}}"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Records request latency per route template (pure ASGI, no per-request task).
+
+    Latency is measured to the start of the response, so streaming endpoints
+    (SSE, file downloads) report time to first byte rather than stream length.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        recorded = False
+
+        def record(status_code: int) -> None:
+            nonlocal recorded
+            recorded = True
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], route_label(scope), str(status_code)
+            ).observe(time.perf_counter() - started)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and not recorded:
+                record(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not recorded:
+                record(500)
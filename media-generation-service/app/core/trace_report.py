@@ -0,0 +1,125 @@
+"""Summarise spans written by TRACING_EXPORTER=file.
+
+    python -m app.core.trace_report traces/spans.jsonl               # per-model stage breakdown
+    python -m app.core.trace_report traces/spans.jsonl --job <job_id>  # one job's timeline
+
+A job's stages (create_job, outbox.wait, scheduler.queue, celery.queue,
+replicate.*, artifact.ingest, ...) share a trace; spans without job.model are
+attributed to their trace's model.
+"""
+import argparse
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def _timestamp(value: str) -> float:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    spans = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            raw = json.loads(line)
+            spans.append({
+                "name": raw["name"],
+                "trace_id": raw["context"]["trace_id"],
+                "span_id": raw["context"]["span_id"],
+                "parent_id": raw.get("parent_id"),
+                "start": _timestamp(raw["start_time"]),
+                "end": _timestamp(raw["end_time"]),
+                "status": raw.get("status", {}).get("status_code", "UNSET"),
+                "attributes": raw.get("attributes") or {},
+            })
+    return spans
+
+
+def _by_trace(spans: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    traces: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for span in spans:
+        traces[span["trace_id"]].append(span)
+    return traces
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(pct / 100 * len(values)))]
+
+
+def job_timeline(spans: List[Dict[str, Any]], job_id: str) -> List[str]:
+    """Every span in the traces that touched ``job_id``, in start order, indented by depth."""
+    trace_ids = {span["trace_id"] for span in spans if span["attributes"].get("job.id") == job_id}
+    selected = sorted((span for span in spans if span["trace_id"] in trace_ids), key=lambda span: span["start"])
+    if not selected:
+        return [f"No spans found for job {job_id}"]
+
+    parents = {span["span_id"]: span["parent_id"] for span in selected}
+
+    def depth(span: Dict[str, Any]) -> int:
+        level, parent = 0, span["parent_id"]
+        while parent in parents:
+            level, parent = level + 1, parents[parent]
+        return level
+
+    origin = selected[0]["start"]
+    lines = [f"{'offset':>10} {'duration':>10}  span"]
+    for span in selected:
+        flag = "  !" if span["status"] == "ERROR" else ""
+        lines.append(
+            f"{span['start'] - origin:>9.3f}s {span['end'] - span['start']:>9.3f}s  "
+            f"{'  ' * depth(span)}{span['name']}{flag}"
+        )
+    return lines
+
+
+def model_breakdown(spans: List[Dict[str, Any]], model: Optional[str] = None) -> List[str]:
+    """Per model: end-to-end time and where it went, stage by stage (p50 / p95)."""
+    stages: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+    totals: Dict[str, List[float]] = defaultdict(list)
+
+    for trace_spans in _by_trace(spans).values():
+        trace_model = next((span["attributes"]["job.model"] for span in trace_spans if "job.model" in span["attributes"]), None)
+        if trace_model is None or (model and trace_model != model):
+            continue
+        totals[trace_model].append(max(span["end"] for span in trace_spans) - min(span["start"] for span in trace_spans))
+        per_stage: Dict[str, float] = defaultdict(float)
+        for span in trace_spans:
+            per_stage[span["name"]] += span["end"] - span["start"]
+        for name, seconds in per_stage.items():
+            stages[trace_model][name].append(seconds)
+
+    lines = []
+    for trace_model in sorted(stages):
+        total = totals[trace_model]
+        lines.append(
+            f"{trace_model}: {len(total)} traces, end-to-end p50 {_percentile(total, 50):.3f}s p95 {_percentile(total, 95):.3f}s"
+        )
+        median_total = _percentile(total, 50) or 1.0
+        ordered = sorted(stages[trace_model].items(), key=lambda item: -_percentile(item[1], 50))
+        for name, values in ordered:
+            p50 = _percentile(values, 50)
+            lines.append(
+                f"  {name:<40} n={len(values):<5} p50 {p50:>8.3f}s p95 {_percentile(values, 95):>8.3f}s"
+                f" ({p50 / median_total:>5.0%} of p50)"
+            )
+    return lines or ["No job spans found"]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="JSON-lines span file (TRACING_FILE_PATH)")
+    parser.add_argument("--job", help="show the timeline of one job")
+    parser.add_argument("--model", help="only break down this model")
+    args = parser.parse_args(argv)
+
+    spans = load_spans(args.path)
+    lines = job_timeline(spans, args.job) if args.job else model_breakdown(spans, args.model)
+    print("\n".join(lines))
+
+
+if __name__ == "__main__":
+    main()
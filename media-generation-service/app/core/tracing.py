@@ -0,0 +1,206 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Mapping, Optional, Sequence
+from opentelemetry import context as otel_context, propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import Span, SpanKind, Status, StatusCode
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# OpenTelemetry tracing across the API, the broker and the workers. The API's
+# request span is injected into Celery message headers (W3C traceparent) and
+# into scheduler lane entries, so a job's submit, queue wait, worker run and
+# Replicate calls all land in one trace. Every job span carries job.id and
+# job.model, which is what trace_report groups on. Without an exporter
+# configured the OpenTelemetry API is a no-op and spans cost next to nothing.
+tracer = trace.get_tracer("media_generation")
+
+_provider_pid: Optional[int] = None
+_provider: Optional[TracerProvider] = None
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends finished spans to a file, one JSON object per line.
+
+    The file is opened per batch in append mode, so forked worker processes
+    can share it; each batch is written with a single call.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, spans: Sequence) -> SpanExportResult:
+        lines = "".join(json.dumps(json.loads(span.to_json()), separators=(",", ":")) + "\n" for span in spans)
+        try:
+            with self._lock, open(self.path, "a") as f:
+                f.write(lines)
+        except OSError as e:
+            logger.warning(f"Failed to write spans to {self.path}: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+
+def _build_exporter() -> SpanExporter:
+    exporter = settings.tracing_exporter
+    if exporter == "console":
+        return ConsoleSpanExporter()
+    if exporter == "file":
+        return JsonLinesSpanExporter(settings.tracing_file_path)
+    if exporter == "otlp":
+        # Optional dependency: only needed when TRACING_EXPORTER=otlp
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint)
+    raise ValueError(f"Unknown TRACING_EXPORTER '{exporter}'")
+
+
+def setup_tracing(service_name: str) -> None:
+    """Install the tracer provider for this process (idempotent, fork-aware).
+
+    Forked worker processes call this on their first task, so the export
+    thread is started in the process that uses it.
+    """
+    global _provider, _provider_pid
+    if settings.tracing_exporter == "none" or _provider_pid == os.getpid():
+        return
+    _provider_pid = os.getpid()
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(settings.tracing_sample_ratio)),
+    )
+    _provider.add_span_processor(BatchSpanProcessor(_build_exporter()))
+    trace.set_tracer_provider(_provider)
+    logger.info(f"Tracing {service_name} to {settings.tracing_exporter} exporter")
+
+
+def shutdown_tracing() -> None:
+    """Flush and stop the exporter (process shutdown)."""
+    if _provider is not None and _provider_pid == os.getpid():
+        _provider.shutdown()
+
+
+def job_attributes(job_id: Optional[str] = None, model: Optional[str] = None, **extra: Any) -> Dict[str, Any]:
+    """Span attributes identifying a job, skipping unknown values."""
+    attributes = {"job.id": job_id, "job.model": model, **extra}
+    return {key: value for key, value in attributes.items() if value is not None}
+
+
+@contextmanager
+def span(name: str, kind: SpanKind = SpanKind.INTERNAL, **attributes: Any) -> Iterator[Span]:
+    """Run the block in a child span of the current one. Exceptions are recorded on it."""
+    with tracer.start_as_current_span(name, kind=kind, attributes=job_attributes(**attributes)) as current:
+        yield current
+
+
+def record_interval(name: str, start_time: float, end_time: Optional[float] = None, **attributes: Any) -> None:
+    """Record a span for an interval that already happened (e.g. time spent in a queue)."""
+    started = tracer.start_span(name, start_time=int(start_time * 1e9), attributes=job_attributes(**attributes))
+    started.end(end_time=int((end_time or time.time()) * 1e9))
+
+
+def carrier() -> Dict[str, str]:
+    """The current trace context as W3C headers, for handing across processes."""
+    headers: Dict[str, str] = {}
+    propagate.inject(headers)
+    return headers
+
+
+def inject(headers: Dict[str, Any]) -> None:
+    propagate.inject(headers)
+
+
+def extract(headers: Optional[Mapping[str, Any]]):
+    """Context from W3C headers, or the current one if they carry none."""
+    return propagate.extract(headers or {}, context=otel_context.get_current())
+
+
+@contextmanager
+def use_context(headers: Optional[Mapping[str, Any]]) -> Iterator[None]:
+    """Make the trace context from ``headers`` current for the block."""
+    token = otel_context.attach(extract(headers))
+    try:
+        yield
+    finally:
+        otel_context.detach(token)
+
+
+@contextmanager
+def detached() -> Iterator[None]:
+    """Run the block outside any trace (e.g. to publish housekeeping tasks)."""
+    token = otel_context.attach(otel_context.Context())
+    try:
+        yield
+    finally:
+        otel_context.detach(token)
+
+
+def start_detached_span(name: str, headers: Optional[Mapping[str, Any]], kind: SpanKind, **attributes: Any):
+    """Start a span that outlives the current call stack (e.g. a Celery task).
+
+    Returns ``(span, token)``; pass both to ``end_detached_span``.
+    """
+    started = tracer.start_span(name, context=extract(headers), kind=kind, attributes=job_attributes(**attributes))
+    token = otel_context.attach(trace.set_span_in_context(started))
+    return started, token
+
+
+def end_detached_span(started: Span, token, error: Optional[BaseException] = None) -> None:
+    if error is not None:
+        started.record_exception(error)
+        started.set_status(Status(StatusCode.ERROR, str(error)))
+    try:
+        otel_context.detach(token)
+    finally:
+        started.end()
+
+
+class TracingMiddleware:
+    """Server span per HTTP request, continuing any incoming traceparent.
+
+    The span is renamed to the route template once routing has run.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or settings.tracing_exporter == "none":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        with tracer.start_as_current_span(
+            f"{scope['method']} {scope['path']}",
+            context=propagate.extract(headers),
+            kind=SpanKind.SERVER,
+            attributes={"http.method": scope["method"], "http.target": scope["path"]},
+        ) as current:
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    current.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        current.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    current.update_name(f"{scope['method']} {route.path}")
+                    current.set_attribute("http.route", route.path)
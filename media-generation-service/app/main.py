@@ -1,8 +1,16 @@
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST
 from app.core.config import settings
+from app.core import metrics, tracing
 from app.api import endpoints
+from app.services.http_client import aclose_http_clients
+from app.services import image_variants, scheduler, status_cache
+from app.services.rate_limit import ENTRY_QUEUE
+from app.services.job_events import job_event_broker
+from app.services.file_responses import ImmutableStaticFiles
+from app.services.storage import generated_dir
 import os
 import logging
 
@@ -28,16 +36,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "Content-Range", "Accept-Ranges", "Retry-After"],
 )
 
+# Request latency per route (added last, so it wraps CORS and the routes)
+app.add_middleware(metrics.MetricsMiddleware)
+# Server span per request, continuing the caller's trace if it sent one
+app.add_middleware(tracing.TracingMiddleware)
+
 # Include API router
 app.include_router(endpoints.router, prefix=settings.api_v1_prefix)
 
 # Mount static files for serving generated images
-generated_images_path = os.path.join(settings.storage_path, "generated")
+# (with STORAGE_BACKEND=s3 the directory stays empty and /api/v1/images redirects instead)
+generated_images_path = str(generated_dir())
 os.makedirs(generated_images_path, exist_ok=True)
 
-app.mount("/images", StaticFiles(directory=generated_images_path), name="images")
+app.mount("/images", ImmutableStaticFiles(directory=generated_images_path), name="images")
 
 @app.get("/", tags=["Root"])
 @app.head("/", tags=["Root"])
@@ -50,14 +65,46 @@ async def root():
         "status": "healthy"
     }
 
+async def _refresh_queue_gauges() -> None:
+    """Read queue depths from Redis at scrape time."""
+    redis = status_cache.get_async_redis()
+    pipe = redis.pipeline(transaction=False)
+    pipe.llen(ENTRY_QUEUE)
+    pipe.llen("default")
+    pipe.get(scheduler.QUEUED_KEY)
+    pipe.zcard(scheduler.INFLIGHT_KEY)
+    entry, default, scheduled, inflight = await pipe.execute()
+    metrics.QUEUE_DEPTH.labels(ENTRY_QUEUE).set(entry)
+    metrics.QUEUE_DEPTH.labels("default").set(default)
+    metrics.QUEUE_DEPTH.labels("scheduler").set(int(scheduled or 0))
+    metrics.SCHEDULER_INFLIGHT.set(inflight)
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    try:
+        await _refresh_queue_gauges()
+    except Exception as e:
+        logger.warning(f"Failed to read queue depths: {e}")
+    return Response(metrics.render_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.on_event("startup")
 async def startup_event():
     """Application startup event."""
     logger.info(f"Starting {settings.project_name}")
     logger.info(f"Debug mode: {settings.debug}")
     logger.info(f"API prefix: {settings.api_v1_prefix}")
+    if settings.execution_mode == "webhook" and not settings.replicate_webhook_secret:
+        # Unsigned callbacks are rejected, so jobs would only ever finish through the sweep
+        raise RuntimeError("EXECUTION_MODE=webhook requires REPLICATE_WEBHOOK_SECRET")
+    tracing.setup_tracing("media-generation-api")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Application shutdown event."""
-    logger.info(f"Shutting down {settings.project_name}") 
\ No newline at end of file
+    logger.info(f"Shutting down {settings.project_name}")
+    await aclose_http_clients()
+    await job_event_broker.aclose()
+    await status_cache.aclose()
+    image_variants.shutdown_pool()
+    tracing.shutdown_tracing() 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Text, JSON, Integer
+from sqlalchemy import Column, String, DateTime, Text, JSON, Integer, BigInteger, ForeignKey, Index, text
 from sqlalchemy.sql import func
 from app.core.database import Base
 import uuid
@@ -12,18 +12,81 @@ class Job(Base):
     model = Column(String, nullable=False)
     parameters = Column(JSON, default=dict)
     status = Column(String, nullable=False, default="pending")
+    batch_id = Column(String, nullable=True, index=True)
+    request_hash = Column(String(64), nullable=True, index=True)  # canonical (model, prompt, parameters) digest
+    tenant_id = Column(String(64), nullable=True, index=True)  # submitter, for fair scheduling
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # Stage timestamps (latest attempt) for latency analytics, see GET /stats
+    enqueued_at = Column(DateTime(timezone=True), nullable=True)  # handed to the Celery queue
+    started_at = Column(DateTime(timezone=True), nullable=True)  # picked up by a worker
+    prediction_created_at = Column(DateTime(timezone=True), nullable=True)
+    prediction_finished_at = Column(DateTime(timezone=True), nullable=True)  # terminal prediction seen
+    stored_at = Column(DateTime(timezone=True), nullable=True)  # result recorded, artifact stored
+    
     # Results
     media_path = Column(String, nullable=True)
-    replicate_prediction_id = Column(String, nullable=True)
+    replicate_prediction_id = Column(String, nullable=True, index=True)
+    # Output of the succeeded prediction, saved before the download so a retry
+    # can store it without polling (or paying for) the prediction again
+    prediction_output_url = Column(String, nullable=True)
+    
+    # Stored artifact (set when the output is ingested locally)
+    byte_size = Column(BigInteger, nullable=True)
+    mime_type = Column(String, nullable=True)
+    content_sha256 = Column(String(64), nullable=True, index=True)
     
     # Error handling
     error_message = Column(Text, nullable=True)
     retry_count = Column(Integer, default=0)
     
+    # Bumped by every write; the status cache keeps the payload with the highest
+    # version, so a slow writer can't overwrite a newer status with an older one
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    
+    # Listing indexes: (created_at, id) for /jobs and (status, created_at, id) for
+    # /jobs/completed. Postgres scans them backwards for the DESC ordering.
+    # The partial covering index serves GET /stats from an index-only scan of
+    # completed jobs in the time window. The partial processing index only holds
+    # in-flight jobs, so the reaper's backstop query reads just the stuck ones.
+    __table_args__ = (
+        Index("ix_jobs_created_at_id", "created_at", "id"),
+        Index("ix_jobs_status_created_at_id", "status", "created_at", "id"),
+        Index(
+            "ix_jobs_completed_stage_times",
+            "created_at",
+            postgresql_where=text("status = 'completed'"),
+            postgresql_include=[
+                "model", "enqueued_at", "started_at", "prediction_created_at",
+                "prediction_finished_at", "stored_at", "byte_size", "retry_count",
+            ],
+        ),
+        Index(
+            "ix_jobs_processing_updated_at",
+            "updated_at",
+            postgresql_where=text("status = 'processing'"),
+        ),
+    )
+    
+    def __repr__(self):
+        return f"<Job(id={self.id}, status={self.status}, prompt={self.prompt[:50]}...)>" 
+
+
+class JobOutbox(Base):
+    """A job waiting to be handed to the queue (transactional outbox).
+
+    Rows are inserted in the same transaction as their job and deleted by the
+    relay once published, see app/services/outbox.py.
+    """
+    __tablename__ = "job_outbox"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    job_id = Column(String, ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False)
+    payload = Column(JSON, nullable=False)  # model, input_data, tenant_id, trace
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
     def __repr__(self):
-        return f"<Job(id={self.id}, status={self.status}, prompt={self.prompt[:50]}...)>" 
\ No newline at end of file
+        return f"<JobOutbox(id={self.id}, job_id={self.job_id})>"
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from enum import Enum
 
@@ -9,24 +9,121 @@ class JobStatus(str, Enum):
     PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
 
 
 class GenerateRequest(BaseModel):
     prompt: str = Field(..., min_length=1, max_length=2000, description="Text prompt for image generation")
     model: str = Field(..., description="Replicate model identifier")
     parameters: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Additional model parameters")
+    dedupe: bool = Field(False, description="Reuse an identical completed or in-flight job instead of running a new prediction (use with a fixed seed)")
+
+
+class BatchGenerateRequest(BaseModel):
+    requests: List[GenerateRequest] = Field(..., min_length=1, max_length=1000, description="Generation requests to submit together")
 
 
 class JobCreate(BaseModel):
     prompt: str
     model: str
     parameters: Dict[str, Any] = Field(default_factory=dict)
+    request_hash: Optional[str] = None
+    tenant_id: Optional[str] = None
 
 
 class JobResponse(BaseModel):
     job_id: str
     status: str
     message: str
+    media_path: Optional[str] = None  # set when a deduplicated request hits a completed job
+
+
+class BatchResponse(BaseModel):
+    batch_id: str
+    job_ids: List[str]
+    status: str
+    message: str
+
+
+class DedupStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+
+
+class QueueLaneStats(BaseModel):
+    model: str
+    tenant: str
+    depth: int
+    oldest_age_seconds: Optional[float] = None
+
+
+class QueueStatsResponse(BaseModel):
+    queued: int
+    inflight: int
+    inflight_by_tenant: Dict[str, int]
+    lanes: List[QueueLaneStats]
+
+
+class StagePercentiles(BaseModel):
+    p50: Optional[float] = None
+    p95: Optional[float] = None
+    p99: Optional[float] = None
+
+
+class ModelLatencyStats(BaseModel):
+    model: str
+    bucket_start: Optional[datetime] = None
+    jobs: int
+    avg_byte_size: Optional[float] = None
+    # Seconds per stage: scheduler_wait, queue_wait, submit, prediction, store, total
+    stages: Dict[str, StagePercentiles]
+
+
+class LatencyStatsResponse(BaseModel):
+    window_seconds: int
+    bucket_seconds: Optional[int] = None
+    models: List[ModelLatencyStats]
+
+
+class MaintenanceRunRequest(BaseModel):
+    # Any of fix_paths, missing_artifacts, orphaned_files; all when omitted
+    operations: Optional[List[str]] = None
+    dry_run: bool = False
+
+
+class MaintenanceRunResponse(BaseModel):
+    run_id: str
+    status: str  # queued | running | completed | failed | skipped
+    dry_run: bool
+    operations: List[str]
+    current: Optional[str] = None
+    results: Dict[str, Dict[str, Any]] = {}
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+class CancelJobsRequest(BaseModel):
+    """Jobs to cancel: every filter given must match. At least one of job_ids, batch_id, model or tenant_id is required."""
+    job_ids: Optional[List[str]] = Field(None, min_length=1, max_length=1000)
+    batch_id: Optional[str] = None
+    model: Optional[str] = None
+    tenant_id: Optional[str] = None
+    statuses: Optional[List[JobStatus]] = Field(None, description="Only cancel jobs in these statuses (pending, processing, failed awaiting a retry)")
+
+
+class CancelJobsResponse(BaseModel):
+    cancelled: int
+    job_ids: List[str]
+    predictions_cancelled: int  # in-flight Replicate predictions handed to cancel_predictions
+
+
+class BatchStatusResponse(BaseModel):
+    batch_id: str
+    total: int
+    counts: Dict[str, int]
+    done: bool
 
 
 class JobStatusResponse(BaseModel):
@@ -35,19 +132,49 @@ class JobStatusResponse(BaseModel):
     model: str
     parameters: Dict[str, Any]
     status: JobStatus
+    batch_id: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     media_path: Optional[str] = None
+    mime_type: Optional[str] = None
+    byte_size: Optional[int] = None
     error_message: Optional[str] = None
     retry_count: int = 0
+    version: int = 0  # increases with every change to the job
 
     class Config:
         from_attributes = True
 
 
+class JobSummaryResponse(BaseModel):
+    """Job list entry; prompt and parameters only with ?fields=prompt,parameters."""
+    id: str
+    model: str
+    status: JobStatus
+    batch_id: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    media_path: Optional[str] = None
+    mime_type: Optional[str] = None
+    byte_size: Optional[int] = None
+    error_message: Optional[str] = None
+    retry_count: int = 0
+    prompt: Optional[str] = None
+    parameters: Optional[Dict[str, Any]] = None
+
+
 class JobUpdate(BaseModel):
     status: Optional[JobStatus] = None
     media_path: Optional[str] = None
     error_message: Optional[str] = None
     replicate_prediction_id: Optional[str] = None
-    retry_count: Optional[int] = None 
\ No newline at end of file
+    prediction_output_url: Optional[str] = None
+    retry_count: Optional[int] = None
+    byte_size: Optional[int] = None
+    mime_type: Optional[str] = None
+    content_sha256: Optional[str] = None
+    enqueued_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    prediction_created_at: Optional[datetime] = None
+    prediction_finished_at: Optional[datetime] = None
+    stored_at: Optional[datetime] = None
@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from app.core import metrics, tracing
+from app.core.config import settings
+from app.services.http_client import get_async_http_client, get_http_client
+from app.services.image_variants import pregenerate_thumbnail
+from app.services.storage import generated_key, get_storage, spool_dir
+
+logger = logging.getLogger(__name__)
+
+# Bytes needed to recognise every signature below
+SNIFF_BYTES = 16
+
+EXTENSION_BY_MIME = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/avif": ".avif",
+    "video/mp4": ".mp4",
+    "video/webm": ".webm",
+}
+MIME_BY_EXTENSION = {extension: mime for mime, extension in EXTENSION_BY_MIME.items()}
+MIME_BY_EXTENSION[".jpeg"] = "image/jpeg"
+
+
+class ArtifactError(Exception):
+    """Raised when a downloaded artifact is rejected (too large, unknown type)."""
+
+
+@dataclass
+class Artifact:
+    filename: str
+    byte_size: int
+    mime_type: str
+    sha256: str
+
+
+def sniff_mime_type(head: bytes) -> Optional[str]:
+    """Detect the media type from the leading magic bytes."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp":
+        return "image/avif" if head[8:12] in (b"avif", b"avis") else "video/mp4"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/webm"
+    return None
+
+
+def mime_type_for(filename: str) -> str:
+    """Content type for a stored artifact, from its extension."""
+    return MIME_BY_EXTENSION.get(Path(filename).suffix.lower(), "application/octet-stream")
+
+
+class _Spool:
+    """A download in progress: spooled to a local temp file, size-checked,
+    sniffed and hashed chunk by chunk."""
+
+    def __init__(self):
+        temp_dir = spool_dir()
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        self.path = temp_dir / f"{uuid.uuid4().hex}.part"
+        self.max_bytes = settings.max_artifact_bytes
+        self.started = time.perf_counter()
+        self.digest = hashlib.sha256()
+        self.head = b""
+        self.mime_type: Optional[str] = None
+        self.byte_size = 0
+        self._file = open(self.path, "wb", buffering=settings.ingest_chunk_size)
+
+    def check_length(self, content_length: Optional[str]) -> None:
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            raise ArtifactError(f"Artifact is {content_length} bytes, limit is {self.max_bytes}")
+
+    def write(self, chunk: bytes) -> None:
+        self.byte_size += len(chunk)
+        if self.byte_size > self.max_bytes:
+            raise ArtifactError(f"Artifact exceeds the {self.max_bytes} byte limit")
+
+        if self.mime_type is None and len(self.head) < SNIFF_BYTES:
+            self.head += chunk[:SNIFF_BYTES - len(self.head)]
+            if len(self.head) >= SNIFF_BYTES:
+                self.mime_type = _require_known_type(self.head)
+
+        self.digest.update(chunk)
+        self._file.write(chunk)
+
+    def store(self) -> Artifact:
+        """Hand the finished file to the storage backend (blocking)."""
+        self._file.close()
+        if self.mime_type is None:
+            self.mime_type = _require_known_type(self.head)
+
+        metrics.ARTIFACT_DOWNLOAD_BYTES.inc(self.byte_size)
+        metrics.ARTIFACT_DOWNLOAD_SECONDS.observe(time.perf_counter() - self.started)
+
+        sha256 = self.digest.hexdigest()
+        filename = f"{sha256}{EXTENSION_BY_MIME[self.mime_type]}"
+        # Rendered from the spool file so the thumbnail is stored before the job completes
+        pregenerate_thumbnail(self.path, filename, self.mime_type)
+
+        storage = get_storage()
+        if storage.save_file(str(self.path), generated_key(filename), self.mime_type):
+            logger.info(f"Stored artifact {filename} in {storage.name} storage ({self.byte_size} bytes, {self.mime_type})")
+        else:
+            # Content-addressed: an identical output is already stored
+            logger.info(f"Artifact {filename} already stored, reusing it")
+
+        return Artifact(filename=filename, byte_size=self.byte_size, mime_type=self.mime_type, sha256=sha256)
+
+    def discard(self) -> None:
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+
+def ingest_artifact(url: str) -> Artifact:
+    """Download, sniff, hash and persist an artifact in a single streaming pass.
+
+    The body is spooled to a local temp file, then handed to the storage
+    backend once complete (renamed into place locally, multipart-uploaded to
+    S3), so readers never see partial files. Files are named by their SHA-256
+    digest, so identical outputs are stored once.
+    """
+    with tracing.span("artifact.ingest") as current:
+        artifact = _ingest_artifact(url)
+        current.set_attribute("artifact.bytes", artifact.byte_size)
+        current.set_attribute("artifact.mime_type", artifact.mime_type)
+        return artifact
+
+
+def _ingest_artifact(url: str) -> Artifact:
+    spool = _Spool()
+    try:
+        with get_http_client().stream("GET", url) as response:
+            response.raise_for_status()
+            spool.check_length(response.headers.get("content-length"))
+            # Chunks as they come off the socket; re-chunking them copies every
+            # byte, and the spool file's buffer already batches the writes
+            for chunk in response.iter_bytes():
+                spool.write(chunk)
+        return spool.store()
+    except BaseException:
+        spool.discard()
+        raise
+
+
+async def async_ingest_artifact(url: str) -> Artifact:
+    """``ingest_artifact`` for the asyncio worker.
+
+    The download streams over the async client; the thumbnail and the hand-off
+    to storage run in a thread, since both block.
+    """
+    with tracing.span("artifact.ingest") as current:
+        spool = _Spool()
+        try:
+            async with get_async_http_client().stream("GET", url) as response:
+                response.raise_for_status()
+                spool.check_length(response.headers.get("content-length"))
+                async for chunk in response.aiter_bytes():
+                    spool.write(chunk)
+            artifact = await asyncio.to_thread(spool.store)
+        except BaseException:
+            spool.discard()
+            raise
+        current.set_attribute("artifact.bytes", artifact.byte_size)
+        current.set_attribute("artifact.mime_type", artifact.mime_type)
+        return artifact
+
+
+def _require_known_type(head: bytes) -> str:
+    mime_type = sniff_mime_type(head)
+    if mime_type is None:
+        raise ArtifactError(f"Unrecognised artifact type (leading bytes {head[:8].hex()})")
+    return mime_type
@@ -0,0 +1,54 @@
+import logging
+from typing import Iterable
+from app.core.config import settings
+from app.services.status_cache import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+# Cancellation signals for running jobs. Cancelling a job is a guarded status
+# transition in Postgres (AsyncJobService.cancel_jobs), which already stops a
+# queued or retrying job: start_job won't start a cancelled one. A job that is
+# already waiting on its prediction also needs telling, so the API sets one
+# short-lived Redis key per job and workers check it between status polls
+# (one EXISTS per poll) instead of querying the job row.
+#
+# Flags expire after ``job_cancel_signal_ttl`` seconds, longer than any
+# attempt runs. Redis errors are logged; a worker that misses the flag still
+# can't complete the job, since every completion is guarded on processing.
+KEY_PREFIX = "job-cancel:"
+
+
+def _key(job_id: str) -> str:
+    return f"{KEY_PREFIX}{job_id}"
+
+
+async def async_request(job_ids: Iterable[str]) -> None:
+    """Signal running workers that ``job_ids`` were cancelled."""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return
+    try:
+        pipe = get_async_redis().pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.set(_key(job_id), 1, ex=settings.job_cancel_signal_ttl)
+        await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to signal cancellation of {len(job_ids)} jobs: {e}")
+
+
+def requested(job_id: str) -> bool:
+    """Whether ``job_id`` was cancelled (sync workers)."""
+    try:
+        return bool(get_redis().exists(_key(job_id)))
+    except Exception as e:
+        logger.warning(f"Failed to check cancellation of job {job_id}: {e}")
+        return False
+
+
+async def async_requested(job_id: str) -> bool:
+    """Whether ``job_id`` was cancelled (asyncio worker)."""
+    try:
+        return bool(await get_async_redis().exists(_key(job_id)))
+    except Exception as e:
+        logger.warning(f"Failed to check cancellation of job {job_id}: {e}")
+        return False
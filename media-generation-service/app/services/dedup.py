@@ -0,0 +1,90 @@
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.services.status_cache import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# Deduplication of identical generation requests (opt-in via GenerateRequest.dedupe).
+# The DB is the index of reusable jobs (jobs.request_hash); Redis only holds a
+# short claim per hash so concurrent identical submissions collapse into one job,
+# plus hit/miss counters.
+CLAIM_PREFIX = "dedup-claim:"
+HITS_KEY = "dedup:hits"
+MISSES_KEY = "dedup:misses"
+
+# Delete a claim only if it is still held by the given job
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def request_hash(model: str, prompt: str, parameters: Optional[Dict[str, Any]]) -> str:
+    """Canonical SHA-256 of a generation request (key order independent)."""
+    canonical = json.dumps(
+        {"model": model, "prompt": prompt, "parameters": parameters or {}},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+async def claim(hash_value: str, job_id: str) -> Optional[str]:
+    """Claim ``hash_value`` for a job about to be created.
+
+    Returns None if the claim was won, or the ID of the job that already holds
+    it. Redis errors count as a won claim so submissions never fail on them.
+    """
+    try:
+        redis = get_async_redis()
+        key = f"{CLAIM_PREFIX}{hash_value}"
+        if await redis.set(key, job_id, nx=True, ex=settings.dedup_claim_ttl):
+            return None
+        owner = await redis.get(key)
+        return owner.decode() if owner else None
+    except Exception as e:
+        logger.warning(f"Failed to claim request hash {hash_value[:12]}: {e}")
+        return None
+
+
+async def release(hash_value: str, job_id: str) -> None:
+    """Give up a won claim when its job was not created (e.g. rejected with 429).
+
+    Identical requests can then create their own job instead of waiting for
+    the claim to expire.
+    """
+    try:
+        await get_async_redis().eval(_RELEASE_SCRIPT, 1, f"{CLAIM_PREFIX}{hash_value}", job_id)
+    except Exception as e:
+        logger.warning(f"Failed to release claim on request hash {hash_value[:12]}: {e}")
+
+
+async def record(hits: int = 0, misses: int = 0) -> None:
+    """Count dedup hits and misses."""
+    try:
+        pipe = get_async_redis().pipeline(transaction=False)
+        if hits:
+            pipe.incrby(HITS_KEY, hits)
+        if misses:
+            pipe.incrby(MISSES_KEY, misses)
+        await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to record dedup stats: {e}")
+
+
+async def get_stats() -> Dict[str, Any]:
+    """Hit/miss counters and hit rate since the counters were created."""
+    hits, misses = await get_async_redis().mget([HITS_KEY, MISSES_KEY])
+    hits, misses = int(hits or 0), int(misses or 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
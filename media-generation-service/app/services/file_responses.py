@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import os
+import re
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Mapping, Optional, Tuple, Union
+import anyio
+from fastapi import HTTPException, status
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from fastapi.staticfiles import StaticFiles
+from starlette.types import Receive, Scope, Send
+from app.core.config import settings
+from app.services.artifacts import mime_type_for
+from app.services.status_cache import etag_matches
+
+# Generated artifacts and their variants never change once written (artifacts are
+# named by content digest, variants by source and parameters), so they can be
+# cached by browsers and CDNs indefinitely and revalidated with a strong ETag.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_DIGEST_NAME = re.compile(r"^[0-9a-f]{64}")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+ByteRange = Tuple[int, int]
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def file_etag(path: Union[str, Path], stat_result: os.stat_result) -> str:
+    """Strong ETag for a stored file.
+
+    Content-addressed names already carry the SHA-256 of their bytes (or of
+    their source, for variants), so the name is used directly. Older files fall
+    back to a digest of name, size and modification time.
+    """
+    name = os.path.basename(path)
+    if _DIGEST_NAME.match(name):
+        return f'"{name}"'
+    identity = f"{name}:{stat_result.st_size}:{stat_result.st_mtime_ns}"
+    return f'"{hashlib.blake2b(identity.encode(), digest_size=12).hexdigest()}"'
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[ByteRange]:
+    """Parse a single-range ``Range`` header into inclusive ``(start, end)``.
+
+    Returns None when the whole file should be sent (no header, multiple ranges,
+    or a unit other than bytes). Raises RangeNotSatisfiable for ranges outside
+    the file.
+    """
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def _not_modified(headers: Mapping[str, str], etag: str, stat_result: os.stat_result) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat_result.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class RangeFileResponse(FileResponse):
+    """FileResponse that sends only ``byte_range`` (inclusive) of the file."""
+
+    def __init__(self, path: Union[str, Path], byte_range: ByteRange, **kwargs):
+        super().__init__(path, status_code=status.HTTP_206_PARTIAL_CONTENT, **kwargs)
+        self.byte_range = byte_range
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        start, end = self.byte_range
+        remaining = end - start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # File shrank underneath us; close the body rather than hang the client
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
+
+
+def build_file_response(
+    request_headers: Mapping[str, str],
+    path: Union[str, Path],
+    stat_result: os.stat_result,
+    media_type: str,
+    filename: Optional[str] = None
+) -> Response:
+    """Answer a GET/HEAD for an immutable file: 304, 206, 416 or 200."""
+    size = stat_result.st_size
+    etag = file_etag(path, stat_result)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if _not_modified(request_headers, etag, stat_result):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    byte_range = None
+    if_range = request_headers.get("if-range")
+    if not if_range or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request_headers.get("range"), size)
+        except RangeNotSatisfiable:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers=headers)
+
+    if byte_range is None:
+        return FileResponse(path, headers=headers, media_type=media_type, filename=filename, stat_result=stat_result)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return RangeFileResponse(
+        path, byte_range, headers=headers, media_type=media_type, filename=filename, stat_result=stat_result
+    )
+
+
+async def immutable_file_response(
+    request_headers: Mapping[str, str],
+    path: Union[str, Path],
+    media_type: str,
+    filename: Optional[str] = None
+) -> Response:
+    """Like ``build_file_response``, but stats the file off the event loop.
+
+    Raises a 404 HTTPException if the file doesn't exist.
+    """
+    try:
+        stat_result = await asyncio.to_thread(os.stat, path)
+    except (FileNotFoundError, NotADirectoryError):
+        stat_result = None
+    if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found")
+    return build_file_response(request_headers, path, stat_result, media_type, filename)
+
+
+def redirect_response(url: str) -> Response:
+    """Send the client to a file in remote storage instead of proxying its bytes.
+
+    Public URLs are as immutable as the file; presigned ones may only be reused
+    while they are still valid.
+    """
+    if settings.s3_public_base_url:
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        cache_control = f"private, max-age={settings.s3_presign_ttl // 2}"
+    return RedirectResponse(
+        url,
+        status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+        headers={"Cache-Control": cache_control}
+    )
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles with the same caching, range and content-type handling as the API routes."""
+
+    def file_response(
+        self,
+        full_path: Union[str, Path],
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200
+    ) -> Response:
+        headers = {
+            key.decode("latin-1"): value.decode("latin-1")
+            for key, value in scope["headers"]
+        }
+        return build_file_response(headers, full_path, stat_result, mime_type_for(str(full_path)))
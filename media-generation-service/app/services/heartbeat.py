@@ -0,0 +1,181 @@
+import collections
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Counter, Iterable, List, Optional, Set
+from app.core.config import settings
+from app.services.status_cache import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+# Heartbeats for processing jobs, so the reaper (reap_stuck_jobs) can tell a
+# job whose worker was OOM-killed or redeployed from one still waiting on
+# Replicate. They live in one Redis sorted set (job ID -> time of the last
+# beat) rather than on the job row: beating is a single ZADD, and finding stale
+# jobs is a range query that only touches the stale entries.
+#
+# Blocking-mode jobs are tracked while they run and a background thread beats
+# all of a process's tracked jobs in one ZADD every ``job_heartbeat_interval``
+# seconds. Reconcile-mode jobs beat on each status check, dated at the time the
+# next check is due, so the wait between checks never looks like a lost worker.
+# Checks also run late when workers are backlogged; each one records how late
+# it ran, and the reaper allows for that too. Failures are logged and never
+# fail the job; the reaper also has a backstop for lost heartbeats.
+#
+# The outbox relay can deliver a job twice, so a process may track the same
+# job in several attempts at once. Tracked jobs are counted per attempt, and
+# only the attempt that moved the job to processing clears its heartbeat.
+HEARTBEAT_KEY = "jobs:heartbeat"
+LAG_KEY = "jobs:reconcile-lag"  # seconds the latest reconcile check ran after its due time
+
+_tracked: Counter[str] = collections.Counter()  # job ID -> attempts tracking it
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_thread_pid: Optional[int] = None
+
+
+def beat(job_ids: Iterable[str], at: Optional[float] = None) -> None:
+    """Record a heartbeat for ``job_ids`` dated ``at`` (unix time, default now)."""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return
+    at = time.time() if at is None else at
+    try:
+        get_redis().zadd(HEARTBEAT_KEY, {job_id: at for job_id in job_ids})
+    except Exception as e:
+        logger.warning(f"Failed to record heartbeats for {len(job_ids)} jobs: {e}")
+
+
+def beat_reconcile(job_id: str, due: float, lag: float) -> None:
+    """Heartbeat for a reconcile-mode job whose next status check is due at ``due``.
+
+    ``lag`` is how late the current check ran. It is kept until the reaper's
+    ``job_stale_after`` passes without another check reporting.
+    """
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.zadd(HEARTBEAT_KEY, {job_id: due})
+        pipe.set(LAG_KEY, round(lag, 3), ex=max(1, int(settings.job_stale_after)))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to record the heartbeat for job {job_id}: {e}")
+
+
+def reconcile_lag() -> float:
+    """How late reconcile checks are running (0 if none reported recently)."""
+    try:
+        return float(get_redis().get(LAG_KEY) or 0)
+    except Exception as e:
+        logger.warning(f"Failed to read the reconcile lag: {e}")
+        return 0.0
+
+
+def clear(job_ids: Iterable[str]) -> None:
+    """Forget the heartbeats of jobs that are no longer processing."""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return
+    try:
+        get_redis().zrem(HEARTBEAT_KEY, *job_ids)
+    except Exception as e:
+        logger.warning(f"Failed to clear heartbeats for {len(job_ids)} jobs: {e}")
+
+
+def stale(before: float, limit: int) -> List[str]:
+    """IDs of up to ``limit`` jobs whose last heartbeat is older than ``before`` (unix time), oldest first."""
+    return [
+        job_id.decode()
+        for job_id in get_redis().zrangebyscore(HEARTBEAT_KEY, "-inf", before, start=0, num=limit)
+    ]
+
+
+def fresh(job_ids: Iterable[str], since: float) -> Set[str]:
+    """Those of ``job_ids`` with a heartbeat dated ``since`` (unix time) or later."""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return set()
+    scores = get_redis().zmscore(HEARTBEAT_KEY, job_ids)
+    return {job_id for job_id, score in zip(job_ids, scores) if score is not None and score >= since}
+
+
+def _beat_tracked() -> None:
+    while True:
+        time.sleep(settings.job_heartbeat_interval)
+        with _lock:
+            job_ids = list(_tracked)
+        beat(job_ids)
+
+
+def _ensure_thread() -> None:
+    """Start this process's heartbeat thread (again after a fork). Call with ``_lock`` held."""
+    global _thread, _thread_pid
+    if _thread is not None and _thread_pid == os.getpid():
+        return
+    if _thread_pid != os.getpid():
+        _tracked.clear()  # the parent's jobs
+    _thread = threading.Thread(target=_beat_tracked, name="job-heartbeat", daemon=True)
+    _thread_pid = os.getpid()
+    _thread.start()
+
+
+class Attempt:
+    """One attempt at a tracked job. Set ``started`` once it moves the job to processing."""
+
+    def __init__(self):
+        self.started = False
+
+
+def _track(job_id: str) -> None:
+    with _lock:
+        _ensure_thread()
+        _tracked[job_id] += 1
+
+
+def _untrack(job_id: str) -> None:
+    with _lock:
+        _tracked[job_id] -= 1
+        if _tracked[job_id] <= 0:
+            del _tracked[job_id]
+
+
+@contextmanager
+def track(job_id: str):
+    """Keep ``job_id``'s heartbeat fresh while the block runs. Yields an ``Attempt``.
+
+    Enter before the job moves to processing, so a worker lost right after
+    that still leaves a heartbeat behind for the reaper. The heartbeat is
+    cleared on exit only if the attempt was marked ``started``; a duplicate
+    that lost the start leaves the winner's alone.
+    """
+    attempt = Attempt()
+    beat([job_id])
+    _track(job_id)
+    try:
+        yield attempt
+    finally:
+        _untrack(job_id)
+        if attempt.started:
+            clear([job_id])
+
+
+@asynccontextmanager
+async def async_track(job_id: str):
+    """``track`` for the asyncio worker."""
+    attempt = Attempt()
+    redis = get_async_redis()
+    try:
+        await redis.zadd(HEARTBEAT_KEY, {job_id: time.time()})
+    except Exception as e:
+        logger.warning(f"Failed to record heartbeat for job {job_id}: {e}")
+    _track(job_id)
+    try:
+        yield attempt
+    finally:
+        _untrack(job_id)
+        if attempt.started:
+            try:
+                await redis.zrem(HEARTBEAT_KEY, job_id)
+            except Exception as e:
+                logger.warning(f"Failed to clear heartbeat for job {job_id}: {e}")
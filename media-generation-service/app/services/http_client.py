@@ -0,0 +1,218 @@
+import httpx
+import importlib.util
+import logging
+import os
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from app.core.config import settings
+from app.core import tracing
+from app.core.metrics import REPLICATE_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class ThrottledError(Exception):
+    """Raised when Replicate answers 429. ``retry_after`` is in seconds, if it said."""
+
+    def __init__(self, retry_after: Optional[float] = None):
+        self.retry_after = retry_after
+        super().__init__(f"Throttled by upstream (retry after {retry_after}s)")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delay in seconds or an HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def replicate_operation(request: httpx.Request) -> str:
+    """Name a Replicate API call for metrics without using its (high-cardinality) path."""
+    path = request.url.path.rstrip("/")
+    if path.endswith("/cancel"):
+        return "cancel_prediction"
+    if path.endswith("/predictions"):
+        return "create_prediction" if request.method == "POST" else "list_predictions"
+    if "/predictions/" in path:
+        return "get_prediction"
+    return request.method.lower()
+
+
+def _observe_replicate_call(request: httpx.Request, status: str, started: float) -> None:
+    REPLICATE_REQUEST_SECONDS.labels(replicate_operation(request), status).observe(time.perf_counter() - started)
+
+
+def _replicate_span(request: httpx.Request):
+    return tracing.span(
+        f"replicate.{replicate_operation(request)}",
+        kind=tracing.SpanKind.CLIENT,
+        **{"http.method": request.method, "http.url": str(request.url.copy_with(query=None))}
+    )
+
+
+class ThrottleAwareTransport(httpx.HTTPTransport):
+    """Raises ThrottledError on 429 instead of returning the response.
+
+    The Replicate client drops response headers when it builds its errors and
+    retries throttled GETs by sleeping in place; raising here keeps Retry-After
+    and lets callers reschedule instead of blocking a worker. Every call's
+    latency is recorded (time to response headers).
+    """
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        with _replicate_span(request) as current:
+            try:
+                response = super().handle_request(request)
+            except Exception:
+                _observe_replicate_call(request, "error", started)
+                raise
+            current.set_attribute("http.status_code", response.status_code)
+        _observe_replicate_call(request, str(response.status_code), started)
+        if response.status_code == 429:
+            response.close()
+            raise ThrottledError(parse_retry_after(response.headers.get("retry-after")))
+        return response
+
+
+class AsyncThrottleAwareTransport(httpx.AsyncHTTPTransport):
+    """Async counterpart of ThrottleAwareTransport."""
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        with _replicate_span(request) as current:
+            try:
+                response = await super().handle_async_request(request)
+            except Exception:
+                _observe_replicate_call(request, "error", started)
+                raise
+            current.set_attribute("http.status_code", response.status_code)
+        _observe_replicate_call(request, str(response.status_code), started)
+        if response.status_code == 429:
+            await response.aclose()
+            raise ThrottledError(parse_retry_after(response.headers.get("retry-after")))
+        return response
+
+
+# Connection pools are created lazily and owned by the process that created them.
+# Replicate API calls and artifact downloads use separate pools so each upstream
+# host gets its own connection cap.
+_replicate_transport: Optional[httpx.HTTPTransport] = None
+_async_replicate_transport: Optional[httpx.AsyncHTTPTransport] = None
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+
+
+def http2_enabled() -> bool:
+    """HTTP/2 is used when enabled in settings and the h2 package is installed."""
+    return settings.http2_enabled and importlib.util.find_spec("h2") is not None
+
+
+def get_timeout() -> httpx.Timeout:
+    """Timeouts shared by all outbound HTTP calls."""
+    return httpx.Timeout(
+        settings.http_read_timeout,
+        connect=settings.http_connect_timeout,
+        read=settings.http_read_timeout,
+        write=settings.http_read_timeout,
+        pool=settings.http_pool_timeout
+    )
+
+
+def _limits(max_connections: int) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=min(max_connections, settings.http_max_keepalive_connections),
+        keepalive_expiry=settings.http_keepalive_expiry
+    )
+
+
+def get_replicate_transport() -> httpx.HTTPTransport:
+    """Pooled sync transport for the Replicate API."""
+    global _replicate_transport
+    if _replicate_transport is None:
+        _replicate_transport = ThrottleAwareTransport(
+            limits=_limits(settings.replicate_max_connections),
+            http2=http2_enabled()
+        )
+    return _replicate_transport
+
+
+def get_async_replicate_transport() -> httpx.AsyncHTTPTransport:
+    """Pooled async transport for the Replicate API."""
+    global _async_replicate_transport
+    if _async_replicate_transport is None:
+        _async_replicate_transport = AsyncThrottleAwareTransport(
+            limits=_limits(settings.replicate_max_connections),
+            http2=http2_enabled()
+        )
+    return _async_replicate_transport
+
+
+def get_http_client() -> httpx.Client:
+    """Pooled sync client for artifact downloads."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.Client(
+            limits=_limits(settings.http_max_connections),
+            timeout=get_timeout(),
+            http2=http2_enabled(),
+            follow_redirects=True
+        )
+    return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Pooled async client for artifact downloads."""
+    global _async_http_client
+    if _async_http_client is None:
+        _async_http_client = httpx.AsyncClient(
+            limits=_limits(settings.http_max_connections),
+            timeout=get_timeout(),
+            http2=http2_enabled(),
+            follow_redirects=True
+        )
+    return _async_http_client
+
+
+def download_to_file(url: str, local_path: str, chunk_size: int = 64 * 1024) -> int:
+    """Stream ``url`` into ``local_path`` over the pooled client. Returns bytes written."""
+    os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+
+    written = 0
+    with get_http_client().stream("GET", url) as response:
+        response.raise_for_status()
+        with open(local_path, 'wb') as f:
+            for chunk in response.iter_bytes(chunk_size=chunk_size):
+                f.write(chunk)
+                written += len(chunk)
+    return written
+
+
+def reset_http_clients() -> None:
+    """Forget pools inherited from a parent process (call after fork)."""
+    global _replicate_transport, _async_replicate_transport, _http_client, _async_http_client
+    _replicate_transport = None
+    _async_replicate_transport = None
+    _http_client = None
+    _async_http_client = None
+
+
+async def aclose_http_clients() -> None:
+    """Close the async pools (FastAPI shutdown)."""
+    global _async_replicate_transport, _async_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
+    if _async_replicate_transport is not None:
+        await _async_replicate_transport.aclose()
+        _async_replicate_transport = None
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.services.storage import generated_dir, get_storage, variant_key
+
+logger = logging.getLogger(__name__)
+
+# Derived images (resized / transcoded copies of generated artifacts) are rendered
+# in a process pool and kept in an LRU disk cache under storage/variants. Sources
+# never change once written, so a variant keyed by source name, width and format
+# stays valid until it is evicted. With remote storage only the pre-generated
+# thumbnail exists; the API never downloads sources to render them.
+VARIANT_FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+    "png": ("PNG", "image/png", {"optimize": True}),
+}
+FORMAT_ALIASES = {"jpg": "jpeg"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_inflight: Dict[str, asyncio.Future] = {}
+_cache_bytes: Optional[int] = None
+
+
+class VariantError(Exception):
+    """Raised when a variant cannot be produced for a request."""
+
+
+def variants_dir() -> Path:
+    """Directory holding cached variants."""
+    return Path(settings.storage_path) / "variants"
+
+
+def allowed_widths() -> List[int]:
+    return sorted(int(width) for width in settings.variant_widths.split(",") if width.strip())
+
+
+def normalize_width(width: int) -> int:
+    """Snap a requested width up to the nearest configured size.
+
+    Keeping the set of widths small bounds the number of variants per image,
+    so the cache stays effective.
+    """
+    widths = allowed_widths()
+    for allowed in widths:
+        if width <= allowed:
+            return allowed
+    return widths[-1]
+
+
+def normalize_format(fmt: str) -> str:
+    fmt = FORMAT_ALIASES.get(fmt.lower(), fmt.lower())
+    if fmt not in VARIANT_FORMATS:
+        raise VariantError(f"Unsupported format '{fmt}', expected one of {', '.join(VARIANT_FORMATS)}")
+    return fmt
+
+
+def variant_filename(filename: str, width: int, fmt: str) -> str:
+    return f"{Path(filename).stem}-w{width}.{fmt}"
+
+
+def variant_media_type(fmt: str) -> str:
+    return VARIANT_FORMATS[fmt][1]
+
+
+def render_variant(source: str, destination: str, width: int, fmt: str) -> int:
+    """Resize and transcode ``source`` into ``destination``. Returns its size in bytes.
+
+    Runs in a pool process (or inline in workers). Images are only ever scaled
+    down; the output is written to a temp file and renamed into place.
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    pil_format, _, save_options = VARIANT_FORMATS[fmt]
+    temp_path = f"{destination}.{uuid.uuid4().hex}.part"
+    try:
+        try:
+            image = Image.open(source)
+        except UnidentifiedImageError:
+            raise VariantError(f"{os.path.basename(source)} is not an image")
+        with image:
+            # Lets the JPEG decoder downscale while decoding
+            image.draft("RGB", (width, width))
+            if image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                image.thumbnail((width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+            if fmt == "jpeg" and image.mode != "RGB":
+                image = image.convert("RGB")
+            elif image.mode not in ("RGB", "RGBA", "L", "LA"):
+                image = image.convert("RGBA")
+            image.save(temp_path, pil_format, **save_options)
+        os.replace(temp_path, destination)
+        return os.path.getsize(destination)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Process pool for image rendering, created on first use."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.variant_workers or None)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    """Stop the render pool (FastAPI shutdown)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def evict_variants() -> int:
+    """Delete least recently used variants until the cache fits its byte budget.
+
+    Recency is the file mtime, which is bumped on every cache hit. Returns the
+    number of bytes left in the cache.
+    """
+    entries = []
+    for entry in os.scandir(variants_dir()):
+        if entry.is_file() and not entry.name.endswith(".part"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    if total <= settings.variant_cache_max_bytes:
+        return total
+
+    # Evict down to 90% of the budget so eviction doesn't run on every render
+    target = int(settings.variant_cache_max_bytes * 0.9)
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        evicted += 1
+    logger.info(f"Evicted {evicted} cached variants, {total} bytes remain")
+    return total
+
+
+def _record_cached_bytes(size: int) -> None:
+    global _cache_bytes
+    if _cache_bytes is None:
+        # First render in this process: the scan already includes the new file
+        _cache_bytes = evict_variants()
+        return
+    _cache_bytes += size
+    if _cache_bytes > settings.variant_cache_max_bytes:
+        _cache_bytes = evict_variants()
+
+
+def _touch(path: Path) -> bool:
+    """Mark a cached variant as recently used. Returns False if it is gone."""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def pregenerate_thumbnail(source: Path, filename: str, mime_type: str) -> None:
+    """Render and store the standard gallery thumbnail for a new artifact (best effort).
+
+    ``source`` is the artifact's local spool file; the thumbnail goes to the
+    configured storage backend alongside it.
+    """
+    if not settings.pregenerate_thumbnails or not mime_type.startswith("image/"):
+        return
+    try:
+        fmt = normalize_format(settings.thumbnail_format)
+        width = normalize_width(settings.thumbnail_width)
+        key = variant_key(variant_filename(filename, width, fmt))
+        storage = get_storage()
+        if storage.exists(key):
+            return
+
+        temp_path = source.parent / f"{uuid.uuid4().hex}.{fmt}"
+        size = render_variant(str(source), str(temp_path), width, fmt)
+        if storage.save_file(str(temp_path), key, variant_media_type(fmt)) and storage.is_local:
+            _record_cached_bytes(size)
+    except Exception as e:
+        logger.warning(f"Failed to pre-generate thumbnail for {filename}: {e}")
+
+
+async def get_variant(filename: str, width: int, fmt: str) -> Path:
+    """Return the cached variant, rendering it in the process pool on a miss.
+
+    Concurrent requests for the same variant share one render.
+    """
+    source = generated_dir() / filename
+    destination = variants_dir() / variant_filename(filename, width, fmt)
+    if await asyncio.to_thread(_touch, destination):
+        return destination
+    if not await asyncio.to_thread(source.is_file):
+        raise FileNotFoundError(filename)
+
+    key = destination.name
+    future = _inflight.get(key)
+    if future is None:
+        await asyncio.to_thread(destination.parent.mkdir, parents=True, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(get_pool(), render_variant, str(source), str(destination), width, fmt)
+        _inflight[key] = future
+        try:
+            size = await asyncio.shield(future)
+        finally:
+            _inflight.pop(key, None)
+        # Eviction scans the directory, so keep it off the event loop too
+        await asyncio.to_thread(_record_cached_bytes, size)
+    else:
+        await asyncio.shield(future)
+    return destination
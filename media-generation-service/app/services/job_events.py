@@ -0,0 +1,156 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
+from app.services import status_cache
+
+logger = logging.getLogger(__name__)
+
+
+class JobEventBroker:
+    """Fans job status events from Redis pub/sub out to local subscribers.
+
+    Workers publish every transition on ``job-events:{job_id}`` (see
+    ``status_cache.cache_job_status``), so any API replica can serve any
+    subscriber. Each process holds a single pub/sub connection and only
+    subscribes to channels that at least one local client is following.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self._queue_size = queue_size
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    async def subscribe(self, job_ids: Iterable[str]) -> asyncio.Queue:
+        """Start receiving events for ``job_ids`` on a new queue."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
+        channels = [status_cache.event_channel(job_id) for job_id in job_ids]
+
+        async with self._lock:
+            if self._pubsub is None:
+                self._pubsub = status_cache.get_async_redis().pubsub()
+
+            new_channels = [channel for channel in channels if not self._subscribers[channel]]
+            for channel in channels:
+                self._subscribers[channel].add(queue)
+            if new_channels:
+                await self._pubsub.subscribe(*new_channels)
+
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read_loop())
+        return queue
+
+    async def unsubscribe(self, job_ids: Iterable[str], queue: asyncio.Queue) -> None:
+        """Stop delivering events for ``job_ids`` to ``queue``."""
+        async with self._lock:
+            idle_channels = []
+            for job_id in job_ids:
+                channel = status_cache.event_channel(job_id)
+                self._subscribers[channel].discard(queue)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+                    idle_channels.append(channel)
+            if idle_channels and self._pubsub is not None:
+                try:
+                    await self._pubsub.unsubscribe(*idle_channels)
+                except Exception as e:
+                    logger.warning(f"Failed to unsubscribe from {len(idle_channels)} job channels: {e}")
+
+    async def _read_loop(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # redis-py reconnects and resubscribes on the next read
+                logger.warning(f"Job event subscription error: {e}")
+                await asyncio.sleep(1.0)
+                continue
+
+            if not message or message.get("type") != "message":
+                continue
+
+            channel = message["channel"].decode()
+            for queue in list(self._subscribers.get(channel, ())):
+                if queue.full():
+                    # Events are full snapshots, so dropping the oldest loses nothing final
+                    queue.get_nowait()
+                queue.put_nowait(message["data"])
+
+    async def aclose(self) -> None:
+        """Stop the reader and close the pub/sub connection (FastAPI shutdown)."""
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        self._subscribers.clear()
+
+
+def _parse(payload: bytes) -> Optional[dict]:
+    try:
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+def is_terminal_payload(payload: bytes) -> bool:
+    """Check whether a serialized status payload is final (see status_cache.is_terminal)."""
+    status = _parse(payload)
+    return bool(status) and status_cache.is_terminal(status.get("status"), status.get("retry_count"))
+
+
+async def iter_job_events(
+    job_ids: List[str],
+    queue: asyncio.Queue,
+    snapshot: Dict[str, bytes],
+    heartbeat: float
+) -> AsyncIterator[Optional[bytes]]:
+    """Yield each job's current status, then every transition until all are finished for good.
+
+    A failed job awaiting a retry keeps its stream open. Events no newer than
+    the last one yielded for their job (by version) are skipped: they arrive
+    late or twice when writers race. Yields ``None`` when nothing happened for
+    ``heartbeat`` seconds so callers can keep the connection alive. The
+    caller owns the subscription and must unsubscribe ``queue`` when done.
+    """
+    pending = set(job_ids)
+    versions: Dict[str, int] = {}
+
+    def newer(status: Optional[dict]) -> bool:
+        if not status or "id" not in status:
+            return False
+        version = status.get("version", 0)
+        if status["id"] in versions and version <= versions[status["id"]]:
+            return False
+        versions[status["id"]] = version
+        return True
+
+    for job_id, payload in snapshot.items():
+        newer(_parse(payload))
+        yield payload
+        if is_terminal_payload(payload):
+            pending.discard(job_id)
+
+    while pending:
+        try:
+            payload = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+        except asyncio.TimeoutError:
+            yield None
+            continue
+
+        status = _parse(payload)
+        if not newer(status):
+            continue
+        yield payload
+        if is_terminal_payload(payload):
+            pending.discard(status["id"])
+
+
+# Global broker instance (one pub/sub connection per API process)
+job_event_broker = JobEventBroker()
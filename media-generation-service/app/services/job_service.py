@@ -1,86 +1,473 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import select, desc, update, delete
-from app.models.job import Job
+from sqlalchemy import select, desc, update, delete, insert, func, or_, and_, tuple_, case, cast, Float, literal_column
+from sqlalchemy.dialects import postgresql
+from app.models.job import Job, JobOutbox
 from app.models.schemas import JobCreate, JobStatus, JobUpdate
-from typing import Optional, List
+from app.core import tracing
+from app.services import status_cache
+from typing import Optional, List, Dict, Tuple, Iterable, Union, Any
+from enum import Enum
+from datetime import datetime, timedelta, timezone
+from app.core.config import settings
 import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 
+StatusFilter = Optional[Iterable[Union[JobStatus, str]]]
+
+LATENCY_PERCENTILES = (0.5, 0.95, 0.99)
+
+# Columns served by the job list endpoints. The prompt and parameters can be
+# long, so they are only selected when asked for (?fields=).
+JOB_LIST_COLUMNS = (
+    Job.id, Job.model, Job.status, Job.batch_id, Job.created_at, Job.updated_at,
+    Job.media_path, Job.mime_type, Job.byte_size, Job.error_message, Job.retry_count,
+)
+JOB_LIST_OPTIONAL_COLUMNS = {"prompt": Job.prompt, "parameters": Job.parameters}
+
+
+def _seconds_between(start, end):
+    return cast(func.extract("epoch", end - start), Float)
+
+
+def _latency_stages() -> Dict[str, Any]:
+    """Duration expressions (seconds) for each stage of a completed job.
+
+    enqueued_at is only set on the first hand-off, so queue_wait is counted for
+    first attempts only; the other stages describe the latest attempt.
+    """
+    return {
+        "scheduler_wait": _seconds_between(Job.created_at, Job.enqueued_at),
+        "queue_wait": case(
+            (Job.retry_count == 0, _seconds_between(Job.enqueued_at, Job.started_at))
+        ),
+        "submit": _seconds_between(Job.started_at, Job.prediction_created_at),
+        "prediction": _seconds_between(Job.prediction_created_at, Job.prediction_finished_at),
+        "store": _seconds_between(Job.prediction_finished_at, Job.stored_at),
+        "total": _seconds_between(Job.created_at, Job.stored_at),
+    }
+
+
+def _outbox_row(job_id: str, job_data: JobCreate, trace: Dict[str, str]) -> Dict[str, Any]:
+    """The outbox entry that gets a new job published (see app/services/outbox.py)."""
+    return {
+        "job_id": job_id,
+        "payload": {
+            "model": job_data.model,
+            "input_data": {"prompt": job_data.prompt, **(job_data.parameters or {})},
+            "tenant_id": job_data.tenant_id,
+            # Lets the relay publish under the submitting request's trace
+            "trace": trace,
+        },
+    }
+
+
+def _update_values(job_update: JobUpdate) -> Dict[str, Any]:
+    """Column values for an UPDATE from the fields set on ``job_update``."""
+    return {
+        key: value.value if isinstance(value, Enum) else value
+        for key, value in job_update.model_dump(exclude_unset=True).items()
+    }
+
+
+def _fail_values(error_message: str, discard_prediction: bool) -> Dict[str, Any]:
+    """Column values for a failed attempt (see SyncJobService.fail_job)."""
+    values = {
+        "status": JobStatus.FAILED.value,
+        "error_message": error_message,
+        "retry_count": func.coalesce(Job.retry_count, 0) + 1,
+    }
+    if discard_prediction:
+        values["replicate_prediction_id"] = None
+        values["prediction_output_url"] = None
+    return values
+
+
+# Statuses a job can be cancelled from (failed only while a retry is still to come)
+CANCELLABLE_STATUSES = (JobStatus.PENDING, JobStatus.PROCESSING, JobStatus.FAILED)
+
+
+def _cancellable(statuses: StatusFilter):
+    """Condition matching unfinished jobs in ``statuses`` (default: all of CANCELLABLE_STATUSES)."""
+    statuses = {JobStatus(status).value for status in (statuses or CANCELLABLE_STATUSES)}
+    conditions = []
+    active = statuses & {JobStatus.PENDING.value, JobStatus.PROCESSING.value}
+    if active:
+        conditions.append(Job.status.in_(sorted(active)))
+    if JobStatus.FAILED.value in statuses:
+        conditions.append(and_(
+            Job.status == JobStatus.FAILED.value,
+            func.coalesce(Job.retry_count, 0) < settings.max_retries
+        ))
+    return or_(*conditions)
+
+
+def _finished():
+    """Condition matching jobs that are finished for good (see status_cache.is_terminal)."""
+    return or_(
+        Job.status.in_([JobStatus.COMPLETED.value, JobStatus.CANCELLED.value]),
+        and_(
+            Job.status == JobStatus.FAILED.value,
+            func.coalesce(Job.retry_count, 0) >= settings.max_retries
+        )
+    )
+
+
+def _guarded_update(job_id: str, values: Dict[str, Any], expected_status: StatusFilter):
+    """UPDATE ... RETURNING for one job, optionally only from ``expected_status``.
+
+    The status guard makes transitions safe against concurrent writers (retries,
+    webhooks, sweeps): a transition from an unexpected state matches no row.
+    The returned row replaces any copy of the job already in the session, so
+    callers (and the status cache) see the values just written.
+    """
+    stmt = update(Job).where(Job.id == job_id)
+    if expected_status is not None:
+        stmt = stmt.where(Job.status.in_([
+            status.value if isinstance(status, Enum) else status for status in expected_status
+        ]))
+    return (
+        stmt.values(**values, version=Job.version + 1)
+        .returning(Job)
+        .execution_options(synchronize_session="fetch")
+    )
+
 
 class AsyncJobService:
     """Async service for FastAPI endpoints."""
     
     @staticmethod
-    async def create_job(db: AsyncSession, job_data: JobCreate) -> Job:
-        """Create a new job in the database."""
+    async def create_job(db: AsyncSession, job_data: JobCreate, job_id: Optional[str] = None) -> Job:
+        """Create a new job and its outbox entry in one transaction.
+
+        The outbox relay publishes the job after the commit, so a job is never
+        committed without being enqueued, nor enqueued without being committed.
+        """
         job = Job(
-            id=str(uuid.uuid4()),
+            id=job_id or str(uuid.uuid4()),
             prompt=job_data.prompt,
             model=job_data.model,
             parameters=job_data.parameters,
-            status=JobStatus.PENDING.value
+            status=JobStatus.PENDING.value,
+            request_hash=job_data.request_hash,
+            tenant_id=job_data.tenant_id
         )
         db.add(job)
+        db.add(JobOutbox(**_outbox_row(job.id, job_data, tracing.carrier())))
         await db.commit()
         await db.refresh(job)
+        await status_cache.async_cache_job_status(job)
         logger.info(f"Created job {job.id}")
         return job
 
     @staticmethod
-    async def get_job(db: AsyncSession, job_id: str) -> Optional[Job]:
-        """Get a job by ID."""
-        result = await db.execute(select(Job).where(Job.id == job_id))
-        return result.scalar_one_or_none()
+    async def create_jobs(db: AsyncSession, jobs_data: List[JobCreate], batch_id: str) -> List[Job]:
+        """Create a batch of jobs with a single multi-row INSERT ... RETURNING.
+
+        Their outbox entries go in with a second INSERT in the same transaction.
+        Jobs are returned in the same order as ``jobs_data``.
+        """
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "prompt": job_data.prompt,
+                "model": job_data.model,
+                "parameters": job_data.parameters,
+                "status": JobStatus.PENDING.value,
+                "batch_id": batch_id,
+                "request_hash": job_data.request_hash,
+                "tenant_id": job_data.tenant_id,
+                "retry_count": 0,
+            }
+            for job_data in jobs_data
+        ]
+        result = await db.scalars(insert(Job).values(rows).returning(Job))
+        # RETURNING order isn't guaranteed; hand jobs back in request order
+        position = {row["id"]: index for index, row in enumerate(rows)}
+        jobs = sorted(result.all(), key=lambda job: position[job.id])
+        trace = tracing.carrier()
+        await db.execute(insert(JobOutbox).values([
+            _outbox_row(row["id"], job_data, trace) for row, job_data in zip(rows, jobs_data)
+        ]))
+        await db.commit()
+        await status_cache.async_cache_job_statuses(jobs)
+        logger.info(f"Created batch {batch_id} with {len(jobs)} jobs")
+        return jobs
 
     @staticmethod
-    async def get_recent_jobs(db: AsyncSession, skip: int = 0, limit: int = 20) -> List[Job]:
-        """Get recent jobs ordered by creation date."""
+    async def find_reusable_jobs(db: AsyncSession, request_hashes: List[str]) -> Dict[str, Job]:
+        """Find a job whose result can be reused for each request hash.
+
+        Completed jobs win over in-flight ones. Local images stay reusable until
+        the cleanup endpoints delete the row; CDN URLs expire upstream, so those
+        jobs are only reused for ``dedup_cdn_ttl`` seconds after completion.
+        """
+        if not request_hashes:
+            return {}
+        cdn_cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.dedup_cdn_ttl)
         result = await db.execute(
             select(Job)
+            .where(
+                Job.request_hash.in_(request_hashes),
+                or_(
+                    Job.status.in_([JobStatus.PENDING.value, JobStatus.PROCESSING.value]),
+                    and_(
+                        Job.status == JobStatus.COMPLETED.value,
+                        Job.media_path.isnot(None),
+                        or_(
+                            Job.media_path.like('/images/%'),
+                            func.coalesce(Job.updated_at, Job.created_at) >= cdn_cutoff
+                        )
+                    )
+                )
+            )
             .order_by(desc(Job.created_at))
-            .offset(skip)
-            .limit(limit)
         )
-        return list(result.scalars().all())
+        reusable: Dict[str, Job] = {}
+        for job in result.scalars().all():
+            current = reusable.get(job.request_hash)
+            if current is None or (
+                job.status == JobStatus.COMPLETED.value and current.status != JobStatus.COMPLETED.value
+            ):
+                reusable[job.request_hash] = job
+        return reusable
 
     @staticmethod
-    async def get_completed_jobs(db: AsyncSession, skip: int = 0, limit: int = 20) -> List[Job]:
-        """Get recent completed jobs only, ordered by creation date."""
+    async def get_batch_counts(db: AsyncSession, batch_id: str) -> Tuple[Dict[str, int], int]:
+        """Count a batch's jobs per status, and how many of them are finished for good.
+
+        Failed jobs awaiting a retry are counted as failed but not as finished.
+        """
         result = await db.execute(
-            select(Job)
-            .where(Job.status == JobStatus.COMPLETED.value)
-            .order_by(desc(Job.created_at))
-            .offset(skip)
-            .limit(limit)
+            select(Job.status, func.count(), func.count().filter(_finished()))
+            .where(Job.batch_id == batch_id)
+            .group_by(Job.status)
         )
+        rows = result.all()
+        return {job_status: count for job_status, count, _ in rows}, sum(finished for _, _, finished in rows)
+
+    @staticmethod
+    async def get_job(db: AsyncSession, job_id: str) -> Optional[Job]:
+        """Get a job by ID."""
+        result = await db.execute(select(Job).where(Job.id == job_id))
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_jobs(db: AsyncSession, job_ids: List[str]) -> List[Job]:
+        """Get several jobs by ID (missing IDs are skipped)."""
+        if not job_ids:
+            return []
+        result = await db.execute(select(Job).where(Job.id.in_(job_ids)))
         return list(result.scalars().all())
 
     @staticmethod
-    async def update_job(db: AsyncSession, job_id: str, job_update: JobUpdate) -> Optional[Job]:
-        """Update a job's status and other fields."""
-        update_data = job_update.model_dump(exclude_unset=True)
+    async def get_job_by_prediction_id(db: AsyncSession, prediction_id: str) -> Optional[Job]:
+        """Get a job by its Replicate prediction ID."""
+        result = await db.execute(select(Job).where(Job.replicate_prediction_id == prediction_id))
+        return result.scalars().first()
+
+    @staticmethod
+    def _paginate(query, skip: int, limit: int, after: Optional[Tuple[datetime, str]]):
+        """Order newest first and apply keyset (``after``) or offset pagination."""
+        if after is not None:
+            query = query.where(tuple_(Job.created_at, Job.id) < tuple_(*after))
+        else:
+            query = query.offset(skip)
+        return query.order_by(desc(Job.created_at), desc(Job.id)).limit(limit)
+
+    @staticmethod
+    async def get_job_rows(
+        db: AsyncSession,
+        fields: Iterable[str] = (),
+        completed_only: bool = False,
+        skip: int = 0,
+        limit: int = 20,
+        after: Optional[Tuple[datetime, str]] = None
+    ) -> Tuple[List[str], List[tuple]]:
+        """Column names and plain row tuples for a page of jobs, newest first.
+
+        Skips building ORM objects; ``fields`` adds optional columns from
+        JOB_LIST_OPTIONAL_COLUMNS. ``after`` is a ``(created_at, id)`` keyset
+        cursor; when given, ``skip`` is ignored.
+        """
+        columns = list(JOB_LIST_COLUMNS) + [JOB_LIST_OPTIONAL_COLUMNS[field] for field in fields]
+        query = select(*columns)
+        if completed_only:
+            query = query.where(Job.status == JobStatus.COMPLETED.value)
+        result = await db.execute(AsyncJobService._paginate(query, skip, limit, after))
+        return list(result.keys()), [tuple(row) for row in result.all()]
+
+    @staticmethod
+    async def get_latency_stats(
+        db: AsyncSession,
+        since: datetime,
+        bucket_seconds: Optional[int] = None,
+        model: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """p50/p95/p99 of each stage's duration per model, for jobs completed since ``since``.
+
+        Aggregated in Postgres with percentile_cont, from an index-only scan of
+        ix_jobs_completed_stage_times; with ``bucket_seconds`` also per time
+        bucket of creation time.
+        """
+        stages = _latency_stages()
+        columns = [
+            Job.model,
+            func.count().label("jobs"),
+            func.avg(Job.byte_size).label("avg_byte_size"),
+        ]
+        group_by = [Job.model]
+        if bucket_seconds:
+            # Inlined so the SELECT and GROUP BY expressions are identical
+            bucket = literal_column(str(int(bucket_seconds)))
+            bucket_start = func.to_timestamp(
+                func.floor(func.extract("epoch", Job.created_at) / bucket) * bucket
+            ).label("bucket_start")
+            columns.append(bucket_start)
+            group_by.append(bucket_start)
+        for name, seconds in stages.items():
+            columns.append(
+                func.percentile_cont(postgresql.array(LATENCY_PERCENTILES))
+                .within_group(seconds)
+                .label(name)
+            )
+
+        query = (
+            select(*columns)
+            # Inlined rather than bound so the planner can match the partial
+            # index predicate in generic (prepared) plans too
+            .where(Job.status == literal_column(f"'{JobStatus.COMPLETED.value}'"))
+            .where(Job.created_at >= since)
+            .group_by(*group_by)
+            .order_by(*group_by)
+        )
+        if model:
+            query = query.where(Job.model == model)
+
+        result = await db.execute(query)
+        rows = []
+        for row in result.mappings():
+            rows.append({
+                "model": row["model"],
+                "bucket_start": row.get("bucket_start"),
+                "jobs": row["jobs"],
+                "avg_byte_size": float(row["avg_byte_size"]) if row["avg_byte_size"] is not None else None,
+                "stages": {
+                    name: dict(zip(("p50", "p95", "p99"), row[name] or (None, None, None)))
+                    for name in stages
+                },
+            })
+        return rows
+
+    @staticmethod
+    async def update_job(
+        db: AsyncSession,
+        job_id: str,
+        job_update: JobUpdate,
+        expected_status: StatusFilter = None
+    ) -> Optional[Job]:
+        """Update a job's status and other fields with a single UPDATE ... RETURNING.
+
+        With ``expected_status`` the update only applies while the job is in one
+        of those statuses; None is returned otherwise.
+        """
+        update_data = _update_values(job_update)
         if not update_data:
             return await AsyncJobService.get_job(db, job_id)
         
-        await db.execute(
+        result = await db.execute(_guarded_update(job_id, update_data, expected_status))
+        job = result.scalar_one_or_none()
+        await db.commit()
+        if job:
+            await status_cache.async_cache_job_status(job, publish=True)
+        return job
+
+    @staticmethod
+    async def fail_job(
+        db: AsyncSession,
+        job_id: str,
+        error_message: str,
+        expected_status: StatusFilter = (JobStatus.PENDING, JobStatus.PROCESSING),
+        discard_prediction: bool = False
+    ) -> Optional[Job]:
+        """Mark a job failed and bump its retry count in one statement (see SyncJobService.fail_job)."""
+        values = _fail_values(error_message, discard_prediction)
+        result = await db.execute(_guarded_update(job_id, values, expected_status))
+        job = result.scalar_one_or_none()
+        await db.commit()
+        if job is None:
+            logger.info(f"Not failing job {job_id}: job missing or no longer in {expected_status}")
+            return None
+        
+        await status_cache.async_cache_job_status(job, publish=True)
+        logger.info(f"Marked job {job_id} failed (retry_count={job.retry_count})")
+        return job
+
+    @staticmethod
+    async def cancel_jobs(
+        db: AsyncSession,
+        job_ids: Optional[List[str]] = None,
+        batch_id: Optional[str] = None,
+        model: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+        statuses: StatusFilter = None,
+        limit: Optional[int] = None
+    ) -> List[Job]:
+        """Cancel the unfinished jobs matching every given filter in one UPDATE ... RETURNING.
+
+        Pending and processing jobs are cancelled, and failed ones with a retry
+        still to come; ``statuses`` narrows that down. Being a guarded
+        transition, it leaves jobs that finish meanwhile alone, and a queued or
+        retrying job that is cancelled is never started (see start_job).
+        Outbox entries of jobs not yet published are deleted in the same
+        transaction. With ``limit``, only that many are cancelled (call again
+        for the next chunk), so a bulk cancel never holds its locks for long.
+        Returns the cancelled jobs.
+        """
+        filters = []
+        if job_ids is not None:
+            filters.append(Job.id.in_(job_ids))
+        if batch_id is not None:
+            filters.append(Job.batch_id == batch_id)
+        if model is not None:
+            filters.append(Job.model == model)
+        if tenant_id is not None:
+            filters.append(Job.tenant_id == tenant_id)
+        filters.append(_cancellable(statuses))
+        if limit is not None:
+            filters.append(Job.id.in_(select(Job.id).where(*filters).order_by(Job.id).limit(limit)))
+        
+        result = await db.execute(
             update(Job)
-            .where(Job.id == job_id)
-            .values(**update_data)
+            .where(*filters)
+            .values(status=JobStatus.CANCELLED.value, version=Job.version + 1)
+            .returning(Job)
+            .execution_options(synchronize_session="fetch")
         )
+        jobs = list(result.scalars().all())
+        if jobs:
+            await db.execute(
+                delete(JobOutbox)
+                .where(JobOutbox.job_id.in_([job.id for job in jobs]))
+                .execution_options(synchronize_session=False)
+            )
         await db.commit()
-        return await AsyncJobService.get_job(db, job_id)
+        await status_cache.async_cache_job_statuses(jobs, publish=True)
+        logger.info(f"Cancelled {len(jobs)} jobs")
+        return jobs
 
     @staticmethod
     async def delete_failed_jobs(db: AsyncSession) -> int:
         """Delete all failed jobs from the database."""
         result = await db.execute(
-            delete(Job).where(Job.status == JobStatus.FAILED.value)
+            delete(Job).where(Job.status == JobStatus.FAILED.value).returning(Job.id)
         )
+        deleted_ids = list(result.scalars().all())
         await db.commit()
-        deleted_count = result.rowcount or 0
+        await status_cache.async_invalidate(deleted_ids)
+        deleted_count = len(deleted_ids)
         logger.info(f"Deleted {deleted_count} failed jobs")
         return deleted_count
 
@@ -91,91 +478,15 @@ class AsyncJobService:
             delete(Job).where(
                 (Job.status == JobStatus.COMPLETED.value) &
                 (Job.media_path.like('/images/%'))
-            )
+            ).returning(Job.id)
         )
+        deleted_ids = list(result.scalars().all())
         await db.commit()
-        deleted_count = result.rowcount or 0
+        await status_cache.async_invalidate(deleted_ids)
+        deleted_count = len(deleted_ids)
         logger.info(f"Deleted {deleted_count} jobs with broken local image paths")
         return deleted_count
 
-    @staticmethod
-    async def delete_jobs_with_missing_images(db: AsyncSession) -> int:
-        """Delete completed jobs where the image file doesn't exist on disk."""
-        from pathlib import Path
-        
-        # Get all completed jobs with local image paths (both formats)
-        result = await db.execute(
-            select(Job).where(
-                (Job.status == JobStatus.COMPLETED.value) &
-                (
-                    (Job.media_path.like('/images/%')) |
-                    (Job.media_path.like('./storage/generated/%'))
-                )
-            )
-        )
-        jobs = result.scalars().all()
-        
-        jobs_to_delete = []
-        for job in jobs:
-            if job.media_path:
-                # Extract filename from different path formats
-                if job.media_path.startswith('/images/'):
-                    filename = job.media_path.split('/')[-1]
-                elif job.media_path.startswith('./storage/generated/'):
-                    filename = job.media_path.split('/')[-1]
-                else:
-                    continue
-                    
-                image_path = Path("storage/generated") / filename
-                
-                if not image_path.exists():
-                    jobs_to_delete.append(job.id)
-                    logger.info(f"Image file not found for job {job.id}: {image_path} (media_path: {job.media_path})")
-        
-        if jobs_to_delete:
-            await db.execute(
-                delete(Job).where(Job.id.in_(jobs_to_delete))
-            )
-            await db.commit()
-            
-        deleted_count = len(jobs_to_delete)
-        logger.info(f"Deleted {deleted_count} jobs with missing image files")
-        return deleted_count
-
-    @staticmethod
-    async def fix_incorrect_image_paths(db: AsyncSession) -> int:
-        """Fix jobs with incorrect image paths (./storage/generated/ format)."""
-        # Get jobs with old path format
-        result = await db.execute(
-            select(Job).where(
-                (Job.status == JobStatus.COMPLETED.value) &
-                (Job.media_path.like('./storage/generated/%'))
-            )
-        )
-        jobs = result.scalars().all()
-        
-        fixed_count = 0
-        for job in jobs:
-            if job.media_path:
-                # Extract filename and convert to new format
-                filename = job.media_path.split('/')[-1]
-                new_path = f"/images/{filename}"
-                
-                # Update the job with correct path
-                await db.execute(
-                    update(Job)
-                    .where(Job.id == job.id)
-                    .values(media_path=new_path)
-                )
-                fixed_count += 1
-                logger.info(f"Fixed path for job {job.id}: {job.media_path} -> {new_path}")
-        
-        if fixed_count > 0:
-            await db.commit()
-            
-        logger.info(f"Fixed {fixed_count} jobs with incorrect image paths")
-        return fixed_count
-
 
 class SyncJobService:
     """Sync service for Celery tasks."""
@@ -186,27 +497,121 @@ class SyncJobService:
         return db.query(Job).filter(Job.id == job_id).first()
 
     @staticmethod
-    def update_job(db: Session, job_id: str, job_update: JobUpdate) -> Optional[Job]:
-        """Update a job's status and other fields."""
-        job = SyncJobService.get_job(db, job_id)
-        if not job:
-            return None
-            
-        update_data = job_update.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(job, key, value)
+    def get_stale_predictions(db: Session, older_than: datetime, limit: int = 500) -> List[Job]:
+        """Get processing jobs with a prediction that hasn't been updated since ``older_than``."""
+        return (
+            db.query(Job)
+            .filter(
+                Job.status == JobStatus.PROCESSING.value,
+                Job.replicate_prediction_id.isnot(None),
+                Job.updated_at < older_than
+            )
+            .order_by(Job.updated_at)
+            .limit(limit)
+            .all()
+        )
+
+    @staticmethod
+    def get_stuck_jobs(
+        db: Session,
+        job_ids: List[str],
+        untouched_since: datetime,
+        limit: int = 500
+    ) -> List[Job]:
+        """Processing jobs among ``job_ids`` (stale heartbeats), or not updated since ``untouched_since``.
+
+        Two queries rather than one OR: each is a range on its own index (the
+        primary key, the partial processing index), so only stuck jobs are read.
+        An OR makes Postgres filter every processing job.
+        """
+        processing = Job.status == JobStatus.PROCESSING.value
+        jobs = db.query(Job).filter(processing, Job.id.in_(job_ids)).all() if job_ids else []
+        seen = {job.id for job in jobs}
+        untouched = (
+            db.query(Job)
+            .filter(processing, Job.updated_at < untouched_since)
+            .order_by(Job.updated_at)
+            .limit(limit)
+            .all()
+        )
+        return jobs + [job for job in untouched if job.id not in seen]
+
+    @staticmethod
+    def update_job(
+        db: Session,
+        job_id: str,
+        job_update: JobUpdate,
+        expected_status: StatusFilter = None
+    ) -> Optional[Job]:
+        """Update a job's status and other fields with a single UPDATE ... RETURNING.
+
+        With ``expected_status`` this is a guarded transition: it only applies
+        while the job is in one of those statuses, and None is returned otherwise.
+        """
+        update_data = _update_values(job_update)
+        if not update_data:
+            return SyncJobService.get_job(db, job_id)
         
+        job = db.execute(_guarded_update(job_id, update_data, expected_status)).scalar_one_or_none()
         db.commit()
-        db.refresh(job)
+        if job is None:
+            logger.info(f"Skipped update of job {job_id} with {update_data}: job missing or not in {expected_status}")
+            return None
+        
+        status_cache.cache_job_status(job)
         logger.info(f"Updated job {job_id} with {update_data}")
         return job
 
+    @staticmethod
+    def fail_job(
+        db: Session,
+        job_id: str,
+        error_message: str,
+        expected_status: StatusFilter = (JobStatus.PENDING, JobStatus.PROCESSING),
+        discard_prediction: bool = False
+    ) -> Optional[Job]:
+        """Mark a job failed and bump its retry count in one statement.
+
+        Returns None if the job already left ``expected_status`` (for example it
+        was completed by a webhook meanwhile), in which case it must not be retried.
+        The prediction checkpoint is kept for the retry to resume from, unless
+        ``discard_prediction`` (the prediction itself failed).
+        """
+        values = _fail_values(error_message, discard_prediction)
+        job = db.execute(_guarded_update(job_id, values, expected_status)).scalar_one_or_none()
+        db.commit()
+        if job is None:
+            logger.info(f"Not failing job {job_id}: job missing or no longer in {expected_status}")
+            return None
+        
+        status_cache.cache_job_status(job)
+        logger.info(f"Marked job {job_id} failed (retry_count={job.retry_count})")
+        return job
+
+    @staticmethod
+    def mark_enqueued(db: Session, job_ids: List[str], enqueued_at: datetime) -> int:
+        """Record when jobs were first handed to the Celery queue, in one UPDATE.
+
+        Jobs that already have an enqueued_at keep it.
+        """
+        if not job_ids:
+            return 0
+        result = db.execute(
+            update(Job)
+            .where(Job.id.in_(job_ids), Job.enqueued_at.is_(None))
+            .values(enqueued_at=enqueued_at, version=Job.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount
+
     @staticmethod
     def increment_retry_count(db: Session, job_id: str) -> Optional[Job]:
         """Increment the retry count for a job."""
-        job = SyncJobService.get_job(db, job_id)
+        job = db.execute(
+            _guarded_update(job_id, {"retry_count": func.coalesce(Job.retry_count, 0) + 1}, None)
+        ).scalar_one_or_none()
+        db.commit()
         if job:
-            job.retry_count += 1
-            db.commit()
-            db.refresh(job)
-        return job 
\ No newline at end of file
+            status_cache.cache_job_status(job)
+        return job
@@ -0,0 +1,324 @@
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set
+from sqlalchemy import delete, func, literal, or_, select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.job import Job
+from app.models.schemas import JobStatus
+from app.services import status_cache
+from app.services.status_cache import get_async_redis, get_redis
+from app.services.storage import GENERATED_PREFIX, VARIANTS_PREFIX, get_storage
+
+logger = logging.getLogger(__name__)
+
+# Storage and database housekeeping, run by the ``run_maintenance`` Celery task
+# (on Celery beat, or on demand via POST /maintenance/runs) so it never runs in
+# the API process. Rows are streamed with server-side cursors in chunks of
+# ``maintenance_chunk_size``; the artifact store is listed once per run and
+# diffed against the rows instead of being checked file by file.
+#
+# Runs report progress to Redis, where GET /maintenance/runs/{run_id} reads it.
+# A lock keeps runs from overlapping.
+PREFIX = "maintenance:"
+LOCK_KEY = f"{PREFIX}lock"
+LOCK_TTL = 2 * 3600  # matches the task's time limit, so a killed run can't hold it forever
+LATEST_KEY = f"{PREFIX}latest"  # run_id of the most recent run
+RUN_TTL = 7 * 86400  # seconds to keep run reports
+PROGRESS_INTERVAL = 1.0  # seconds between progress writes
+
+LEGACY_PATH_PREFIX = "./storage/generated/"
+IMAGES_PATH_PREFIX = "/images/"
+
+OPERATIONS = ("fix_paths", "missing_artifacts", "orphaned_files")
+
+
+class MaintenanceError(Exception):
+    """Raised for an unknown maintenance operation."""
+
+
+def _run_key(run_id: str) -> str:
+    return f"{PREFIX}run:{run_id}"
+
+
+def parse_operations(operations: Optional[Sequence[str]]) -> List[str]:
+    """Validate operation names; None means all of them, in the standard order."""
+    if not operations:
+        return list(OPERATIONS)
+    unknown = [operation for operation in operations if operation not in OPERATIONS]
+    if unknown:
+        raise MaintenanceError(f"Unknown maintenance operations {unknown}, expected any of {list(OPERATIONS)}")
+    return [operation for operation in OPERATIONS if operation in operations]
+
+
+def _filename(media_path: str) -> str:
+    return media_path.rsplit("/", 1)[-1]
+
+
+def _chunks(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class MaintenanceRun:
+    """State and progress report of one run."""
+
+    def __init__(self, run_id: str, operations: List[str], dry_run: bool):
+        self.run_id = run_id
+        self.operations = operations
+        self.dry_run = dry_run
+        self.report: Dict[str, Any] = {
+            "run_id": run_id,
+            "status": "running",
+            "dry_run": dry_run,
+            "operations": operations,
+            "current": None,
+            "results": {},
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "finished_at": None,
+            "error": None,
+        }
+        self._last_write = 0.0
+
+    def progress(self, operation: str, force: bool = False, **counts: Any) -> None:
+        """Update the counts for ``operation``; written out at most every PROGRESS_INTERVAL."""
+        self.report["current"] = operation
+        self.report["results"].setdefault(operation, {}).update(counts)
+        if force or time.monotonic() - self._last_write >= PROGRESS_INTERVAL:
+            self.save()
+
+    def save(self) -> None:
+        self._last_write = time.monotonic()
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.set(_run_key(self.run_id), json.dumps(self.report), ex=RUN_TTL)
+            pipe.set(LATEST_KEY, self.run_id, ex=RUN_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to save progress of maintenance run {self.run_id}: {e}")
+
+    def finish(self, error: Optional[BaseException] = None, status: Optional[str] = None) -> Dict[str, Any]:
+        self.report.update(
+            status=status or ("failed" if error else "completed"),
+            current=None,
+            error=str(error) if error else None,
+            finished_at=datetime.now(timezone.utc).isoformat(),
+        )
+        self.save()
+        return self.report
+
+
+def _stream(db: Session, query, chunk_size: int) -> Iterator[Sequence]:
+    """Rows of ``query`` in chunks, from a server-side cursor."""
+    result = db.execute(query.execution_options(yield_per=chunk_size))
+    yield from result.partitions()
+
+
+def _local_media_path():
+    """Jobs whose media_path points at stored artifacts (current or legacy form)."""
+    return or_(Job.media_path.like(f"{IMAGES_PATH_PREFIX}%"), Job.media_path.like(f"{LEGACY_PATH_PREFIX}%"))
+
+
+def fix_legacy_paths(db: Session, run: MaintenanceRun) -> Dict[str, Any]:
+    """Rewrite ./storage/generated/<file> media paths to /images/<file> in one UPDATE."""
+    legacy = (Job.status == JobStatus.COMPLETED.value) & Job.media_path.like(f"{LEGACY_PATH_PREFIX}%")
+    if run.dry_run:
+        matched = db.scalar(select(func.count()).select_from(Job).where(legacy))
+        run.progress("fix_paths", force=True, matched=matched, fixed=0)
+        return {"matched": matched, "fixed": 0}
+
+    new_path = literal(IMAGES_PATH_PREFIX) + func.substr(Job.media_path, len(LEGACY_PATH_PREFIX) + 1)
+    fixed_ids = list(db.execute(
+        update(Job)
+        .where(legacy)
+        .values(media_path=new_path, version=Job.version + 1)
+        .returning(Job.id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+    db.commit()
+    for chunk in _chunks(fixed_ids, settings.maintenance_chunk_size):
+        status_cache.invalidate(chunk)
+    run.progress("fix_paths", force=True, matched=len(fixed_ids), fixed=len(fixed_ids))
+    logger.info(f"Fixed {len(fixed_ids)} legacy media paths")
+    return {"matched": len(fixed_ids), "fixed": len(fixed_ids)}
+
+
+def delete_jobs_with_missing_artifacts(db: Session, run: MaintenanceRun) -> Dict[str, Any]:
+    """Delete completed jobs whose stored artifact no longer exists.
+
+    Only jobs last updated before the storage listing started are considered:
+    artifacts are stored before their job is marked completed, so a newer job
+    may reference a file the listing didn't see yet.
+    """
+    storage = get_storage()
+    listed_at = datetime.now(timezone.utc)
+    stored = {_filename(key) for key, _ in storage.list_keys(GENERATED_PREFIX)}
+    run.progress("missing_artifacts", files=len(stored))
+    if not stored:
+        # An empty listing is far more likely a misconfigured STORAGE_PATH or
+        # bucket than every artifact being gone
+        logger.warning(f"No artifacts found in {storage.name} storage, not deleting any jobs")
+        run.progress("missing_artifacts", force=True, skipped="no artifacts in storage")
+        return run.report["results"]["missing_artifacts"]
+
+    query = (
+        select(Job.id, Job.media_path)
+        .where(
+            Job.status == JobStatus.COMPLETED.value,
+            _local_media_path(),
+            func.coalesce(Job.updated_at, Job.created_at) < listed_at,
+        )
+    )
+    scanned, missing = 0, []
+    for rows in _stream(db, query, settings.maintenance_chunk_size):
+        scanned += len(rows)
+        missing.extend(job_id for job_id, media_path in rows if _filename(media_path) not in stored)
+        run.progress("missing_artifacts", scanned=scanned, missing=len(missing))
+
+    deleted = 0
+    if not run.dry_run:
+        for chunk in _chunks(missing, settings.maintenance_chunk_size):
+            result = db.execute(
+                delete(Job)
+                .where(Job.id.in_(chunk), Job.status == JobStatus.COMPLETED.value)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            status_cache.invalidate(chunk)
+            deleted += result.rowcount
+            run.progress("missing_artifacts", deleted=deleted)
+        logger.info(f"Deleted {deleted} jobs with missing artifacts")
+
+    run.progress("missing_artifacts", force=True, scanned=scanned, missing=len(missing), deleted=deleted)
+    return run.report["results"]["missing_artifacts"]
+
+
+def _still_referenced(db: Session, filenames: List[str]) -> Set[str]:
+    """Which of ``filenames`` a job references now (re-checked right before deleting)."""
+    paths = [f"{IMAGES_PATH_PREFIX}{name}" for name in filenames]
+    paths += [f"{LEGACY_PATH_PREFIX}{name}" for name in filenames]
+    return {_filename(path) for path in db.scalars(select(Job.media_path).where(Job.media_path.in_(paths)))}
+
+
+def reclaim_orphaned_files(db: Session, run: MaintenanceRun) -> Dict[str, Any]:
+    """Delete stored artifacts (and their variants) that no job references.
+
+    Files younger than ``maintenance_orphan_grace`` are kept, since an ingest
+    stores the file before its job row points at it. Candidates are checked
+    against the database again just before deletion, because identical outputs
+    share one content-addressed file.
+    """
+    storage = get_storage()
+    referenced: Set[str] = set()
+    scanned = 0
+    query = select(Job.media_path).where(_local_media_path())
+    for rows in _stream(db, query, settings.maintenance_chunk_size):
+        scanned += len(rows)
+        referenced.update(_filename(media_path) for (media_path,) in rows)
+        run.progress("orphaned_files", scanned=scanned)
+
+    cutoff = time.time() - settings.maintenance_orphan_grace
+    referenced_stems = {name.rsplit(".", 1)[0] for name in referenced}
+    orphans: List[str] = []
+    for key, modified_at in storage.list_keys(GENERATED_PREFIX):
+        if modified_at < cutoff and _filename(key) not in referenced:
+            orphans.append(key)
+    for key, modified_at in storage.list_keys(VARIANTS_PREFIX):
+        # Variants are named <source stem>-w<width>.<format>
+        if modified_at < cutoff and _filename(key).rsplit("-w", 1)[0] not in referenced_stems:
+            orphans.append(key)
+    run.progress("orphaned_files", force=True, scanned=scanned, orphaned=len(orphans))
+
+    deleted = 0
+    if not run.dry_run:
+        for chunk in _chunks(orphans, settings.maintenance_chunk_size):
+            sources = [_filename(key) for key in chunk if key.startswith(f"{GENERATED_PREFIX}/")]
+            keep = _still_referenced(db, sources) if sources else set()
+            for key in chunk:
+                if key.startswith(f"{GENERATED_PREFIX}/") and _filename(key) in keep:
+                    continue
+                try:
+                    storage.delete(key)
+                    deleted += 1
+                except Exception as e:
+                    logger.warning(f"Failed to delete orphaned artifact {key}: {e}")
+            run.progress("orphaned_files", deleted=deleted)
+        logger.info(f"Reclaimed {deleted} orphaned artifacts from {storage.name} storage")
+
+    run.progress("orphaned_files", force=True, deleted=deleted)
+    return run.report["results"]["orphaned_files"]
+
+
+OPERATION_HANDLERS: Dict[str, Callable[[Session, MaintenanceRun], Dict[str, Any]]] = {
+    "fix_paths": fix_legacy_paths,
+    "missing_artifacts": delete_jobs_with_missing_artifacts,
+    "orphaned_files": reclaim_orphaned_files,
+}
+
+
+def run_maintenance(
+    db: Session,
+    run_id: Optional[str],
+    operations: Optional[Sequence[str]],
+    dry_run: bool
+) -> Dict[str, Any]:
+    """Run ``operations`` in order and return the final report.
+
+    The run is skipped (status "skipped") while another one holds the lock.
+    """
+    run_id = run_id or str(uuid.uuid4())
+    current = MaintenanceRun(run_id, parse_operations(operations), dry_run)
+    redis = get_redis()
+    if not redis.set(LOCK_KEY, run_id, nx=True, ex=LOCK_TTL):
+        holder = redis.get(LOCK_KEY)
+        holder = holder.decode() if isinstance(holder, bytes) else holder
+        logger.info(f"Skipping maintenance run {run_id}: run {holder} is still in progress")
+        return current.finish(MaintenanceError(f"Run {holder} is still in progress"), status="skipped")
+
+    logger.info(f"Starting maintenance run {run_id}: {current.operations} (dry_run={dry_run})")
+    current.save()
+    try:
+        for operation in current.operations:
+            OPERATION_HANDLERS[operation](db, current)
+    except Exception as e:
+        logger.error(f"Maintenance run {run_id} failed: {e}", exc_info=True)
+        current.finish(e)
+        raise
+    finally:
+        # Release only our own lock
+        if redis.get(LOCK_KEY) in (run_id, run_id.encode()):
+            redis.delete(LOCK_KEY)
+    logger.info(f"Finished maintenance run {run_id}: {current.report['results']}")
+    return current.finish()
+
+
+async def get_run(run_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """A run's report, or the latest run's when ``run_id`` is None."""
+    redis = get_async_redis()
+    if run_id is None:
+        latest = await redis.get(LATEST_KEY)
+        if latest is None:
+            return None
+        run_id = latest.decode()
+    report = await redis.get(_run_key(run_id))
+    return json.loads(report) if report else None
+
+
+async def record_queued(run_id: str, operations: List[str], dry_run: bool) -> Dict[str, Any]:
+    """Report for a run that has been handed to a worker but not started."""
+    report = {
+        "run_id": run_id,
+        "status": "queued",
+        "dry_run": dry_run,
+        "operations": operations,
+        "current": None,
+        "results": {},
+        "started_at": None,
+        "finished_at": None,
+        "error": None,
+    }
+    await get_async_redis().set(_run_key(run_id), json.dumps(report), ex=RUN_TTL)
+    return report
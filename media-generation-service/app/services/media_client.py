@@ -1,25 +1,109 @@
+import asyncio
 import replicate
-import requests
-import os
-from typing import Dict, Any, Optional
+import base64
+import hashlib
+import hmac
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
 from app.core.config import settings
+from app.services.http_client import (
+    ThrottledError,
+    download_to_file,
+    get_async_replicate_transport,
+    get_replicate_transport,
+    get_timeout,
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Prediction statuses after which Replicate will not change the prediction again
+TERMINAL_PREDICTION_STATUSES = ("succeeded", "failed", "canceled")
+
+
+class PredictionFailed(Exception):
+    """The prediction itself is unusable (failed, canceled, no output); retrying needs a new one."""
+
+
+class PredictionCancelled(Exception):
+    """The job was cancelled while its prediction ran; the prediction has been cancelled upstream."""
+
 
 class ReplicateClient:
-    """Client for interacting with Replicate API."""
+    """Client for interacting with Replicate API.
+
+    The underlying sync and async Replicate clients are built lazily on top of
+    the shared connection pools in ``http_client``.
+    """
     
     def __init__(self):
-        self.client = replicate.Client(api_token=settings.replicate_api_token)
+        self._client: Optional[replicate.Client] = None
+        self._async_client: Optional[replicate.Client] = None
+        self._lock = threading.Lock()  # cancel_predictions calls from several threads
+    
+    @property
+    def client(self) -> replicate.Client:
+        """Replicate client for sync callers (Celery workers)."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = replicate.Client(
+                        api_token=settings.replicate_api_token,
+                        base_url=settings.replicate_base_url,
+                        timeout=get_timeout(),
+                        transport=get_replicate_transport()
+                    )
+        return self._client
+    
+    @property
+    def async_client(self) -> replicate.Client:
+        """Replicate client for async callers (FastAPI, asyncio workers)."""
+        if self._async_client is None:
+            self._async_client = replicate.Client(
+                api_token=settings.replicate_api_token,
+                base_url=settings.replicate_base_url,
+                timeout=get_timeout(),
+                transport=get_async_replicate_transport()
+            )
+        return self._async_client
     
-    def create_prediction(self, model: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Create a prediction with Replicate API."""
+    def reset(self) -> None:
+        """Drop clients bound to pools from a parent process (call after fork)."""
+        self._client = None
+        self._async_client = None
+    
+    @staticmethod
+    def _prediction_params(webhook: Optional[str]) -> Dict[str, Any]:
+        if webhook:
+            return {"webhook": webhook, "webhook_events_filter": ["completed"]}
+        return {}
+    
+    @staticmethod
+    def _prediction_to_dict(prediction) -> Dict[str, Any]:
+        return {
+            "id": prediction.id,
+            "status": prediction.status,
+            "output": prediction.output,
+            "error": getattr(prediction, 'error', None)
+        }
+    
+    def create_prediction(
+        self,
+        model: str,
+        input_data: Dict[str, Any],
+        webhook: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Create a prediction with Replicate API.
+
+        When ``webhook`` is given, Replicate POSTs the finished prediction to it.
+        """
         try:
             prediction = self.client.predictions.create(
                 version=model,
-                input=input_data
+                input=input_data,
+                **self._prediction_params(webhook)
             )
             logger.info(f"Created prediction {prediction.id} for model {model}")
             return {
@@ -32,22 +116,84 @@ class ReplicateClient:
             logger.error(f"Failed to create prediction: {e}")
             raise
     
-    def get_prediction(self, prediction_id: str) -> Dict[str, Any]:
-        """Get prediction status and results."""
+    async def async_create_prediction(
+        self,
+        model: str,
+        input_data: Dict[str, Any],
+        webhook: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Create a prediction with Replicate API (async)."""
         try:
-            prediction = self.client.predictions.get(prediction_id)
+            prediction = await self.async_client.predictions.async_create(
+                version=model,
+                input=input_data,
+                **self._prediction_params(webhook)
+            )
+            logger.info(f"Created prediction {prediction.id} for model {model}")
             return {
                 "id": prediction.id,
                 "status": prediction.status,
-                "output": prediction.output,
-                "error": getattr(prediction, 'error', None)
+                "model": model,
+                "input": input_data
             }
+        except Exception as e:
+            logger.error(f"Failed to create prediction: {e}")
+            raise
+    
+    def get_prediction(self, prediction_id: str) -> Dict[str, Any]:
+        """Get prediction status and results."""
+        try:
+            prediction = self.client.predictions.get(prediction_id)
+            return self._prediction_to_dict(prediction)
+        except Exception as e:
+            logger.error(f"Failed to get prediction {prediction_id}: {e}")
+            raise
+    
+    async def async_get_prediction(self, prediction_id: str) -> Dict[str, Any]:
+        """Get prediction status and results (async)."""
+        try:
+            prediction = await self.async_client.predictions.async_get(prediction_id)
+            return self._prediction_to_dict(prediction)
         except Exception as e:
             logger.error(f"Failed to get prediction {prediction_id}: {e}")
             raise
     
-    def wait_for_prediction(self, prediction_id: str, timeout: int = 300) -> Dict[str, Any]:
-        """Wait for prediction to complete with proper timeout handling."""
+    def cancel_prediction(self, prediction_id: str) -> bool:
+        """Cancel a prediction upstream so it stops using GPU time. Best effort: False if the call failed."""
+        try:
+            self.client.predictions.cancel(prediction_id)
+            logger.info(f"Cancelled prediction {prediction_id}")
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to cancel prediction {prediction_id}: {e}")
+            return False
+    
+    async def async_cancel_prediction(self, prediction_id: str) -> bool:
+        """Cancel a prediction upstream (async). Best effort: False if the call failed."""
+        try:
+            await self.async_client.predictions.async_cancel(prediction_id)
+            logger.info(f"Cancelled prediction {prediction_id}")
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to cancel prediction {prediction_id}: {e}")
+            return False
+    
+    def cancel_predictions(self, prediction_ids: Iterable[str]) -> int:
+        """Cancel many predictions concurrently, at most one per pooled connection. Returns how many succeeded."""
+        with ThreadPoolExecutor(max_workers=settings.replicate_max_connections) as pool:
+            return sum(pool.map(self.cancel_prediction, prediction_ids))
+    
+    def wait_for_prediction(
+        self,
+        prediction_id: str,
+        timeout: int = 300,
+        cancelled: Optional[Callable[[], bool]] = None
+    ) -> Dict[str, Any]:
+        """Wait for prediction to complete with proper timeout handling.
+
+        ``cancelled`` is checked after every status poll; once it returns True
+        the prediction is cancelled upstream and PredictionCancelled is raised.
+        """
         import time
         
         start_time = time.time()
@@ -56,35 +202,32 @@ class ReplicateClient:
         
         try:
             while time.time() - start_time < max_wait_time:
-                prediction = self.client.predictions.get(prediction_id)
+                try:
+                    prediction = self.client.predictions.get(prediction_id)
+                except ThrottledError as e:
+                    # Status checks are cheap to delay; back off as asked and keep waiting
+                    delay = e.retry_after if e.retry_after is not None else poll_interval
+                    logger.warning(f"Status check for prediction {prediction_id} throttled, waiting {delay}s")
+                    time.sleep(delay)
+                    continue
                 
                 logger.info(f"Prediction {prediction_id} status: {prediction.status}")
                 
+                if cancelled is not None and cancelled():
+                    if prediction.status not in TERMINAL_PREDICTION_STATUSES:
+                        self.cancel_prediction(prediction_id)
+                    raise PredictionCancelled(f"Prediction {prediction_id} was cancelled with its job")
+                
                 # Check if prediction is complete
                 if prediction.status == "succeeded":
                     logger.info(f"Prediction {prediction_id} succeeded")
-                    return {
-                        "id": prediction.id,
-                        "status": prediction.status,
-                        "output": prediction.output,
-                        "error": getattr(prediction, 'error', None)
-                    }
+                    return self._prediction_to_dict(prediction)
                 elif prediction.status == "failed":
                     logger.error(f"Prediction {prediction_id} failed")
-                    return {
-                        "id": prediction.id,
-                        "status": prediction.status,
-                        "output": prediction.output,
-                        "error": getattr(prediction, 'error', None)
-                    }
+                    return self._prediction_to_dict(prediction)
                 elif prediction.status == "canceled":
                     logger.warning(f"Prediction {prediction_id} was canceled")
-                    return {
-                        "id": prediction.id,
-                        "status": prediction.status,
-                        "output": prediction.output,
-                        "error": getattr(prediction, 'error', None)
-                    }
+                    return self._prediction_to_dict(prediction)
                 
                 # If still processing, wait before next poll
                 if prediction.status in ["starting", "processing"]:
@@ -98,23 +241,54 @@ class ReplicateClient:
             logger.error(f"Prediction {prediction_id} timed out after {timeout} seconds")
             raise TimeoutError(f"Prediction {prediction_id} timed out after {timeout} seconds")
             
+        except PredictionCancelled:
+            raise
         except Exception as e:
             logger.error(f"Failed to wait for prediction {prediction_id}: {e}")
             raise
     
+    async def async_wait_for_prediction(
+        self,
+        prediction_id: str,
+        timeout: int = 300,
+        cancelled: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> Dict[str, Any]:
+        """Wait for a prediction to reach a terminal status without blocking the event loop.
+
+        ``cancelled`` works as in ``wait_for_prediction``.
+        """
+        poll_interval = 2
+        deadline = time.monotonic() + timeout
+        
+        while time.monotonic() < deadline:
+            try:
+                prediction = self._prediction_to_dict(
+                    await self.async_client.predictions.async_get(prediction_id)
+                )
+            except ThrottledError as e:
+                delay = e.retry_after if e.retry_after is not None else poll_interval
+                logger.warning(f"Status check for prediction {prediction_id} throttled, waiting {delay}s")
+                await asyncio.sleep(delay)
+                continue
+            
+            if cancelled is not None and await cancelled():
+                if prediction["status"] not in TERMINAL_PREDICTION_STATUSES:
+                    await self.async_cancel_prediction(prediction_id)
+                raise PredictionCancelled(f"Prediction {prediction_id} was cancelled with its job")
+            if prediction["status"] in TERMINAL_PREDICTION_STATUSES:
+                logger.info(f"Prediction {prediction_id} {prediction['status']}")
+                return prediction
+            if prediction["status"] not in ("starting", "processing"):
+                logger.warning(f"Unknown prediction status: {prediction['status']}")
+            await asyncio.sleep(poll_interval)
+        
+        logger.error(f"Prediction {prediction_id} timed out after {timeout} seconds")
+        raise TimeoutError(f"Prediction {prediction_id} timed out after {timeout} seconds")
+    
     def download_image(self, image_url: str, local_path: str) -> bool:
         """Download image from URL to local path."""
         try:
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(local_path), exist_ok=True)
-            
-            response = requests.get(image_url, stream=True, timeout=30)
-            response.raise_for_status()
-            
-            with open(local_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
+            download_to_file(image_url, local_path)
             logger.info(f"Downloaded image to {local_path}")
             return True
         except Exception as e:
@@ -122,5 +296,48 @@ class ReplicateClient:
             return False
 
 
+def parse_prediction_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a prediction JSON body (e.g. a webhook payload) like get_prediction does."""
+    return {
+        "id": payload.get("id"),
+        "status": payload.get("status"),
+        "output": payload.get("output"),
+        "error": payload.get("error")
+    }
+
+
+def verify_webhook_signature(
+    body: bytes,
+    webhook_id: Optional[str],
+    webhook_timestamp: Optional[str],
+    webhook_signature: Optional[str],
+    secret: str,
+    tolerance: int = 300
+) -> bool:
+    """Verify a Replicate webhook signature (HMAC-SHA256 over "id.timestamp.body").
+
+    ``secret`` is the "whsec_..." signing secret; ``webhook_signature`` may hold
+    several space-separated "v1,<base64>" signatures.
+    """
+    if not (webhook_id and webhook_timestamp and webhook_signature):
+        return False
+    
+    try:
+        if abs(time.time() - int(webhook_timestamp)) > tolerance:
+            return False
+        key = base64.b64decode(secret.split("_", 1)[-1])
+    except ValueError:
+        return False
+    
+    signed_content = f"{webhook_id}.{webhook_timestamp}.".encode() + body
+    expected = base64.b64encode(hmac.new(key, signed_content, hashlib.sha256).digest()).decode()
+    
+    for candidate in webhook_signature.split():
+        _, _, signature = candidate.partition(",")
+        if hmac.compare_digest(signature, expected):
+            return True
+    return False
+
+
 # Global client instance
 replicate_client = ReplicateClient() 
\ No newline at end of file
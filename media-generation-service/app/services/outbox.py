@@ -0,0 +1,108 @@
+import logging
+import selectors
+import threading
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import get_sync_db, sync_engine
+from app.models.job import JobOutbox
+from app.services.job_service import SyncJobService
+
+logger = logging.getLogger(__name__)
+
+# Transactional outbox for new jobs. The API writes a job_outbox row in the
+# same transaction as the job and responds after that one commit; it never
+# talks to the broker. The relay (``python -m worker.relay``, with the
+# ``relay_outbox`` beat task as a safety net) claims rows oldest first with
+# FOR UPDATE SKIP LOCKED, publishes them as one batch and deletes them in the
+# claiming transaction.
+#
+# Delivery is at-least-once: a relay that dies after publishing but before its
+# commit leaves the rows to be published again. The scheduler ignores jobs
+# already queued or in flight, and workers only start jobs that are still
+# runnable (start_job's status guard), so a replayed entry is skipped.
+#
+# An AFTER INSERT trigger sends NOTIFY job_outbox when a job commits, so the
+# relay wakes immediately instead of polling.
+NOTIFY_CHANNEL = "job_outbox"
+RESTART_DELAY = 5.0  # seconds before the relay reconnects after an error
+
+Publisher = Callable[[List[JobOutbox]], None]
+
+
+def relay_batch(db: Session, publish: Publisher, batch_size: Optional[int] = None) -> int:
+    """Publish and delete up to ``batch_size`` outbox entries, oldest first.
+
+    Concurrent relays skip each other's locked rows, so they split the outbox
+    instead of publishing the same jobs. Returns the number of entries relayed.
+    """
+    entries = db.scalars(
+        select(JobOutbox)
+        .order_by(JobOutbox.id)
+        .limit(batch_size or settings.outbox_batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not entries:
+        db.rollback()
+        return 0
+
+    published_at = datetime.now(timezone.utc)
+    publish(entries)
+    db.execute(
+        delete(JobOutbox)
+        .where(JobOutbox.id.in_([entry.id for entry in entries]))
+        .execution_options(synchronize_session=False)
+    )
+    if not settings.scheduler_enabled:
+        # Published straight to Celery; with the scheduler, dispatch_jobs records the hand-off
+        SyncJobService.mark_enqueued(db, [entry.job_id for entry in entries], published_at)
+    db.commit()
+    return len(entries)
+
+
+def drain(publish: Publisher, batch_size: Optional[int] = None) -> int:
+    """Relay batches until the outbox is empty. Returns the number of entries relayed."""
+    batch_size = batch_size or settings.outbox_batch_size
+    relayed = 0
+    with next(get_sync_db()) as db:
+        while True:
+            count = relay_batch(db, publish, batch_size)
+            relayed += count
+            if count < batch_size:
+                return relayed
+
+
+def _listen():
+    """A dedicated autocommit connection listening on ``NOTIFY_CHANNEL``."""
+    pooled = sync_engine.raw_connection()
+    connection = pooled.driver_connection
+    pooled.detach()  # closed by the relay, never handed back to the pool
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+    return connection
+
+
+def run_relay(publish: Publisher, stop: threading.Event) -> None:
+    """Drain the outbox, then wait for a notification (or ``outbox_poll_interval``), until ``stop`` is set."""
+    while not stop.is_set():
+        try:
+            connection = _listen()
+            try:
+                with selectors.DefaultSelector() as selector:
+                    selector.register(connection, selectors.EVENT_READ)
+                    while not stop.is_set():
+                        # Listening before draining, so a job committed meanwhile still wakes us
+                        relayed = drain(publish)
+                        if relayed:
+                            logger.info(f"Relayed {relayed} outbox entries")
+                        if selector.select(settings.outbox_poll_interval):
+                            connection.poll()
+                            connection.notifies.clear()
+            finally:
+                connection.close()
+        except Exception as e:
+            logger.error(f"Outbox relay failed, restarting in {RESTART_DELAY}s: {e}", exc_info=True)
+            stop.wait(RESTART_DELAY)
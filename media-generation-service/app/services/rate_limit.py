@@ -0,0 +1,165 @@
+import logging
+import math
+import time
+from typing import List, Optional, Tuple
+from app.core.config import settings
+from app.services import scheduler
+from app.services.status_cache import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+# Distributed token buckets for Replicate prediction creation, shared by every
+# worker through Redis. Callers reserve a slot rather than poll for a token: the
+# bucket may go negative, and the caller is told how long to wait for its slot,
+# so throttled work is delayed exactly once instead of retried in a loop.
+# A 429 from Replicate pauses the bucket for the Retry-After period; slots
+# reserved after that queue up behind the pause.
+BUCKET_PREFIX = "ratelimit:replicate"
+# Queue new generation jobs are published to (see worker/celery_app.py task_routes)
+ENTRY_QUEUE = "media_generation"
+
+# KEYS: bucket hashes. ARGV: rate (tokens/s) and burst for each key.
+# Returns the wait in milliseconds until the reserved slot.
+_RESERVE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = clock[1] * 1000 + math.floor(clock[2] / 1000)
+local wait = 0
+for i = 1, #KEYS do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local burst = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    if now > ts then
+        tokens = math.min(burst, tokens + (now - ts) * rate / 1000)
+        ts = now
+    end
+    tokens = tokens - 1
+    local bucket_wait = ts - now
+    if tokens < 0 then
+        bucket_wait = bucket_wait + (-tokens) * 1000 / rate
+    end
+    if bucket_wait > wait then
+        wait = bucket_wait
+    end
+    redis.call('HSET', KEYS[i], 'tokens', tostring(tokens), 'ts', tostring(ts))
+    redis.call('PEXPIRE', KEYS[i], math.ceil(bucket_wait + burst * 1000 / rate) + 1000)
+end
+return math.ceil(wait)
+"""
+
+# KEYS[1]: bucket hash. ARGV: pause in milliseconds.
+# Stops refills until the pause ends and drops any banked burst.
+_PAUSE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = clock[1] * 1000 + math.floor(clock[2] / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = math.min(tonumber(state[1]) or 0, 0)
+local ts = math.max(tonumber(state[2]) or now, now + tonumber(ARGV[1]))
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(ts))
+redis.call('PEXPIRE', KEYS[1], ts - now + 60000)
+return ts - now
+"""
+
+
+def _buckets(model: str) -> List[Tuple[str, float, float]]:
+    """(key, rate, burst) for the account-wide bucket plus the model's own, if configured."""
+    buckets = [(BUCKET_PREFIX, settings.replicate_rate_limit, float(settings.replicate_rate_burst))]
+    model_rate = settings.replicate_model_rate_limits.get(model)
+    if model_rate:
+        buckets.append((f"{BUCKET_PREFIX}:{model}", model_rate, max(1.0, model_rate)))
+    return buckets
+
+
+def _reserve_args(model: str) -> List[object]:
+    """EVAL arguments for _RESERVE_SCRIPT: key count, bucket keys, then (rate, burst) pairs."""
+    buckets = _buckets(model)
+    args: List[object] = [len(buckets), *[key for key, _, _ in buckets]]
+    for _, rate, burst in buckets:
+        args.extend([rate, burst])
+    return args
+
+
+def reserve(model: str) -> float:
+    """Reserve a prediction slot for ``model``. Returns seconds until the slot.
+
+    Redis errors fail open (no wait) so throttling never blocks work outright.
+    """
+    if settings.replicate_rate_limit <= 0:
+        return 0.0
+    try:
+        wait_ms = get_redis().eval(_RESERVE_SCRIPT, *_reserve_args(model))
+    except Exception as e:
+        logger.warning(f"Rate limiter unavailable, not throttling: {e}")
+        return 0.0
+    return int(wait_ms) / 1000
+
+
+async def async_reserve(model: str) -> float:
+    """``reserve`` for the asyncio worker."""
+    if settings.replicate_rate_limit <= 0:
+        return 0.0
+    try:
+        wait_ms = await get_async_redis().eval(_RESERVE_SCRIPT, *_reserve_args(model))
+    except Exception as e:
+        logger.warning(f"Rate limiter unavailable, not throttling: {e}")
+        return 0.0
+    return int(wait_ms) / 1000
+
+
+def pause(retry_after: Optional[float]) -> float:
+    """Hold back all prediction creation after a 429. Returns the pause in seconds."""
+    seconds = retry_after if retry_after is not None else settings.throttle_default_retry_after
+    try:
+        get_redis().eval(_PAUSE_SCRIPT, 1, BUCKET_PREFIX, int(seconds * 1000))
+    except Exception as e:
+        logger.warning(f"Failed to pause rate limiter: {e}")
+    logger.warning(f"Replicate throttled us, pausing prediction creation for {seconds:.1f}s")
+    return seconds
+
+
+async def async_pause(retry_after: Optional[float]) -> float:
+    """``pause`` for the asyncio worker."""
+    seconds = retry_after if retry_after is not None else settings.throttle_default_retry_after
+    try:
+        await get_async_redis().eval(_PAUSE_SCRIPT, 1, BUCKET_PREFIX, int(seconds * 1000))
+    except Exception as e:
+        logger.warning(f"Failed to pause rate limiter: {e}")
+    logger.warning(f"Replicate throttled us, pausing prediction creation for {seconds:.1f}s")
+    return seconds
+
+
+async def admission_wait(new_jobs: int = 1) -> float:
+    """Estimated seconds before ``new_jobs`` more jobs would reach Replicate.
+
+    Counts jobs waiting in the scheduler lanes and the entry queue plus slots
+    already reserved in the shared bucket (and any pause), drained at the
+    account-wide rate.
+    """
+    rate = settings.replicate_rate_limit
+    if rate <= 0:
+        return 0.0
+    try:
+        pipe = get_async_redis().pipeline(transaction=False)
+        pipe.llen(ENTRY_QUEUE)
+        pipe.get(scheduler.QUEUED_KEY)
+        pipe.hmget(BUCKET_PREFIX, "tokens", "ts")
+        queued, scheduled, (tokens, ts) = await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to read queue backlog: {e}")
+        return 0.0
+
+    reserved = max(0.0, -float(tokens)) if tokens is not None else 0.0
+    paused = max(0.0, float(ts) / 1000 - time.time()) if ts is not None else 0.0
+    queued += int(scheduled or 0)
+    return paused + (queued + reserved + new_jobs) / rate
+
+
+async def check_admission(new_jobs: int = 1) -> Optional[int]:
+    """None if ``new_jobs`` may be accepted, otherwise seconds to wait before retrying."""
+    if settings.admission_max_wait <= 0:
+        return None
+    wait = await admission_wait(new_jobs)
+    if wait <= settings.admission_max_wait:
+        return None
+    return max(1, math.ceil(wait - settings.admission_max_wait))
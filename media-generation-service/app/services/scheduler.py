@@ -0,0 +1,291 @@
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.core import tracing
+from app.core.config import settings
+from app.services.status_cache import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+# Weighted fair scheduling of new jobs across models and tenants.
+#
+# New jobs wait in Redis lanes, one list per (model, tenant), instead of going
+# straight onto the Celery queue. ``dispatch`` picks the next job with
+# start-time fair queueing at two levels: first the model with the lowest
+# virtual pass, then the tenant with the lowest pass within it. Each pick
+# advances the pass by 1/weight, so a model or tenant with weight 2 gets twice
+# the share of one with weight 1 while both have work, and idle lanes rejoin at
+# the current virtual time instead of banking credit.
+#
+# Dispatched jobs count as in flight until they finish (``release``), which
+# bounds both total in-flight jobs and each tenant's share. In-flight entries
+# expire after ``scheduler_inflight_ttl`` so a crashed worker can't leak capacity.
+#
+# Enqueueing is idempotent while a job is queued or in flight, so outbox
+# entries the relay publishes twice don't put the job in line twice.
+#
+# Cancelled jobs are dropped from their lane lazily: ``remove`` deletes the
+# payload, and dispatch skips lane entries without one.
+PREFIX = "sched:"
+MODELS_KEY = f"{PREFIX}models"  # zset model -> pass
+QUEUED_KEY = f"{PREFIX}queued"  # jobs waiting in any lane
+INFLIGHT_KEY = f"{PREFIX}inflight"  # zset job_id -> dispatch time
+PAYLOAD_KEY = f"{PREFIX}payload"  # hash job_id -> JSON (model, input_data, tenant, enqueued_at, trace)
+LANE_SEPARATOR = "|"
+
+# Returns 1 if the job joined its lane, 0 if it is already queued or in flight
+# (a replayed outbox entry).
+_ENQUEUE_SCRIPT = """
+local prefix, model, tenant, job_id = ARGV[1], ARGV[2], ARGV[3], ARGV[4]
+if redis.call('ZSCORE', prefix .. 'inflight', job_id) then
+    return 0
+end
+if redis.call('HSETNX', prefix .. 'payload', job_id, ARGV[7]) == 0 then
+    return 0
+end
+redis.call('RPUSH', prefix .. 'q:' .. model .. '|' .. tenant, job_id)
+redis.call('INCR', prefix .. 'queued')
+redis.call('HSET', prefix .. 'model-weights', model, ARGV[5])
+redis.call('HSET', prefix .. 'tenant-weights', tenant, ARGV[6])
+local tenants_key = prefix .. 'tenants:' .. model
+if not redis.call('ZSCORE', tenants_key, tenant) then
+    local vtime = redis.call('HGET', prefix .. 'tenant-vtime', model) or '0'
+    redis.call('ZADD', tenants_key, vtime, tenant)
+end
+if not redis.call('ZSCORE', prefix .. 'models', model) then
+    local vtime = redis.call('GET', prefix .. 'vtime') or '0'
+    redis.call('ZADD', prefix .. 'models', vtime, model)
+end
+return 1
+"""
+
+# Returns {0} when the global in-flight cap is reached, {1, job_id, payload} for
+# a dispatched job, or {2} when no lane has an eligible job.
+_DISPATCH_SCRIPT = """
+local prefix = ARGV[1]
+local max_inflight = tonumber(ARGV[2])
+local tenant_cap = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local stale = tonumber(ARGV[5])
+local inflight_key = prefix .. 'inflight'
+
+redis.call('ZREMRANGEBYSCORE', inflight_key, '-inf', stale)
+if max_inflight > 0 and redis.call('ZCARD', inflight_key) >= max_inflight then
+    return {0}
+end
+
+local models = redis.call('ZRANGE', prefix .. 'models', 0, -1, 'WITHSCORES')
+for i = 1, #models, 2 do
+    local model = models[i]
+    local model_pass = tonumber(models[i + 1])
+    local tenants_key = prefix .. 'tenants:' .. model
+    local tenants = redis.call('ZRANGE', tenants_key, 0, -1, 'WITHSCORES')
+    for j = 1, #tenants, 2 do
+        local tenant = tenants[j]
+        local tenant_pass = tonumber(tenants[j + 1])
+        local tenant_inflight_key = prefix .. 'tenant-inflight:' .. tenant
+        redis.call('ZREMRANGEBYSCORE', tenant_inflight_key, '-inf', stale)
+        if tenant_cap <= 0 or redis.call('ZCARD', tenant_inflight_key) < tenant_cap then
+            local lane_key = prefix .. 'q:' .. model .. '|' .. tenant
+            local job_id = redis.call('LPOP', lane_key)
+            local payload = job_id and redis.call('HGET', prefix .. 'payload', job_id)
+            while job_id and not payload do
+                -- removed (cancelled) while queued
+                job_id = redis.call('LPOP', lane_key)
+                payload = job_id and redis.call('HGET', prefix .. 'payload', job_id)
+            end
+            if job_id then
+                redis.call('HDEL', prefix .. 'payload', job_id)
+                redis.call('DECR', prefix .. 'queued')
+                redis.call('ZADD', inflight_key, now, job_id)
+                redis.call('ZADD', tenant_inflight_key, now, job_id)
+                redis.call('HSET', prefix .. 'job-tenant', job_id, tenant)
+
+                local tenant_weight = tonumber(redis.call('HGET', prefix .. 'tenant-weights', tenant) or '1')
+                local model_weight = tonumber(redis.call('HGET', prefix .. 'model-weights', model) or '1')
+                redis.call('HSET', prefix .. 'tenant-vtime', model, tostring(tenant_pass))
+                redis.call('SET', prefix .. 'vtime', tostring(model_pass))
+                if redis.call('LLEN', lane_key) == 0 then
+                    redis.call('ZREM', tenants_key, tenant)
+                else
+                    redis.call('ZADD', tenants_key, tenant_pass + 1 / tenant_weight, tenant)
+                end
+                if redis.call('ZCARD', tenants_key) == 0 then
+                    redis.call('ZREM', prefix .. 'models', model)
+                else
+                    redis.call('ZADD', prefix .. 'models', model_pass + 1 / model_weight, model)
+                end
+                return {1, job_id, payload}
+            end
+            -- only removed jobs were left in the lane
+            redis.call('ZREM', tenants_key, tenant)
+            if redis.call('ZCARD', tenants_key) == 0 then
+                redis.call('ZREM', prefix .. 'models', model)
+            end
+        end
+    end
+end
+return {2}
+"""
+
+_RELEASE_SCRIPT = """
+local prefix, job_id = ARGV[1], ARGV[2]
+local tenant = redis.call('HGET', prefix .. 'job-tenant', job_id)
+local removed = redis.call('ZREM', prefix .. 'inflight', job_id)
+if tenant then
+    redis.call('ZREM', prefix .. 'tenant-inflight:' .. tenant, job_id)
+    redis.call('HDEL', prefix .. 'job-tenant', job_id)
+end
+return removed
+"""
+
+
+_REMOVE_SCRIPT = """
+local prefix = ARGV[1]
+local removed = 0
+for i = 2, #ARGV do
+    removed = removed + redis.call('HDEL', prefix .. 'payload', ARGV[i])
+end
+if removed > 0 then
+    redis.call('DECRBY', prefix .. 'queued', removed)
+end
+return removed
+"""
+
+
+def normalize_tenant(tenant: Optional[str]) -> str:
+    """Tenant key safe to embed in lane names."""
+    tenant = (tenant or "anonymous").strip()[:64]
+    return tenant.replace(LANE_SEPARATOR, "_") or "anonymous"
+
+
+def _enqueue_args(
+    job_id: str,
+    model: str,
+    tenant: str,
+    input_data: Dict[str, Any],
+    trace: Optional[Dict[str, str]] = None
+) -> List[Any]:
+    payload = json.dumps({
+        "model": model,
+        "input_data": input_data,
+        "tenant": tenant,
+        "enqueued_at": time.time(),
+        # Lets dispatch continue the submitting request's trace
+        "trace": tracing.carrier() if trace is None else trace,
+    })
+    return [
+        PREFIX, model, tenant, job_id,
+        settings.scheduler_model_weights.get(model, 1.0),
+        settings.scheduler_tenant_weights.get(tenant, 1.0),
+        payload,
+    ]
+
+
+def enqueue(job_id: str, model: str, tenant: Optional[str], input_data: Dict[str, Any]) -> bool:
+    """Put a new job at the back of its (model, tenant) lane. False if it is already queued or in flight."""
+    return bool(get_redis().eval(
+        _ENQUEUE_SCRIPT, 0, *_enqueue_args(job_id, model, normalize_tenant(tenant), input_data)
+    ))
+
+
+def enqueue_many(jobs: Iterable[Tuple[str, str, Optional[str], Dict[str, Any], Optional[Dict[str, str]]]]) -> int:
+    """``enqueue`` for many ``(job_id, model, tenant, input_data, trace)`` in one round trip.
+
+    ``trace`` is the W3C carrier of the submitting request (None for the current context).
+    Returns how many joined a lane; the rest were already queued or in flight.
+    """
+    pipe = get_redis().pipeline(transaction=False)
+    for job_id, model, tenant, input_data, trace in jobs:
+        pipe.eval(_ENQUEUE_SCRIPT, 0, *_enqueue_args(job_id, model, normalize_tenant(tenant), input_data, trace))
+    return sum(int(added) for added in pipe.execute())
+
+
+def dispatch(now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Take the next job by weighted fair order, or None if nothing may run now.
+
+    Returns the job's payload plus ``job_id``. It counts as in flight from here
+    until ``release``.
+    """
+    now = time.time() if now is None else now
+    result = get_redis().eval(
+        _DISPATCH_SCRIPT, 0,
+        PREFIX,
+        settings.scheduler_max_inflight,
+        settings.tenant_max_inflight,
+        now,
+        now - settings.scheduler_inflight_ttl,
+    )
+    if int(result[0]) != 1:
+        return None
+    job_id = result[1].decode() if isinstance(result[1], bytes) else result[1]
+    payload = json.loads(result[2]) if result[2] else {}
+    payload["job_id"] = job_id
+    return payload
+
+
+def release(job_id: str) -> bool:
+    """Stop counting a job as in flight. True if it was counted (idempotent)."""
+    try:
+        return bool(get_redis().eval(_RELEASE_SCRIPT, 0, PREFIX, job_id))
+    except Exception as e:
+        logger.warning(f"Failed to release job {job_id} from the scheduler: {e}")
+        return False
+
+
+async def async_remove(job_ids: List[str]) -> int:
+    """Take cancelled jobs out of their lanes before they are dispatched. Returns how many were still queued."""
+    if not job_ids:
+        return 0
+    try:
+        return int(await get_async_redis().eval(_REMOVE_SCRIPT, 0, PREFIX, *job_ids))
+    except Exception as e:
+        logger.warning(f"Failed to remove {len(job_ids)} jobs from the scheduler: {e}")
+        return 0
+
+
+async def get_lane_stats() -> Dict[str, Any]:
+    """Depth and head-of-line age for every non-empty lane, plus in-flight counts."""
+    redis = get_async_redis()
+    now = time.time()
+    models = [model.decode() for model in await redis.zrange(MODELS_KEY, 0, -1)]
+
+    lanes = []
+    for model in models:
+        tenants = [tenant.decode() for tenant in await redis.zrange(f"{PREFIX}tenants:{model}", 0, -1)]
+        pipe = redis.pipeline(transaction=False)
+        for tenant in tenants:
+            lane_key = f"{PREFIX}q:{model}{LANE_SEPARATOR}{tenant}"
+            pipe.llen(lane_key)
+            pipe.lindex(lane_key, 0)
+        results = await pipe.execute()
+
+        heads = [results[i + 1] for i in range(0, len(results), 2)]
+        payloads = await redis.hmget(PAYLOAD_KEY, heads) if any(heads) else [None] * len(heads)
+        for index, tenant in enumerate(tenants):
+            enqueued_at = json.loads(payloads[index]).get("enqueued_at") if payloads[index] else None
+            lanes.append({
+                "model": model,
+                "tenant": tenant,
+                "depth": results[index * 2],
+                "oldest_age_seconds": round(now - enqueued_at, 3) if enqueued_at else None,
+            })
+
+    tenant_keys = [key async for key in redis.scan_iter(match=f"{PREFIX}tenant-inflight:*")]
+    pipe = redis.pipeline(transaction=False)
+    for key in tenant_keys:
+        pipe.zcard(key)
+    tenant_counts = await pipe.execute() if tenant_keys else []
+    inflight_by_tenant = {
+        key.decode()[len(f"{PREFIX}tenant-inflight:"):]: count
+        for key, count in zip(tenant_keys, tenant_counts)
+        if count
+    }
+
+    return {
+        "queued": int(await redis.get(QUEUED_KEY) or 0),
+        "inflight": await redis.zcard(INFLIGHT_KEY),
+        "inflight_by_tenant": inflight_by_tenant,
+        "lanes": lanes,
+    }
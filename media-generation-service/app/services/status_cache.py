@@ -0,0 +1,216 @@
+import hashlib
+import logging
+import redis
+import redis.asyncio as aioredis
+from typing import Dict, Iterable, List, Optional
+from app.core.config import settings
+from app.models.schemas import JobStatus, JobStatusResponse
+
+logger = logging.getLogger(__name__)
+
+# Write-through cache of serialized JobStatusResponse payloads, keyed by job ID.
+# Workers write on every transition; GET /status reads here before Postgres.
+# Writes are ordered by the job's version (see _SET_IF_NEWER_SCRIPT).
+# Each transition is also published on a per-job channel for streaming clients.
+# Cache failures are logged and never fail the caller: the DB stays the source of truth.
+KEY_PREFIX = "job-status:"
+CHANNEL_PREFIX = "job-events:"
+# Statuses a job can end in; failed is final only once its retries are used up (see is_terminal)
+TERMINAL_STATUSES = (JobStatus.COMPLETED.value, JobStatus.FAILED.value, JobStatus.CANCELLED.value)
+
+_redis: Optional[redis.Redis] = None
+_async_redis: Optional[aioredis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    """Sync Redis client (workers)."""
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.redis_url)
+    return _redis
+
+
+def get_async_redis() -> aioredis.Redis:
+    """Async Redis client (FastAPI)."""
+    global _async_redis
+    if _async_redis is None:
+        _async_redis = aioredis.Redis.from_url(settings.redis_url)
+    return _async_redis
+
+
+def _key(job_id: str) -> str:
+    return f"{KEY_PREFIX}{job_id}"
+
+
+def event_channel(job_id: str) -> str:
+    """Pub/sub channel carrying a job's status transitions."""
+    return f"{CHANNEL_PREFIX}{job_id}"
+
+
+def is_terminal(status: str, retry_count: Optional[int]) -> bool:
+    """Whether a job in ``status`` is finished for good.
+
+    A failed job with retries left is resubmitted and goes back to processing,
+    so it only counts as finished once ``retry_count`` reaches max_retries.
+    """
+    if status == JobStatus.FAILED.value:
+        return (retry_count or 0) >= settings.max_retries
+    return status in TERMINAL_STATUSES
+
+
+def _ttl(job) -> int:
+    if is_terminal(job.status, job.retry_count):
+        return settings.status_cache_ttl
+    return settings.status_cache_active_ttl
+
+
+def serialize_job(job) -> bytes:
+    """Serialize a Job row to the JSON body served by GET /status/{job_id}."""
+    return JobStatusResponse.model_validate(job).model_dump_json().encode()
+
+
+def make_etag(payload: bytes) -> str:
+    """Strong ETag for a status payload."""
+    return f'"{hashlib.blake2b(payload, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag."""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+# Writers race: a read-through fill or a slow worker can arrive after a newer
+# transition was cached. Payloads carry the job's version (bumped by every DB
+# write), and this only stores a payload newer than the cached one. A payload
+# as new as the cached one is still published (the writer's own transition,
+# already cached by a read-through fill); an older one is dropped.
+# KEYS[1] status key; ARGV: payload, version, ttl, store (0/1), publish (0/1), channel
+_SET_IF_NEWER_SCRIPT = """
+local cached = redis.call('GET', KEYS[1])
+local version = tonumber(ARGV[2])
+local seen = -1
+if cached then
+    local ok, decoded = pcall(cjson.decode, cached)
+    if ok and type(decoded) == 'table' and tonumber(decoded['version']) then
+        seen = tonumber(decoded['version'])
+    end
+end
+if seen > version then
+    return 0
+end
+if ARGV[4] == '1' and seen < version then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+end
+if ARGV[5] == '1' then
+    redis.call('PUBLISH', ARGV[6], ARGV[1])
+end
+return 1
+"""
+
+
+def _queue_write(pipe, job, payload: bytes, publish: bool) -> None:
+    """Add one job's set-if-newer write (and optional publish) to ``pipe``."""
+    pipe.eval(
+        _SET_IF_NEWER_SCRIPT, 1, _key(job.id),
+        payload, job.version or 0, _ttl(job),
+        int(settings.status_cache_enabled), int(publish), event_channel(job.id),
+    )
+
+
+def cache_job_status(job) -> None:
+    """Write a job's current status through to the cache and publish it (sync)."""
+    if job is None:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        _queue_write(pipe, job, serialize_job(job), publish=True)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to cache status for job {job.id}: {e}")
+
+
+async def async_cache_job_status(job, payload: Optional[bytes] = None, publish: bool = False) -> None:
+    """Write a job's status to the cache (async); ``payload`` if already serialized.
+
+    Set ``publish`` for real transitions; read-through fills leave it off.
+    """
+    if not settings.status_cache_enabled and not publish:
+        return
+    try:
+        pipe = get_async_redis().pipeline(transaction=False)
+        _queue_write(pipe, job, payload or serialize_job(job), publish)
+        await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to cache status for job {job.id}: {e}")
+
+
+async def async_cache_job_statuses(jobs, publish: bool = False) -> None:
+    """Prime the cache for many new jobs in one pipelined round trip.
+
+    Set ``publish`` when the jobs just changed status (bulk transitions).
+    """
+    if (not settings.status_cache_enabled and not publish) or not jobs:
+        return
+    try:
+        pipe = get_async_redis().pipeline(transaction=False)
+        for job in jobs:
+            _queue_write(pipe, job, serialize_job(job), publish)
+        await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to cache statuses for {len(jobs)} jobs: {e}")
+
+
+async def async_get_job_statuses(job_ids: List[str]) -> Dict[str, bytes]:
+    """Read cached status payloads for several jobs; misses are left out."""
+    if not settings.status_cache_enabled or not job_ids:
+        return {}
+    try:
+        payloads = await get_async_redis().mget([_key(job_id) for job_id in job_ids])
+    except Exception as e:
+        logger.warning(f"Failed to read cached statuses for {len(job_ids)} jobs: {e}")
+        return {}
+    return {job_id: payload for job_id, payload in zip(job_ids, payloads) if payload is not None}
+
+
+async def async_get_job_status(job_id: str) -> Optional[bytes]:
+    """Read a cached status payload, or None on a miss or cache error."""
+    if not settings.status_cache_enabled:
+        return None
+    try:
+        return await get_async_redis().get(_key(job_id))
+    except Exception as e:
+        logger.warning(f"Failed to read cached status for job {job_id}: {e}")
+        return None
+
+
+def invalidate(job_ids: Iterable[str]) -> None:
+    """Drop cached statuses for jobs that were deleted or rewritten (sync)."""
+    keys = [_key(job_id) for job_id in job_ids]
+    if not settings.status_cache_enabled or not keys:
+        return
+    try:
+        get_redis().delete(*keys)
+    except Exception as e:
+        logger.warning(f"Failed to invalidate {len(keys)} cached statuses: {e}")
+
+
+async def async_invalidate(job_ids: Iterable[str]) -> None:
+    """Drop cached statuses for jobs that were deleted or rewritten."""
+    keys = [_key(job_id) for job_id in job_ids]
+    if not settings.status_cache_enabled or not keys:
+        return
+    try:
+        await get_async_redis().delete(*keys)
+    except Exception as e:
+        logger.warning(f"Failed to invalidate {len(keys)} cached statuses: {e}")
+
+
+async def aclose() -> None:
+    """Close the async Redis pool (FastAPI shutdown)."""
+    global _async_redis
+    if _async_redis is not None:
+        await _async_redis.aclose()
+        _async_redis = None
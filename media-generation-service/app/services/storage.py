@@ -0,0 +1,226 @@
+import logging
+import os
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Artifacts are addressed by keys like "generated/<sha256>.png" and
+# "variants/<sha256>-w512.webp". The local backend maps keys onto STORAGE_PATH
+# and the API serves them itself; the S3 backend keeps them in a bucket and the
+# API only redirects to presigned (or public) URLs, so bytes never pass through
+# the API process and every container sees the same artifacts.
+GENERATED_PREFIX = "generated"
+VARIANTS_PREFIX = "variants"
+
+
+def generated_dir() -> Path:
+    """Local directory for generated artifacts (served under /images by the local backend)."""
+    return Path(settings.storage_path) / GENERATED_PREFIX
+
+
+def spool_dir() -> Path:
+    """Local scratch space for artifacts that are still being written."""
+    return Path(settings.storage_path) / "incoming"
+
+
+def generated_key(filename: str) -> str:
+    return f"{GENERATED_PREFIX}/{filename}"
+
+
+def variant_key(filename: str) -> str:
+    return f"{VARIANTS_PREFIX}/{filename}"
+
+
+class StorageBackend:
+    """Where artifacts live once ingested."""
+
+    name = "base"
+    # Whether the API can serve files from its own disk
+    is_local = False
+
+    def save_file(self, local_path: str, key: str, content_type: str) -> bool:
+        """Move a finished local file into storage under ``key``.
+
+        The local file is consumed either way. Returns False if ``key`` already
+        existed (content-addressed keys make that a harmless duplicate).
+        """
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def list_keys(self, prefix: str) -> Iterator[Tuple[str, float]]:
+        """``(key, modified_at)`` for every stored artifact under ``prefix`` (one level)."""
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """Filesystem path for ``key``, for backends that have one."""
+        return None
+
+    def url(self, key: str) -> Optional[str]:
+        """URL clients can fetch ``key`` from directly, or None to serve it via the API."""
+        return None
+
+
+class LocalStorage(StorageBackend):
+    """Artifacts on the local filesystem under STORAGE_PATH (single host only)."""
+
+    name = "local"
+    is_local = True
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def local_path(self, key: str) -> Path:
+        return self.root / key
+
+    def save_file(self, local_path: str, key: str, content_type: str) -> bool:
+        destination = self.local_path(key)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        if destination.exists():
+            os.unlink(local_path)
+            return False
+        os.replace(local_path, destination)
+        return True
+
+    def exists(self, key: str) -> bool:
+        return self.local_path(key).is_file()
+
+    def delete(self, key: str) -> None:
+        self.local_path(key).unlink(missing_ok=True)
+
+    def list_keys(self, prefix: str) -> Iterator[Tuple[str, float]]:
+        try:
+            entries = os.scandir(self.root / prefix)
+        except FileNotFoundError:
+            return
+        with entries:
+            for entry in entries:
+                # .part files are variants still being rendered
+                if entry.is_file() and not entry.name.endswith(".part"):
+                    yield f"{prefix}/{entry.name}", entry.stat().st_mtime
+
+
+class S3Storage(StorageBackend):
+    """Artifacts in an S3-compatible bucket (AWS S3, MinIO, R2, ...)."""
+
+    name = "s3"
+
+    def __init__(self):
+        # Optional dependency: only needed when STORAGE_BACKEND=s3
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        if not settings.s3_bucket:
+            raise RuntimeError("S3_BUCKET must be set when STORAGE_BACKEND=s3")
+
+        self.bucket = settings.s3_bucket
+        self.prefix = settings.s3_prefix
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.s3_endpoint_url,
+            region_name=settings.s3_region,
+            aws_access_key_id=settings.s3_access_key_id,
+            aws_secret_access_key=settings.s3_secret_access_key,
+            config=Config(
+                max_pool_connections=settings.s3_max_connections,
+                connect_timeout=settings.http_connect_timeout,
+                read_timeout=settings.http_read_timeout,
+                retries={"max_attempts": 3, "mode": "standard"},
+                s3={"addressing_style": settings.s3_addressing_style},
+            ),
+        )
+        # Uploads stream the file in parts; anything above the threshold goes multipart
+        self.transfer_config = TransferConfig(
+            multipart_threshold=settings.s3_multipart_chunk_size,
+            multipart_chunksize=settings.s3_multipart_chunk_size,
+            max_concurrency=settings.s3_upload_concurrency,
+        )
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def save_file(self, local_path: str, key: str, content_type: str) -> bool:
+        try:
+            if self.exists(key):
+                return False
+            self.client.upload_file(
+                local_path,
+                self.bucket,
+                self._object_key(key),
+                ExtraArgs={
+                    "ContentType": content_type,
+                    "CacheControl": "public, max-age=31536000, immutable",
+                },
+                Config=self.transfer_config,
+            )
+            return True
+        finally:
+            Path(local_path).unlink(missing_ok=True)
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def list_keys(self, prefix: str) -> Iterator[Tuple[str, float]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._object_key(f"{prefix}/"), Delimiter="/"):
+            for obj in page.get("Contents", []):
+                yield obj["Key"][len(self.prefix):], obj["LastModified"].timestamp()
+
+    def url(self, key: str) -> str:
+        if settings.s3_public_base_url:
+            return f"{settings.s3_public_base_url.rstrip('/')}/{self._object_key(key)}"
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._object_key(key)},
+            ExpiresIn=settings.s3_presign_ttl,
+        )
+
+
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    """The configured storage backend, created on first use."""
+    global _storage
+    if _storage is None:
+        if settings.storage_backend == "s3":
+            _storage = S3Storage()
+        elif settings.storage_backend == "local":
+            _storage = LocalStorage(settings.storage_path)
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND '{settings.storage_backend}'")
+        logger.info(f"Using {_storage.name} artifact storage")
+    return _storage
+
+
+def reset_storage() -> None:
+    """Forget the backend inherited from a parent process (call after fork)."""
+    global _storage
+    _storage = None
+
+
+def persist_artifacts() -> bool:
+    """Whether workers should copy outputs into storage rather than keep the CDN URL.
+
+    Shared storage works everywhere; local disk only in development, since
+    separate containers don't share it.
+    """
+    return settings.storage_backend != "local" or settings.debug
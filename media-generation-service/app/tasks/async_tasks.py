@@ -0,0 +1,288 @@
+from app.core import metrics, tracing
+from app.core.database import AsyncSessionLocal
+from app.services.job_service import AsyncJobService
+from app.services.artifacts import async_ingest_artifact
+from app.services import cancellation, heartbeat, rate_limit, status_cache
+from app.services.http_client import ThrottledError
+from app.services.storage import persist_artifacts
+from app.services.media_client import replicate_client, PredictionCancelled
+from app.models.schemas import JobUpdate, JobStatus
+from app.core.config import settings
+from app.tasks import celery_tasks
+from app.tasks.celery_tasks import (
+    PREDICTION_ERRORS,
+    RUNNABLE_STATUSES,
+    checkpointed_prediction,
+    finish_scheduled,
+    observe_queue_time,
+    prediction_image_url,
+    requeue_throttled,
+    retry_countdown,
+)
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Coroutine versions of the blocking-mode job pipeline, run by the asyncio
+# worker (python -m worker.async_worker). They make the same guarded status
+# transitions as the Celery tasks in celery_tasks.py, so both kinds of worker
+# can consume the same queue side by side.
+#
+# Hundreds of jobs wait on Replicate at once in one process, far more than the
+# database pool holds, so every step opens its own short session instead of
+# holding one for the whole job. Follow-up messages (retries, throttled
+# requeues, scheduler dispatch) are published through Celery/kombu, which
+# blocks, so those calls run in a thread.
+
+
+async def start_job(job_id: str):
+    """Move a job to processing and return it, with its checkpoint. None if it isn't runnable."""
+    async with AsyncSessionLocal() as db:
+        job = await AsyncJobService.update_job(
+            db, job_id,
+            JobUpdate(status=JobStatus.PROCESSING, started_at=datetime.now(timezone.utc)),
+            expected_status=RUNNABLE_STATUSES
+        )
+    if job is None:
+        logger.info(f"Job {job_id} is not runnable, skipping")
+        return None
+    observe_queue_time(job)
+    return job
+
+
+async def record_prediction_id(job_id: str, prediction_id: str) -> bool:
+    """Attach the prediction ID to a processing job. False if the job moved on meanwhile."""
+    async with AsyncSessionLocal() as db:
+        return await AsyncJobService.update_job(
+            db, job_id,
+            JobUpdate(replicate_prediction_id=prediction_id, prediction_created_at=datetime.now(timezone.utc)),
+            expected_status=[JobStatus.PROCESSING]
+        ) is not None
+
+
+async def release_job(job_id: str) -> bool:
+    """Return a processing job to pending without touching its retry count."""
+    async with AsyncSessionLocal() as db:
+        return await AsyncJobService.update_job(
+            db, job_id,
+            JobUpdate(status=JobStatus.PENDING),
+            expected_status=[JobStatus.PROCESSING]
+        ) is not None
+
+
+async def update_processing_job(job_id: str, job_update: JobUpdate) -> bool:
+    """Guarded update of a processing job. False if another path finished the job."""
+    async with AsyncSessionLocal() as db:
+        return await AsyncJobService.update_job(
+            db, job_id, job_update, expected_status=[JobStatus.PROCESSING]
+        ) is not None
+
+
+async def record_job_failure(job_id: str, error: Exception):
+    """Mark a job failed and bump its retry count (see celery_tasks.record_job_failure)."""
+    logger.error(f"Job {job_id} failed: {error}", exc_info=True)
+    async with AsyncSessionLocal() as db:
+        return await AsyncJobService.fail_job(
+            db, job_id, str(error), discard_prediction=isinstance(error, PREDICTION_ERRORS)
+        )
+
+
+async def complete_job_from_prediction(
+    job_id: str,
+    prediction: Dict[str, Any],
+    finished_at: Optional[datetime] = None
+) -> bool:
+    """Store the result of a finished prediction and mark the job completed.
+
+    Same outcomes, checkpoint and return value as
+    celery_tasks.complete_job_from_prediction; the artifact is streamed in on
+    the event loop and only the final store runs in a thread.
+    """
+    image_url = prediction_image_url(prediction)
+
+    if persist_artifacts():
+        if finished_at is None:
+            finished_at = datetime.now(timezone.utc)
+            if not await update_processing_job(
+                job_id, JobUpdate(prediction_output_url=image_url, prediction_finished_at=finished_at)
+            ):
+                return False
+        logger.info(f"Storing image in {settings.storage_backend} storage from: {image_url}")
+        try:
+            artifact = await async_ingest_artifact(image_url)
+        except Exception as download_error:
+            logger.error(f"Failed to download image for job {job_id}: {download_error}")
+            # Fall back to direct URL
+            if not await update_processing_job(job_id, JobUpdate(
+                status=JobStatus.COMPLETED,
+                media_path=image_url,
+                prediction_finished_at=finished_at,
+                stored_at=datetime.now(timezone.utc)
+            )):
+                return False
+            logger.warning(f"Job {job_id} completed with direct URL fallback: {image_url}")
+            return True
+
+        local_path = f"/images/{artifact.filename}"
+        if not await update_processing_job(job_id, JobUpdate(
+            status=JobStatus.COMPLETED,
+            media_path=local_path,
+            byte_size=artifact.byte_size,
+            mime_type=artifact.mime_type,
+            content_sha256=artifact.sha256,
+            prediction_finished_at=finished_at,
+            stored_at=datetime.now(timezone.utc)
+        )):
+            return False
+        logger.info(f"Job {job_id} completed successfully with stored image: {local_path}")
+    else:
+        finished_at = finished_at or datetime.now(timezone.utc)
+        logger.info(f"Production mode: Using direct CDN URL: {image_url}")
+        if not await update_processing_job(job_id, JobUpdate(
+            status=JobStatus.COMPLETED,
+            media_path=image_url,
+            prediction_finished_at=finished_at,
+            stored_at=finished_at
+        )):
+            return False
+        logger.info(f"Job {job_id} completed successfully with CDN URL: {image_url}")
+    return True
+
+
+async def finish_attempt(job_id: str, won: bool) -> None:
+    """Free a job's scheduler slot once an attempt is done with it (see celery_tasks.finish_attempt)."""
+    if not won:
+        async with AsyncSessionLocal() as db:
+            job = await AsyncJobService.get_job(db, job_id)
+        if job is not None and not status_cache.is_terminal(job.status, job.retry_count):
+            return
+    await asyncio.to_thread(finish_scheduled, job_id)
+
+
+async def finish_cancelled(job_id: str) -> None:
+    """Wrap up a job that was cancelled (or reaped) while this worker had it."""
+    logger.info(f"Job {job_id} was cancelled, stopping")
+    await finish_attempt(job_id, won=False)
+
+
+async def abandon_prediction(job_id: str, prediction_id: str) -> None:
+    """Cancel a prediction whose job stopped processing while it was created (see celery_tasks.abandon_prediction)."""
+    await replicate_client.async_cancel_prediction(prediction_id)
+    raise PredictionCancelled(f"Job {job_id} stopped processing while prediction {prediction_id} was created")
+
+
+async def acquire_prediction_slot(job_id: str, model: str, input_data: Dict[str, Any]) -> bool:
+    """Reserve a Replicate slot before creating a prediction (see celery_tasks.acquire_prediction_slot)."""
+    delay = await rate_limit.async_reserve(model)
+    if delay <= 0:
+        return True
+    if delay <= settings.throttle_sleep_threshold:
+        await asyncio.sleep(delay)
+        return True
+    await asyncio.to_thread(
+        requeue_throttled, celery_tasks.process_media_generation, job_id, model, input_data, delay
+    )
+    return False
+
+
+async def handle_throttled(job_id: str, model: str, input_data: Dict[str, Any], error: ThrottledError) -> None:
+    """Put a job that got a 429 back in line without counting a failed attempt."""
+    await rate_limit.async_pause(error.retry_after)
+    if not await release_job(job_id):
+        return
+    metrics.JOB_RETRIES.labels(model, "throttled").inc()
+    delay = await rate_limit.async_reserve(model)
+    await asyncio.to_thread(
+        requeue_throttled, celery_tasks.process_media_generation, job_id, model, input_data, delay
+    )
+
+
+async def process_media_generation(
+    job_id: str,
+    model: str,
+    input_data: Dict[str, Any],
+    slot_reserved: bool = False
+) -> None:
+    """Coroutine equivalent of the ``process_media_generation`` Celery task.
+
+    Retries are published as that task with the same countdown, so they may be
+    picked up by either kind of worker. If the worker cancels the coroutine
+    while shutting down, the job goes back to pending and the redelivered
+    message resumes its prediction.
+    """
+    logger.info(f"Starting media generation for job {job_id}")
+    if not slot_reserved and not await acquire_prediction_slot(job_id, model, input_data):
+        return
+    started = time.monotonic()
+
+    async with heartbeat.async_track(job_id) as attempt:
+        try:
+            job = await start_job(job_id)
+            if not job:
+                await finish_attempt(job_id, won=False)
+                return
+            attempt.started = True
+
+            checkpoint = checkpointed_prediction(job)
+            if checkpoint:
+                logger.info(f"Resuming job {job_id} from the output of prediction {checkpoint['id']}")
+                won = await complete_job_from_prediction(job_id, checkpoint, finished_at=job.prediction_finished_at)
+            else:
+                prediction_id = job.replicate_prediction_id
+                if prediction_id:
+                    logger.info(f"Resuming job {job_id} with prediction {prediction_id}")
+                else:
+                    prediction_result = await replicate_client.async_create_prediction(model, input_data)
+                    prediction_id = prediction_result["id"]
+                    if not await record_prediction_id(job_id, prediction_id):
+                        await abandon_prediction(job_id, prediction_id)
+
+                logger.info(f"Waiting for prediction {prediction_id} to complete")
+                with tracing.span("replicate.wait", job_id=job_id, model=model, **{"prediction.id": prediction_id}):
+                    completed_prediction = await replicate_client.async_wait_for_prediction(
+                        prediction_id,
+                        timeout=settings.prediction_timeout,
+                        cancelled=lambda: cancellation.async_requested(job_id)
+                    )
+                won = await complete_job_from_prediction(job_id, completed_prediction)
+            metrics.JOB_RUN_SECONDS.labels(model, "completed").observe(time.monotonic() - started)
+            await finish_attempt(job_id, won)
+
+        except asyncio.CancelledError:
+            logger.warning(f"Job {job_id} interrupted by worker shutdown, returning it to pending")
+            await release_job(job_id)
+            raise
+        except PredictionCancelled:
+            metrics.JOB_RUN_SECONDS.labels(model, "cancelled").observe(time.monotonic() - started)
+            await finish_cancelled(job_id)
+        except ThrottledError as e:
+            await handle_throttled(job_id, model, input_data, e)
+        except Exception as e:
+            job = await record_job_failure(job_id, e)
+            if job is None:
+                await finish_attempt(job_id, won=False)
+                return
+            metrics.JOB_RUN_SECONDS.labels(model, "failed").observe(time.monotonic() - started)
+
+            if job.retry_count < settings.max_retries:
+                logger.info(f"Retrying job {job_id} (attempt {job.retry_count + 1})")
+                metrics.JOB_RETRIES.labels(model, "error").inc()
+                await asyncio.to_thread(
+                    celery_tasks.process_media_generation.apply_async,
+                    kwargs={"job_id": job_id, "model": model, "input_data": input_data},
+                    countdown=retry_countdown(job.retry_count),
+                )
+            else:
+                logger.error(f"Job {job_id} failed permanently after {settings.max_retries} retries")
+                metrics.JOB_FAILURES.labels(model).inc()
+                await asyncio.to_thread(finish_scheduled, job_id)
+
+
+# Celery task name -> coroutine the asyncio worker runs for its messages
+TASKS = {
+    celery_tasks.process_media_generation.name: process_media_generation,
+}
@@ -1,165 +1,951 @@
 from celery import current_task
+from celery.signals import (
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+)
 from worker.celery_app import celery_app
+from app.core import metrics, tracing
 from app.core.database import get_sync_db
 from app.services.job_service import SyncJobService
-from app.services.media_client import replicate_client
+from app.services.artifacts import ingest_artifact
+from app.services import cancellation, heartbeat, maintenance, outbox, rate_limit, scheduler, status_cache
+from app.services.http_client import ThrottledError, reset_http_clients
+from app.services.storage import persist_artifacts, reset_storage
+from app.services.media_client import (
+    replicate_client,
+    PredictionCancelled,
+    PredictionFailed,
+    TERMINAL_PREDICTION_STATUSES,
+)
 from app.models.schemas import JobUpdate, JobStatus
 from app.core.config import settings
-import os
 import logging
-import requests
-import uuid
-from pathlib import Path
-from typing import Dict, Any
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
-def download_and_save_image(image_url: str, job_id: str) -> str:
-    """Download image from URL and save it locally."""
-    try:
-        # Create storage directory if it doesn't exist
-        storage_dir = Path("storage/generated")
-        storage_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Generate unique filename
-        file_extension = ".png"  # Default to PNG
-        if image_url.lower().endswith(('.jpg', '.jpeg')):
-            file_extension = ".jpg"
-        elif image_url.lower().endswith('.webp'):
-            file_extension = ".webp"
+@worker_process_init.connect
+def _reset_connection_pools(**kwargs):
+    """Give each forked worker process its own HTTP connection pools and storage client."""
+    reset_http_clients()
+    replicate_client.reset()
+    reset_storage()
+
+
+@worker_init.connect
+def _start_metrics_server(sender=None, **kwargs):
+    """Expose worker metrics on WORKER_METRICS_PORT from the main worker process."""
+    if not settings.worker_metrics_port:
+        return
+    if metrics.multiprocess_enabled():
+        # Files left by a previous run would be aggregated as if still current
+        directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+        for name in os.listdir(directory):
+            if name.endswith(".db"):
+                os.unlink(os.path.join(directory, name))
+    elif getattr(sender, "concurrency", 1) > 1:
+        logger.warning("PROMETHEUS_MULTIPROC_DIR is not set; metrics from pool processes will not be exported")
+    metrics.start_metrics_server(settings.worker_metrics_port)
+
+
+@worker_process_shutdown.connect
+def _mark_metrics_process_dead(pid=None, **kwargs):
+    metrics.mark_process_dead(pid)
+    tracing.shutdown_tracing()
+
+
+# Trace context travels in the message headers (W3C traceparent) with the
+# publish time, so each task continues its job's trace and records how long
+# it sat in the queue. Open task spans are keyed by task ID until postrun.
+TRACE_HEADERS = ("traceparent", "tracestate")
+_task_spans: Dict[str, Any] = {}
+
+
+@before_task_publish.connect
+def _inject_trace_context(headers=None, **kwargs):
+    if headers is None:
+        return
+    tracing.inject(headers)
+    headers["published_at"] = time.time()
+
+
+@task_prerun.connect
+def _start_task_span(task_id=None, task=None, kwargs=None, **extra):
+    tracing.setup_tracing("media-generation-worker")
+    request = task.request
+    carrier = {key: getattr(request, key) for key in TRACE_HEADERS if getattr(request, key, None)}
+    attributes = tracing.job_attributes(
+        (kwargs or {}).get("job_id"),
+        (kwargs or {}).get("model"),
+        **{"celery.task": task.name, "celery.retries": request.retries or 0}
+    )
+    published_at = getattr(request, "published_at", None)
+    short_name = task.name.rsplit(".", 1)[-1]
+    with tracing.use_context(carrier):
+        if published_at:
+            tracing.record_interval(f"celery.queue {short_name}", published_at, **attributes)
+    _task_spans[task_id] = tracing.start_detached_span(
+        f"celery.run {short_name}", carrier, tracing.SpanKind.CONSUMER, **attributes
+    )
+
+
+@task_postrun.connect
+def _end_task_span(task_id=None, retval=None, state=None, **kwargs):
+    started = _task_spans.pop(task_id, None)
+    if started is None:
+        return
+    span, token = started
+    span.set_attribute("celery.state", state or "")
+    tracing.end_detached_span(span, token, retval if state == "FAILURE" and isinstance(retval, BaseException) else None)
+
+
+def extract_image_url(output: Any) -> Optional[str]:
+    """Pick the image URL out of a prediction output (list or plain string)."""
+    if isinstance(output, list) and len(output) > 0:
+        return output[0]
+    if isinstance(output, str):
+        return output
+    return None
+
+
+def prediction_image_url(prediction: Dict[str, Any]) -> str:
+    """Output URL of a finished prediction; raises if it did not succeed or produced no image."""
+    if prediction["status"] == "failed":
+        error_msg = prediction.get("error") or "Prediction failed"
+        raise PredictionFailed(f"Replicate prediction failed: {error_msg}")
+    if prediction["status"] != "succeeded":
+        raise PredictionFailed(f"Unexpected prediction status: {prediction['status']}")
+
+    image_url = extract_image_url(prediction["output"])
+    if not image_url:
+        raise PredictionFailed("No image URL in prediction output")
+    return image_url
+
+
+# Job execution checkpoints its stages on the job row, so a retry resumes from
+# the last one instead of paying for a new prediction:
+#   replicate_prediction_id   prediction created -> poll it again
+#   prediction_output_url     prediction succeeded -> only download and store
+#   status completed          artifact stored (one write with the completion)
+# Failures of the prediction itself (PREDICTION_ERRORS) clear the checkpoint,
+# so the retry creates a new prediction.
+PREDICTION_ERRORS = (PredictionFailed, TimeoutError)
+
+
+def checkpointed_prediction(job) -> Optional[Dict[str, Any]]:
+    """The succeeded prediction an earlier attempt saved on ``job``, shaped like get_prediction's result."""
+    if not (job.replicate_prediction_id and job.prediction_output_url):
+        return None
+    return {
+        "id": job.replicate_prediction_id,
+        "status": "succeeded",
+        "output": job.prediction_output_url,
+        "error": None,
+    }
+
+
+def checkpoint_prediction_output(db, job_id: str, image_url: str, finished_at: datetime) -> bool:
+    """Save a succeeded prediction's output before downloading it. False if the job moved on meanwhile."""
+    return SyncJobService.update_job(
+        db, job_id,
+        JobUpdate(prediction_output_url=image_url, prediction_finished_at=finished_at),
+        expected_status=[JobStatus.PROCESSING]
+    ) is not None
+
+
+def complete_job_from_prediction(
+    db,
+    job_id: str,
+    prediction: Dict[str, Any],
+    finished_at: Optional[datetime] = None
+) -> bool:
+    """Store the result of a finished prediction and mark the job completed.
+
+    Raises if the prediction did not succeed or produced no image, so callers
+    can route it through their normal failure handling. The completion is a
+    guarded transition from processing, so a job already finished by another
+    path (webhook, sweep, retry) is left alone. Returns whether this call
+    completed the job.
+
+    ``finished_at`` is passed when resuming from a checkpointed output;
+    otherwise the prediction was just seen finishing, and its output is
+    checkpointed before the download.
+    """
+    image_url = prediction_image_url(prediction)
+
+    if persist_artifacts():
+        if finished_at is None:
+            # When we saw the prediction finish (poll, webhook or blocking wait)
+            finished_at = datetime.now(timezone.utc)
+            if not checkpoint_prediction_output(db, job_id, image_url, finished_at):
+                return False
+        # Shared storage (or local disk in development): copy the output in,
+        # since Replicate CDN URLs expire. /images/ paths resolve to the file or,
+        # for remote storage, redirect to it.
+        logger.info(f"Storing image in {settings.storage_backend} storage from: {image_url}")
+        try:
+            artifact = ingest_artifact(image_url)
+            local_path = f"/images/{artifact.filename}"
             
-        filename = f"{job_id}_{uuid.uuid4().hex[:8]}{file_extension}"
-        file_path = storage_dir / filename
-        
-        # Download the image
-        logger.info(f"Downloading image from {image_url}")
-        response = requests.get(image_url, timeout=30, stream=True)
-        response.raise_for_status()
-        
-        # Save the image
-        with open(file_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
-        logger.info(f"Image saved to {file_path}")
-        return filename
-        
+            if not SyncJobService.update_job(
+                db, job_id,
+                JobUpdate(
+                    status=JobStatus.COMPLETED,
+                    media_path=local_path,
+                    byte_size=artifact.byte_size,
+                    mime_type=artifact.mime_type,
+                    content_sha256=artifact.sha256,
+                    prediction_finished_at=finished_at,
+                    stored_at=datetime.now(timezone.utc)
+                ),
+                expected_status=[JobStatus.PROCESSING]
+            ):
+                return False
+            logger.info(f"Job {job_id} completed successfully with stored image: {local_path}")
+            
+        except Exception as download_error:
+            logger.error(f"Failed to download image for job {job_id}: {download_error}")
+            # Fall back to direct URL
+            if not SyncJobService.update_job(
+                db, job_id,
+                JobUpdate(
+                    status=JobStatus.COMPLETED,
+                    media_path=image_url,
+                    prediction_finished_at=finished_at,
+                    stored_at=datetime.now(timezone.utc)
+                ),
+                expected_status=[JobStatus.PROCESSING]
+            ):
+                return False
+            logger.warning(f"Job {job_id} completed with direct URL fallback: {image_url}")
+    else:
+        finished_at = finished_at or datetime.now(timezone.utc)
+        # Production with local storage: use the direct CDN URL (Render containers don't share disks)
+        logger.info(f"Production mode: Using direct CDN URL: {image_url}")
+        if not SyncJobService.update_job(
+            db, job_id,
+            JobUpdate(
+                status=JobStatus.COMPLETED,
+                media_path=image_url,
+                prediction_finished_at=finished_at,
+                stored_at=finished_at
+            ),
+            expected_status=[JobStatus.PROCESSING]
+        ):
+            return False
+        logger.info(f"Job {job_id} completed successfully with CDN URL: {image_url}")
+    return True
+
+
+# Statuses a job may be (re)started from: new, or failed and awaiting a retry
+RUNNABLE_STATUSES = (JobStatus.PENDING, JobStatus.FAILED)
+
+
+def start_job(db, job_id: str):
+    """Move a job to processing and return it, with its checkpoint. None if it isn't runnable (e.g. already finished)."""
+    job = SyncJobService.update_job(
+        db, job_id,
+        JobUpdate(status=JobStatus.PROCESSING, started_at=datetime.now(timezone.utc)),
+        expected_status=RUNNABLE_STATUSES
+    )
+    if job is None:
+        logger.info(f"Job {job_id} is not runnable, skipping")
+        return None
+    observe_queue_time(job)
+    return job
+
+
+def observe_queue_time(job) -> None:
+    """Record how long a job waited before its first start."""
+    if not job.retry_count and job.created_at:
+        created_at = job.created_at if job.created_at.tzinfo else job.created_at.replace(tzinfo=timezone.utc)
+        metrics.JOB_QUEUE_SECONDS.labels(job.model).observe(
+            max(0.0, (datetime.now(timezone.utc) - created_at).total_seconds())
+        )
+
+
+def record_prediction_id(db, job_id: str, prediction_id: str) -> bool:
+    """Attach the prediction ID to a processing job. False if the job moved on meanwhile."""
+    return SyncJobService.update_job(
+        db, job_id,
+        JobUpdate(replicate_prediction_id=prediction_id, prediction_created_at=datetime.now(timezone.utc)),
+        expected_status=[JobStatus.PROCESSING]
+    ) is not None
+
+
+def release_job(db, job_id: str) -> bool:
+    """Return a processing job to pending without touching its retry count."""
+    return SyncJobService.update_job(
+        db, job_id,
+        JobUpdate(status=JobStatus.PENDING),
+        expected_status=[JobStatus.PROCESSING]
+    ) is not None
+
+
+def requeue_throttled(task, job_id: str, model: str, input_data: Dict[str, Any], delay: float) -> None:
+    """Re-publish an entry task to run once its reserved rate-limit slot comes up."""
+    logger.info(f"Job {job_id} throttled, running again in {delay:.1f}s")
+    task.apply_async(
+        kwargs={"job_id": job_id, "model": model, "input_data": input_data, "slot_reserved": True},
+        countdown=delay,
+    )
+
+
+def acquire_prediction_slot(task, job_id: str, model: str, input_data: Dict[str, Any]) -> bool:
+    """Reserve a Replicate slot before creating a prediction.
+
+    Short waits are slept off in place; longer ones requeue the task for when
+    the slot comes up, and False is returned. Neither counts as an attempt.
+    """
+    delay = rate_limit.reserve(model)
+    if delay <= 0:
+        return True
+    if delay <= settings.throttle_sleep_threshold:
+        time.sleep(delay)
+        return True
+    requeue_throttled(task, job_id, model, input_data, delay)
+    return False
+
+
+def handle_throttled(db, task, job_id: str, model: str, input_data: Dict[str, Any], error: ThrottledError) -> None:
+    """Put a job that got a 429 back in line without counting a failed attempt."""
+    rate_limit.pause(error.retry_after)
+    if not release_job(db, job_id):
+        return
+    metrics.JOB_RETRIES.labels(model, "throttled").inc()
+    requeue_throttled(task, job_id, model, input_data, rate_limit.reserve(model))
+
+
+def trigger_dispatch() -> None:
+    """Run ``dispatch_jobs`` soon.
+
+    Jobs carry their own trace context through the scheduler, so the dispatch
+    run is kept out of the caller's trace.
+    """
+    with tracing.detached():
+        dispatch_jobs.delay()
+
+
+def finish_scheduled(job_id: str) -> None:
+    """Free a finished job's scheduler slot and let the next queued job through."""
+    if settings.scheduler_enabled and scheduler.release(job_id):
+        trigger_dispatch()
+
+
+def finish_attempt(db, job_id: str, won: bool) -> None:
+    """Free a job's scheduler slot once an attempt is done with it.
+
+    The slot belongs to the job, not to the attempt: a duplicate delivery, or
+    an attempt overtaken by the reaper's restart (which runs in the same slot),
+    loses its guarded transition while another attempt still has the job. So
+    unless this attempt ``won`` its last transition, the slot is only freed if
+    the job is gone or finished for good (e.g. cancelled meanwhile).
+    """
+    if not won:
+        # The session may still hold the job as this attempt last saw it
+        db.expire_all()
+        job = SyncJobService.get_job(db, job_id)
+        if job is not None and not status_cache.is_terminal(job.status, job.retry_count):
+            return
+    finish_scheduled(job_id)
+
+
+def finish_cancelled(db, job_id: str) -> None:
+    """Wrap up a job that was cancelled (or reaped) while a worker had it (its prediction is cancelled upstream already)."""
+    logger.info(f"Job {job_id} was cancelled, stopping")
+    finish_attempt(db, job_id, won=False)
+
+
+def abandon_prediction(job_id: str, prediction_id: str) -> None:
+    """Cancel a prediction whose job was cancelled (or reaped) while it was being created.
+
+    Its ID never made it onto the job, so nothing would ever poll or cancel it.
+    Raises PredictionCancelled.
+    """
+    replicate_client.cancel_prediction(prediction_id)
+    raise PredictionCancelled(f"Job {job_id} stopped processing while prediction {prediction_id} was created")
+
+
+def record_job_failure(db, job_id: str, error: Exception):
+    """Mark a job as failed and bump its retry count in one statement.
+
+    Returns the updated job, or None if the job was no longer pending or
+    processing (another path finished it), in which case it must not be retried.
+    The job's prediction checkpoint is kept unless the prediction itself failed.
+    """
+    logger.error(f"Job {job_id} failed: {error}", exc_info=True)
+    return SyncJobService.fail_job(
+        db, job_id, str(error), discard_prediction=isinstance(error, PREDICTION_ERRORS)
+    )
+
+
+def lateness(eta) -> float:
+    """Seconds a countdown task started after its ETA (0 without one)."""
+    if not eta:
+        return 0.0
+    if isinstance(eta, str):
+        eta = datetime.fromisoformat(eta)
+    if eta.tzinfo is None:
+        eta = eta.replace(tzinfo=timezone.utc)
+    return max(0.0, time.time() - eta.timestamp())
+
+
+def retry_countdown(retry_count: int) -> int:
+    """Exponential backoff delay (seconds) before the next attempt."""
+    return int(settings.retry_backoff_base ** retry_count * 60)
+
+
+def resubmit_or_fail(db, job_id: str, model: str, input_data: Dict[str, Any], error: Exception) -> bool:
+    """Record a failed attempt and resubmit the job if it has retries left.
+
+    Used by the stages that run after submission. The resubmitted job resumes
+    from its checkpoint, or creates a new prediction if this one failed.
+    Returns False once retries are exhausted (True also when another path
+    already finished the job).
+    """
+    job = record_job_failure(db, job_id, error)
+    if job is None:
+        finish_attempt(db, job_id, won=False)
+        return True
+    
+    if job.retry_count < settings.max_retries:
+        logger.info(f"Resubmitting job {job_id} (attempt {job.retry_count + 1})")
+        metrics.JOB_RETRIES.labels(model, "error").inc()
+        submit_media_generation.apply_async(
+            kwargs={"job_id": job_id, "model": model, "input_data": input_data},
+            countdown=retry_countdown(job.retry_count),
+        )
+        return True
+    
+    logger.error(f"Job {job_id} failed permanently after {settings.max_retries} retries")
+    metrics.JOB_FAILURES.labels(model).inc()
+    finish_scheduled(job_id)
+    return False
+
+
+def job_input_data(job) -> Dict[str, Any]:
+    """Rebuild the Replicate input for a stored job."""
+    return {"prompt": job.prompt, **(job.parameters or {})}
+
+
+def _entry_task():
+    """Task that starts a job in the configured execution mode."""
+    if settings.execution_mode in ("reconcile", "webhook"):
+        return submit_media_generation
+    return process_media_generation
+
+
+def publish_outbox_entries(entries) -> None:
+    """Hand new jobs from the outbox to the scheduler, or straight to Celery.
+
+    With the scheduler the jobs join their lanes in one pipelined round trip
+    and one dispatch run follows. Without it the entry tasks are published
+    over a single broker connection. Each job is published under its
+    submitting request's trace.
+    """
+    now = time.time()
+    for entry in entries:
+        with tracing.use_context(entry.payload.get("trace")):
+            if entry.created_at:
+                tracing.record_interval("outbox.wait", entry.created_at.timestamp(), now,
+                                        job_id=entry.job_id, model=entry.payload["model"])
+
+    if settings.scheduler_enabled:
+        added = scheduler.enqueue_many(
+            (
+                entry.job_id, entry.payload["model"], entry.payload.get("tenant_id"),
+                entry.payload["input_data"], entry.payload.get("trace") or {},
+            )
+            for entry in entries
+        )
+        if added < len(entries):
+            logger.info(f"Skipped {len(entries) - added} replayed outbox entries already queued or in flight")
+        if added:
+            trigger_dispatch()
+        return
+    task = _entry_task()
+    with celery_app.producer_or_acquire() as producer:
+        for entry in entries:
+            with tracing.use_context(entry.payload.get("trace")):
+                task.apply_async(
+                    kwargs={"job_id": entry.job_id, "model": entry.payload["model"], "input_data": entry.payload["input_data"]},
+                    producer=producer,
+                )
+
+
+@celery_app.task(name="app.tasks.celery_tasks.cancel_predictions")
+def cancel_predictions(prediction_ids: List[str]) -> int:
+    """Cancel the in-flight predictions of cancelled jobs on Replicate (one task per chunk of a cancel).
+
+    Best effort, like every upstream cancel: a worker that notices the job's
+    cancellation flag cancels its prediction again.
+    """
+    cancelled = replicate_client.cancel_predictions(prediction_ids)
+    logger.info(f"Cancelled {cancelled} of {len(prediction_ids)} predictions upstream")
+    return cancelled
+
+
+@celery_app.task(name="app.tasks.celery_tasks.relay_outbox")
+def relay_outbox():
+    """Publish jobs left in the outbox (safety net for the relay process).
+
+    Safe to run alongside ``python -m worker.relay``: relays skip each other's rows.
+    """
+    relayed = outbox.drain(publish_outbox_entries)
+    if relayed:
+        logger.info(f"Relayed {relayed} outbox entries")
+    return relayed
+
+
+@celery_app.task(name="app.tasks.celery_tasks.dispatch_jobs")
+def dispatch_jobs():
+    """Move jobs from the scheduler lanes onto the Celery queue in fair order.
+
+    Stops once the in-flight caps are reached; each finished job triggers
+    another run, and Celery beat runs it periodically as a safety net.
+    """
+    if not settings.scheduler_enabled:
+        return 0
+    task = _entry_task()
+    jobs = []
+    while True:
+        job = scheduler.dispatch()
+        if job is None:
+            break
+        jobs.append(job)
+    if not jobs:
+        return 0
+
+    # Stamp the hand-off before publishing, so a worker never starts a job
+    # that doesn't have its enqueued_at yet. The jobs have already left their
+    # lanes, so a failure here must not stop them from being published.
+    try:
+        with next(get_sync_db()) as db:
+            SyncJobService.mark_enqueued(db, [job["job_id"] for job in jobs], datetime.now(timezone.utc))
     except Exception as e:
-        logger.error(f"Failed to download and save image: {e}")
-        raise
+        logger.warning(f"Failed to record enqueue time for {len(jobs)} jobs: {e}")
+
+    for job in jobs:
+        # Publish under the submitting request's trace, not this dispatch run's
+        with tracing.use_context(job.get("trace")):
+            if job.get("enqueued_at"):
+                tracing.record_interval(
+                    "scheduler.queue", job["enqueued_at"],
+                    job_id=job["job_id"], model=job["model"], **{"tenant.id": job.get("tenant")}
+                )
+            task.apply_async(kwargs={"job_id": job["job_id"], "model": job["model"], "input_data": job["input_data"]})
+    logger.info(f"Dispatched {len(jobs)} queued jobs")
+    return len(jobs)
 
 
 @celery_app.task(bind=True, name="app.tasks.celery_tasks.process_media_generation")
-def process_media_generation(self, job_id: str, model: str, input_data: Dict[str, Any]):
+def process_media_generation(
+    self,
+    job_id: str,
+    model: str,
+    input_data: Dict[str, Any],
+    slot_reserved: bool = False
+):
     """Process media generation using Replicate API."""
     logger.info(f"Starting media generation for job {job_id}")
+    if not slot_reserved and not acquire_prediction_slot(self, job_id, model, input_data):
+        return
+    started = time.monotonic()
     
-    with next(get_sync_db()) as db:
+    with heartbeat.track(job_id) as attempt, next(get_sync_db()) as db:
         try:
             # Update job status to processing
-            SyncJobService.update_job(
-                db, job_id, 
-                JobUpdate(status=JobStatus.PROCESSING)
-            )
-            
-            # Create prediction with Replicate
-            prediction_result = replicate_client.create_prediction(model, input_data)
-            prediction_id = prediction_result["id"]
-            
-            # Update job with prediction ID
-            SyncJobService.update_job(
-                db, job_id,
-                JobUpdate(replicate_prediction_id=prediction_id)
-            )
+            job = start_job(db, job_id)
+            if not job:
+                finish_attempt(db, job_id, won=False)
+                return
+            attempt.started = True
             
-            # Wait for prediction to complete (with 10 minute timeout)
-            logger.info(f"Waiting for prediction {prediction_id} to complete")
-            completed_prediction = replicate_client.wait_for_prediction(prediction_id, timeout=600)
-            
-            if completed_prediction["status"] == "succeeded":
-                output = completed_prediction["output"]
+            checkpoint = checkpointed_prediction(job)
+            if checkpoint:
+                logger.info(f"Resuming job {job_id} from the output of prediction {checkpoint['id']}")
+                won = complete_job_from_prediction(db, job_id, checkpoint, finished_at=job.prediction_finished_at)
+            else:
+                prediction_id = job.replicate_prediction_id
+                if prediction_id:
+                    logger.info(f"Resuming job {job_id} with prediction {prediction_id}")
+                else:
+                    # Create prediction with Replicate
+                    prediction_result = replicate_client.create_prediction(model, input_data)
+                    prediction_id = prediction_result["id"]
+                    
+                    # Update job with prediction ID
+                    if not record_prediction_id(db, job_id, prediction_id):
+                        abandon_prediction(job_id, prediction_id)
                 
-                # Handle different output formats
-                image_url = None
-                if isinstance(output, list) and len(output) > 0:
-                    image_url = output[0]
-                elif isinstance(output, str):
-                    image_url = output
+                # Wait for prediction to complete (or the job to be cancelled)
+                logger.info(f"Waiting for prediction {prediction_id} to complete")
+                with tracing.span("replicate.wait", job_id=job_id, model=model, **{"prediction.id": prediction_id}):
+                    completed_prediction = replicate_client.wait_for_prediction(
+                        prediction_id,
+                        timeout=settings.prediction_timeout,
+                        cancelled=lambda: cancellation.requested(job_id)
+                    )
+                won = complete_job_from_prediction(db, job_id, completed_prediction)
+            metrics.JOB_RUN_SECONDS.labels(model, "completed").observe(time.monotonic() - started)
+            finish_attempt(db, job_id, won)
                 
-                if image_url:
-                    # Check if we're in production (DEBUG=false) or development
-                    debug_mode = settings.debug if hasattr(settings, 'debug') else True
-                    
-                    if debug_mode:
-                        # Development: Download and save locally
-                        logger.info(f"Development mode: Downloading and saving image from: {image_url}")
-                        try:
-                            filename = download_and_save_image(image_url, job_id)
-                            local_path = f"/images/{filename}"
-                            
-                            SyncJobService.update_job(
-                                db, job_id,
-                                JobUpdate(
-                                    status=JobStatus.COMPLETED,
-                                    media_path=local_path
-                                )
-                            )
-                            logger.info(f"Job {job_id} completed successfully with local image: {local_path}")
-                            
-                        except Exception as download_error:
-                            logger.error(f"Failed to download image for job {job_id}: {download_error}")
-                            # Fall back to direct URL
-                            SyncJobService.update_job(
-                                db, job_id,
-                                JobUpdate(
-                                    status=JobStatus.COMPLETED,
-                                    media_path=image_url
-                                )
-                            )
-                            logger.warning(f"Job {job_id} completed with direct URL fallback: {image_url}")
-                    else:
-                        # Production: Use direct CDN URL (Render containers don't share storage)
-                        logger.info(f"Production mode: Using direct CDN URL: {image_url}")
-                        SyncJobService.update_job(
-                            db, job_id,
-                            JobUpdate(
-                                status=JobStatus.COMPLETED,
-                                media_path=image_url
-                            )
-                        )
-                        logger.info(f"Job {job_id} completed successfully with CDN URL: {image_url}")
-                else:
-                    raise Exception("No image URL in prediction output")
+        except PredictionCancelled:
+            metrics.JOB_RUN_SECONDS.labels(model, "cancelled").observe(time.monotonic() - started)
+            finish_cancelled(db, job_id)
+        except ThrottledError as e:
+            handle_throttled(db, self, job_id, model, input_data, e)
+        except Exception as e:
+            job = record_job_failure(db, job_id, e)
+            if job is None:
+                finish_attempt(db, job_id, won=False)
+                return
+            metrics.JOB_RUN_SECONDS.labels(model, "failed").observe(time.monotonic() - started)
             
-            elif completed_prediction["status"] == "failed":
-                error_msg = completed_prediction.get("error", "Prediction failed")
-                raise Exception(f"Replicate prediction failed: {error_msg}")
+            # Retry if under limit
+            if job.retry_count < settings.max_retries:
+                logger.info(f"Retrying job {job_id} (attempt {job.retry_count + 1})")
+                metrics.JOB_RETRIES.labels(model, "error").inc()
+                raise self.retry(
+                    countdown=retry_countdown(job.retry_count),
+                    max_retries=settings.max_retries
+                )
+            else:
+                logger.error(f"Job {job_id} failed permanently after {settings.max_retries} retries")
+                metrics.JOB_FAILURES.labels(model).inc()
+                finish_scheduled(job_id)
+                raise
+
+
+@celery_app.task(bind=True, name="app.tasks.celery_tasks.submit_media_generation")
+def submit_media_generation(
+    self,
+    job_id: str,
+    model: str,
+    input_data: Dict[str, Any],
+    slot_reserved: bool = False
+):
+    """Submit stage of the reconcile and webhook execution modes.
+
+    Creates the prediction and returns instead of waiting for it, so the worker
+    slot is freed immediately. Completion is then picked up by
+    ``reconcile_prediction`` or, in webhook mode, by the webhook receiver
+    (with ``sweep_stale_predictions`` as a safety net). A retried job that
+    already has a prediction resumes it instead of creating another.
+    """
+    logger.info(f"Submitting media generation for job {job_id}")
+    webhook_mode = settings.execution_mode == "webhook"
+    if not slot_reserved and not acquire_prediction_slot(self, job_id, model, input_data):
+        return
+    
+    with heartbeat.track(job_id) as attempt, next(get_sync_db()) as db:
+        try:
+            job = start_job(db, job_id)
+            if not job:
+                finish_attempt(db, job_id, won=False)
+                return
+            attempt.started = True
+            
+            checkpoint = checkpointed_prediction(job)
+            if checkpoint:
+                logger.info(f"Resuming job {job_id} from the output of prediction {checkpoint['id']}")
+                won = complete_job_from_prediction(db, job_id, checkpoint, finished_at=job.prediction_finished_at)
+                finish_attempt(db, job_id, won)
+                return
             
+            prediction_id = job.replicate_prediction_id
+            resumed = prediction_id is not None
+            if resumed:
+                # The webhook for it may be long gone, so reconcile it in either mode
+                logger.info(f"Resuming job {job_id} with prediction {prediction_id}")
             else:
-                raise Exception(f"Unexpected prediction status: {completed_prediction['status']}")
+                prediction_result = replicate_client.create_prediction(
+                    model, input_data,
+                    webhook=settings.get_replicate_webhook_url() if webhook_mode else None
+                )
+                prediction_id = prediction_result["id"]
                 
+                if not record_prediction_id(db, job_id, prediction_id):
+                    abandon_prediction(job_id, prediction_id)
+        except PredictionCancelled:
+            finish_cancelled(db, job_id)
+            return
+        except ThrottledError as e:
+            handle_throttled(db, self, job_id, model, input_data, e)
+            return
         except Exception as e:
-            logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            job = record_job_failure(db, job_id, e)
+            if job is None:
+                finish_attempt(db, job_id, won=False)
+                return
             
-            # Update job as failed
-            SyncJobService.update_job(
-                db, job_id,
-                JobUpdate(
-                    status=JobStatus.FAILED,
-                    error_message=str(e)
-                )
-            )
-            
-            # Increment retry count
-            job = SyncJobService.increment_retry_count(db, job_id)
-            
-            # Retry if under limit
-            if job and job.retry_count < settings.max_retries:
+            if job.retry_count < settings.max_retries:
                 logger.info(f"Retrying job {job_id} (attempt {job.retry_count + 1})")
+                metrics.JOB_RETRIES.labels(model, "error").inc()
                 raise self.retry(
-                    countdown=int(settings.retry_backoff_base ** job.retry_count * 60),
+                    countdown=retry_countdown(job.retry_count),
                     max_retries=settings.max_retries
                 )
+            logger.error(f"Job {job_id} failed permanently after {settings.max_retries} retries")
+            metrics.JOB_FAILURES.labels(model).inc()
+            finish_scheduled(job_id)
+            raise
+    
+    if webhook_mode and not resumed:
+        logger.info(f"Job {job_id} submitted as prediction {prediction_id}, awaiting webhook")
+        return
+    
+    # Dated at the first status check; each check beats again until the job finishes
+    heartbeat.beat([job_id], at=time.time() + settings.reconcile_poll_interval)
+    reconcile_prediction.apply_async(
+        kwargs={
+            "job_id": job_id,
+            "prediction_id": prediction_id,
+            "model": model,
+            "input_data": input_data,
+            "deadline": time.time() + settings.prediction_timeout,
+        },
+        countdown=settings.reconcile_poll_interval,
+    )
+    logger.info(f"Job {job_id} submitted as prediction {prediction_id}, reconciling in background")
+
+
+@celery_app.task(bind=True, name="app.tasks.celery_tasks.reconcile_prediction")
+def reconcile_prediction(
+    self,
+    job_id: str,
+    prediction_id: str,
+    model: str,
+    input_data: Dict[str, Any],
+    deadline: float,
+    poll_interval: Optional[float] = None,
+):
+    """Reconcile stage of the reconcile execution mode.
+
+    Checks the prediction once. If it is still running the task reschedules
+    itself with a growing countdown; otherwise it finishes the job. A failed
+    prediction goes back through ``submit_media_generation`` with the usual
+    retry budget and backoff. A cancelled job's prediction is cancelled
+    upstream and not checked again.
+    """
+    if cancellation.requested(job_id):
+        replicate_client.cancel_prediction(prediction_id)
+        heartbeat.clear([job_id])
+        with next(get_sync_db()) as db:
+            finish_cancelled(db, job_id)
+        return
+    
+    poll_interval = poll_interval or settings.reconcile_poll_interval
+    next_check = poll_interval
+    
+    try:
+        prediction = replicate_client.get_prediction(prediction_id)
+    except ThrottledError as e:
+        logger.warning(f"Status check for prediction {prediction_id} throttled")
+        prediction = {"id": prediction_id, "status": "unknown"}
+        if e.retry_after is not None:
+            next_check = max(poll_interval, e.retry_after)
+    except Exception as e:
+        # A failed status check says nothing about the prediction itself, so poll again
+        logger.warning(f"Could not check prediction {prediction_id} for job {job_id}: {e}")
+        prediction = {"id": prediction_id, "status": "unknown"}
+    
+    if prediction["status"] not in TERMINAL_PREDICTION_STATUSES and time.time() < deadline:
+        heartbeat.beat_reconcile(job_id, time.time() + next_check, lateness(self.request.eta))
+        reconcile_prediction.apply_async(
+            kwargs={
+                "job_id": job_id,
+                "prediction_id": prediction_id,
+                "model": model,
+                "input_data": input_data,
+                "deadline": deadline,
+                "poll_interval": min(poll_interval * 1.5, settings.reconcile_poll_interval_max),
+            },
+            countdown=next_check,
+        )
+        return
+    
+    with next(get_sync_db()) as db:
+        try:
+            if prediction["status"] not in TERMINAL_PREDICTION_STATUSES:
+                raise TimeoutError(f"Prediction {prediction_id} timed out after {settings.prediction_timeout} seconds")
+            won = complete_job_from_prediction(db, job_id, prediction)
+            finish_attempt(db, job_id, won)
+        except Exception as e:
+            if not resubmit_or_fail(db, job_id, model, input_data, e):
+                raise
+        finally:
+            heartbeat.clear([job_id])
+
+
+@celery_app.task(bind=True, name="app.tasks.celery_tasks.finalize_prediction")
+def finalize_prediction(self, job_id: str, prediction: Dict[str, Any], fetched: bool = False):
+    """Finish a job from a prediction that is already known to be terminal.
+
+    Called by the webhook receiver and the safety-net sweep, so the download
+    and DB writes happen on a worker instead of the API event loop. Unless
+    ``fetched`` says the prediction came from the Replicate API, it is fetched
+    again first: the result URL is only taken from Replicate itself, never
+    from a webhook body.
+    """
+    with next(get_sync_db()) as db:
+        job = SyncJobService.get_job(db, job_id)
+        if not job or job.status != JobStatus.PROCESSING.value:
+            logger.info(f"Ignoring prediction {prediction.get('id')} for job {job_id}: job is not processing")
+            if job and job.status == JobStatus.CANCELLED.value:
+                # A cancelled webhook-mode job held its scheduler slot until its prediction reported back
+                finish_scheduled(job_id)
+            return
+        if job.replicate_prediction_id != prediction.get("id"):
+            logger.info(f"Ignoring stale prediction {prediction.get('id')} for job {job_id}")
+            return
+        
+        if not fetched:
+            try:
+                prediction = replicate_client.get_prediction(job.replicate_prediction_id)
+            except ThrottledError as e:
+                raise self.retry(exc=e, countdown=e.retry_after or settings.throttle_default_retry_after)
+            except Exception as e:
+                # If the retries run out too, the sweep finds the prediction later
+                raise self.retry(exc=e, countdown=retry_countdown(self.request.retries))
+            if prediction["status"] not in TERMINAL_PREDICTION_STATUSES:
+                logger.warning(f"Prediction {prediction['id']} for job {job_id} is still {prediction['status']}")
+                return
+        
+        try:
+            won = complete_job_from_prediction(db, job_id, prediction)
+            finish_attempt(db, job_id, won)
+        except Exception as e:
+            if not resubmit_or_fail(db, job_id, job.model, job_input_data(job), e):
+                raise
+
+
+@celery_app.task(name="app.tasks.celery_tasks.sweep_stale_predictions")
+def sweep_stale_predictions():
+    """Safety net for lost webhooks: poll predictions that have gone quiet.
+
+    Runs periodically from Celery beat. Only jobs whose prediction has not
+    reported back within ``webhook_sweep_grace`` seconds are checked, so in
+    the normal case this makes no Replicate calls at all.
+    """
+    if settings.execution_mode != "webhook":
+        return 0
+    
+    now = datetime.now(timezone.utc)
+    timeout_cutoff = now - timedelta(seconds=settings.prediction_timeout)
+    
+    with next(get_sync_db()) as db:
+        jobs = SyncJobService.get_stale_predictions(
+            db, older_than=now - timedelta(seconds=settings.webhook_sweep_grace)
+        )
+        
+        swept = 0
+        for job in jobs:
+            try:
+                prediction = replicate_client.get_prediction(job.replicate_prediction_id)
+            except ThrottledError:
+                logger.warning("Sweep throttled by Replicate, resuming next run")
+                break
+            except Exception as e:
+                logger.warning(f"Sweep could not check prediction {job.replicate_prediction_id}: {e}")
+                continue
+            
+            if prediction["status"] in TERMINAL_PREDICTION_STATUSES:
+                logger.info(f"Sweep found finished prediction {prediction['id']} for job {job.id}")
+                finalize_prediction.delay(job_id=job.id, prediction=prediction, fetched=True)
+                swept += 1
+            elif job.updated_at and job.updated_at < timeout_cutoff:
+                error = TimeoutError(
+                    f"Prediction {job.replicate_prediction_id} timed out after {settings.prediction_timeout} seconds"
+                )
+                resubmit_or_fail(db, job.id, job.model, job_input_data(job), error)
+                swept += 1
+    
+    logger.info(f"Sweep checked {len(jobs)} quiet predictions, finalized {swept}")
+    return swept
+
+
+@celery_app.task(name="app.tasks.celery_tasks.reap_stuck_jobs")
+def reap_stuck_jobs():
+    """Retry processing jobs whose worker has gone away (OOM kill, redeploy).
+
+    Runs periodically from Celery beat. A job is stuck when its heartbeat is
+    older than ``job_stale_after`` or, as a backstop for lost heartbeats, when
+    it hasn't been updated for longer than any healthy run takes (and has no
+    fresh heartbeat either). In reconcile mode the threshold also allows for
+    how late status checks are running behind the queue. Each stuck job is
+    failed with its checkpoint kept and started again right away, so a job
+    that already has a prediction re-attaches to it instead of paying for
+    another. Retries count against ``max_retries``, so a job that keeps
+    killing its worker eventually fails for good.
+    """
+    if settings.job_stale_after <= 0:
+        return 0
+    
+    now = time.time()
+    stale_after = settings.job_stale_after
+    if settings.execution_mode == "reconcile":
+        stale_after += heartbeat.reconcile_lag()
+    stale_ids = heartbeat.stale(now - stale_after, settings.reaper_batch_size)
+    untouched_since = datetime.fromtimestamp(
+        now - settings.prediction_timeout - settings.job_stale_after, tz=timezone.utc
+    )
+    
+    with next(get_sync_db()) as db:
+        jobs = SyncJobService.get_stuck_jobs(db, stale_ids, untouched_since, settings.reaper_batch_size)
+        # Heartbeats left behind by jobs that finished anyway
+        heartbeat.clear(set(stale_ids) - {job.id for job in jobs})
+        # The backstop goes by updated_at alone, which status checks don't touch
+        alive = heartbeat.fresh([job.id for job in jobs], now - stale_after)
+        jobs = [job for job in jobs if job.id not in alive]
+        
+        reaped = 0
+        for job in jobs:
+            if settings.execution_mode == "webhook" and job.replicate_prediction_id:
+                continue  # waiting on its webhook, with sweep_stale_predictions as the safety net
+            error = RuntimeError("Worker lost while the job was processing")
+            failed = SyncJobService.fail_job(db, job.id, str(error), expected_status=[JobStatus.PROCESSING])
+            heartbeat.clear([job.id])
+            if failed is None:
+                continue
+            reaped += 1
+            
+            if failed.retry_count < settings.max_retries:
+                logger.warning(
+                    f"Job {job.id} lost its worker, restarting it"
+                    + (f" on prediction {job.replicate_prediction_id}" if job.replicate_prediction_id else "")
+                )
+                metrics.JOB_RETRIES.labels(job.model, "worker_lost").inc()
+                _entry_task().apply_async(
+                    kwargs={"job_id": job.id, "model": job.model, "input_data": job_input_data(job)}
+                )
             else:
-                logger.error(f"Job {job_id} failed permanently after {settings.max_retries} retries")
-                raise 
\ No newline at end of file
+                logger.error(f"Job {job.id} lost its worker and failed permanently after {settings.max_retries} retries")
+                metrics.JOB_FAILURES.labels(job.model).inc()
+                finish_scheduled(job.id)
+    
+    if reaped:
+        logger.warning(f"Reaped {reaped} stuck jobs")
+    return reaped
+
+
+@celery_app.task(bind=True, name="app.tasks.celery_tasks.run_maintenance")
+def run_maintenance(self, operations: Optional[List[str]] = None, dry_run: Optional[bool] = None):
+    """Storage and database housekeeping (see app/services/maintenance.py).
+
+    Celery beat runs the ``maintenance_operations``; POST /maintenance/runs
+    runs a chosen set. Progress is reported under the task ID.
+    """
+    if operations is None:
+        operations = [operation.strip() for operation in settings.maintenance_operations.split(",") if operation.strip()]
+    if dry_run is None:
+        dry_run = settings.maintenance_dry_run
+    with next(get_sync_db()) as db:
+        return maintenance.run_maintenance(db, self.request.id, operations, dry_run)
@@ -0,0 +1,68 @@
+"""Jobs accepted per second: one POST /generate per job vs POST /generate/batch.
+
+Submits the same number of jobs through the API in process (no network
+between client and app), singly with ``--concurrency`` requests in flight
+and in batches of each ``--batch-sizes``, and reports jobs accepted per second.
+
+    BENCH_DATABASE_URL=... BENCH_REDIS_URL=... python -m benchmarks.batch_submit
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks import common
+
+
+async def submit(client, prefix, jobs, batch_size, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(start):
+        count = min(batch_size or 1, jobs - start)
+        items = [{"prompt": f"benchmark {start + i}", "model": "bench/model:1"} for i in range(count)]
+        async with slots:
+            started = time.perf_counter()
+            if batch_size:
+                response = await client.post(f"{prefix}/generate/batch", json={"requests": items})
+            else:
+                response = await client.post(f"{prefix}/generate", json=items[0])
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code in (200, 202), response.text
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(start) for start in range(0, jobs, batch_size or 1)))
+    return latencies, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--batch-sizes", default="100,1000")
+    args = parser.parse_args()
+
+    common.configure(admission_max_wait="0")
+    import httpx
+    from app.core.config import settings
+    from app.main import app
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+    rows = []
+    for batch_size in [0] + [int(size) for size in args.batch_sizes.split(",")]:
+        common.reset()
+        latencies, elapsed = common.run_async(
+            submit(client, settings.api_v1_prefix, args.jobs, batch_size, args.concurrency)
+        )
+        rows.append([
+            f"batch of {batch_size}" if batch_size else "single", len(latencies),
+            f"{args.jobs / elapsed:.0f}", f"{common.percentile(latencies, 50) * 1000:.1f}",
+            f"{common.percentile(latencies, 99) * 1000:.1f}",
+        ])
+    common.run_async(client.aclose())
+
+    print(f"{args.jobs} jobs, up to {args.concurrency} requests in flight")
+    print(common.table(rows, ["submitted as", "requests", "jobs/s", "p50 ms/request", "p99 ms/request"]))
+
+
+if __name__ == "__main__":
+    main()
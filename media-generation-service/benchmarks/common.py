@@ -0,0 +1,107 @@
+"""Shared setup for the benchmarks (``python -m benchmarks.<name>``).
+
+Benchmarks that exercise the real stack run against the scratch Postgres
+database and Redis instance named by BENCH_DATABASE_URL and BENCH_REDIS_URL.
+Both are wiped on every run, so never point them at anything you care about.
+Call ``configure`` before importing anything from ``app``: settings are read
+once, at import time.
+"""
+import asyncio
+import logging
+import math
+import os
+import subprocess
+import sys
+from typing import Dict, List, Sequence
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One loop for every async helper: the app's async engine and Redis clients
+# stay bound to the loop they were first used on
+_loop = asyncio.new_event_loop()
+
+
+def configure(**overrides) -> Dict[str, str]:
+    """Point the app at the benchmark database and Redis, plus ``overrides``.
+
+    Returns the environment, for worker subprocesses.
+    """
+    missing = [name for name in ("BENCH_DATABASE_URL", "BENCH_REDIS_URL") if not os.environ.get(name)]
+    if missing:
+        sys.exit(f"Set {' and '.join(missing)} to a scratch database / Redis (they are wiped)")
+    os.environ.update({
+        "DATABASE_URL": os.environ["BENCH_DATABASE_URL"],
+        "REDIS_URL": os.environ["BENCH_REDIS_URL"],
+        "DEBUG": "false",
+        "WORKER_METRICS_PORT": "0",
+        "TRACING_EXPORTER": "none",
+        "REPLICATE_API_TOKEN": "benchmark",
+    })
+    os.environ.update({name.upper(): str(value) for name, value in overrides.items()})
+    # One INFO line per request would drown the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    return dict(os.environ)
+
+
+def migrate() -> None:
+    """Bring the benchmark database to the latest schema."""
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=SERVICE_DIR, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def run_async(coroutine):
+    """Run ``coroutine`` on the benchmarks' event loop."""
+    return _loop.run_until_complete(coroutine)
+
+
+def reset() -> None:
+    """Empty every table and the Redis database."""
+    import redis
+    from sqlalchemy import text
+    from app.core.config import settings
+    from app.core.database import Base, sync_engine
+    import app.models.job  # noqa: F401  (registers the tables)
+
+    migrate()
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    with sync_engine.begin() as connection:
+        connection.execute(text(f"TRUNCATE {tables} CASCADE"))
+    redis.Redis.from_url(settings.redis_url).flushdb()
+
+
+def create_jobs(count: int, model: str = "bench/model:1", tenant_id: str = "bench",
+                batch_id: str = "bench", chunk: int = 1000) -> List[str]:
+    """Insert ``count`` pending jobs (and their outbox entries). Returns their ids."""
+    from app.core.database import AsyncSessionLocal
+    from app.models.schemas import JobCreate
+    from app.services.job_service import AsyncJobService
+
+    async def insert() -> List[str]:
+        ids = []
+        async with AsyncSessionLocal() as db:
+            for start in range(0, count, chunk):
+                jobs = await AsyncJobService.create_jobs(db, [
+                    JobCreate(prompt=f"benchmark {i}", model=model, parameters={}, tenant_id=tenant_id)
+                    for i in range(start, min(count, start + chunk))
+                ], batch_id)
+                ids += [job.id for job in jobs]
+        return ids
+
+    return run_async(insert())
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    """The ``p``-th percentile (0-100) of ``values``, nearest rank."""
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+def table(rows: Sequence[Sequence], headers: Sequence[str]) -> str:
+    """Plain-text table for benchmark reports."""
+    cells = [[str(header) for header in headers]] + [[str(cell) for cell in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    lines = ["  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in cells]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
@@ -0,0 +1,187 @@
+"""Goodput under overload: prediction creates per second against an upstream quota.
+
+A fake Replicate allows ``--quota`` creates per second and answers 429 with a
+Retry-After beyond that. Jobs arrive at ``--offered`` per second for
+``--duration`` seconds and ``--workers`` threads create their predictions
+through the real Replicate client, with each throttling strategy:
+
+- per-worker limit: what the service did before the shared bucket. Each
+  worker holds itself to Celery's 5/s task rate limit, and a 429 is a failed
+  attempt, retried after ``retry_backoff_base ** n * 60`` seconds (scaled
+  by ``--backoff-scale`` so the retries land within the run).
+- shared bucket: the Redis token bucket at the quota. Workers wait for
+  their reserved slot (sleeping short waits, requeueing long ones), and a
+  429 pauses the bucket for the Retry-After and requeues the job without
+  counting an attempt.
+- shared bucket, over quota: the same, configured 50% above the quota, so
+  the Retry-After handling does the throttling.
+
+Each run lasts until every job has its prediction or has failed for good;
+goodput is successful creates per second over the run. Uses fakeredis for
+the bucket; needs no database or Redis.
+
+    python -m benchmarks.goodput
+"""
+import argparse
+import heapq
+import logging
+import sys
+import threading
+import time
+
+from benchmarks import common
+
+sys.path.insert(0, common.SERVICE_DIR)
+from tests.fake_replicate import FakeReplicate  # noqa: E402
+
+MODEL = "bench/model:1"
+# The Celery task annotation the shared bucket replaced
+WORKER_RATE_LIMIT = 5.0
+
+
+class JobQueue:
+    """Jobs due at a given time, like Celery countdowns."""
+
+    def __init__(self, total: int):
+        self._heap = []
+        self._ready = threading.Condition()
+        self._count = 0
+        self.unresolved = total  # jobs not yet created or failed for good
+
+    def put(self, due: float, job: dict) -> None:
+        with self._ready:
+            self._count += 1
+            heapq.heappush(self._heap, (due, self._count, job))
+            self._ready.notify()
+
+    def resolve(self) -> None:
+        with self._ready:
+            self.unresolved -= 1
+            if not self.unresolved:
+                self._ready.notify_all()
+
+    def get(self):
+        """The next due job, or None once every job is resolved."""
+        with self._ready:
+            while True:
+                if not self.unresolved:
+                    return None
+                now = time.monotonic()
+                if self._heap and self._heap[0][0] <= now:
+                    return heapq.heappop(self._heap)[2]
+                self._ready.wait(self._heap[0][0] - now if self._heap else None)
+
+
+def run(strategy: str, args, client, rate_limit, settings, ThrottledError):
+    count = int(args.offered * args.duration)
+    jobs = JobQueue(count)
+    results = {"created": 0, "throttled": 0, "failed_attempts": 0, "failed": 0, "waits": []}
+    lock = threading.Lock()
+    started = time.monotonic()
+
+    def arrivals():
+        for i in range(count):
+            due = started + i / args.offered
+            time.sleep(max(0.0, due - time.monotonic()))
+            jobs.put(due, {"arrived": due, "attempt": 0})
+
+    def worker():
+        last_create = 0.0
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            if strategy == "per-worker limit":
+                time.sleep(max(0.0, last_create + 1 / WORKER_RATE_LIMIT - time.monotonic()))
+                last_create = time.monotonic()
+            elif not job.get("slot_reserved"):
+                delay = rate_limit.reserve(MODEL)
+                if delay > settings.throttle_sleep_threshold:
+                    jobs.put(time.monotonic() + delay, dict(job, slot_reserved=True))
+                    continue
+                time.sleep(max(0.0, delay))
+            job["slot_reserved"] = False
+
+            try:
+                client.create_prediction(MODEL, {"prompt": "benchmark"})
+            except ThrottledError as e:
+                with lock:
+                    results["throttled"] += 1
+                if strategy == "per-worker limit":
+                    job["attempt"] += 1
+                    with lock:
+                        results["failed_attempts"] += 1
+                        failed = job["attempt"] > settings.max_retries
+                        results["failed"] += failed
+                    if failed:
+                        jobs.resolve()
+                        continue
+                    backoff = settings.retry_backoff_base ** job["attempt"] * 60 * args.backoff_scale
+                    jobs.put(time.monotonic() + backoff, job)
+                else:
+                    rate_limit.pause(e.retry_after)
+                    jobs.put(time.monotonic() + rate_limit.reserve(MODEL), dict(job, slot_reserved=True))
+                continue
+            with lock:
+                results["created"] += 1
+                results["waits"].append(time.monotonic() - job["arrived"])
+            jobs.resolve()
+
+    threads = [threading.Thread(target=arrivals, daemon=True)]
+    threads += [threading.Thread(target=worker, daemon=True) for _ in range(args.workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results["elapsed"] = time.monotonic() - started
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quota", type=float, default=10.0, help="upstream creates per second")
+    parser.add_argument("--offered", type=float, default=30.0, help="jobs arriving per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of arrivals per strategy")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--backoff-scale", type=float, default=0.05, help="time scale of the old retry backoff")
+    args = parser.parse_args()
+
+    # One log line per 429 would drown the report
+    logging.getLogger("app").setLevel(logging.CRITICAL)
+    import fakeredis
+    from app.core.config import settings
+    from app.services import rate_limit, status_cache
+    from app.services.http_client import ThrottledError
+    from app.services.media_client import ReplicateClient
+
+    settings.http2_enabled = False
+    rows = []
+    strategies = [
+        ("per-worker limit", 0.0),
+        ("shared bucket", args.quota),
+        ("shared bucket, over quota", args.quota * 1.5),
+    ]
+    for strategy, bucket_rate in strategies:
+        with FakeReplicate(create_quota=args.quota) as fake:
+            settings.replicate_base_url = fake.url
+            settings.replicate_rate_limit = bucket_rate
+            settings.replicate_rate_burst = max(1, int(bucket_rate))
+            status_cache._redis = fakeredis.FakeRedis()
+            results = run(strategy, args, ReplicateClient(), rate_limit, settings, ThrottledError)
+        waits = results["waits"]
+        rows.append([
+            strategy, f"{results['created'] / results['elapsed']:.1f}", results["created"], results["failed"],
+            results["throttled"], results["failed_attempts"], f"{results['elapsed']:.0f}",
+            f"{common.percentile(waits, 50):.1f}", f"{common.percentile(waits, 99):.1f}",
+        ])
+
+    print(f"quota {args.quota:g}/s, {args.offered:g} jobs/s offered for {args.duration:g}s, {args.workers} workers, "
+          f"old backoff x{args.backoff_scale:g}")
+    print(common.table(rows, [
+        "strategy", "goodput/s", "created", "failed jobs", "429s", "failed attempts", "run s",
+        "p50 wait s", "p99 wait s",
+    ]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Replicate calls and artifact downloads over the shared connection pools.
+
+Polls prediction status and downloads outputs from a local fake Replicate
+from many threads (or coroutines), the way workers do, and reports
+throughput, latency and how many TCP connections the server saw. The
+baselines are what the service did before the pools: a default Replicate
+client per process and a one-off request per download. Needs no database or
+Redis.
+
+    python -m benchmarks.http_pool
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import common
+
+sys.path.insert(0, common.SERVICE_DIR)
+from tests.fake_replicate import FakeReplicate  # noqa: E402
+
+
+def timed(call):
+    started = time.perf_counter()
+    call()
+    return time.perf_counter() - started
+
+
+def run_threads(call, argument, args):
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        return list(pool.map(lambda _: timed(lambda: call(argument)), range(args.requests)))
+
+
+def run_async(call, argument, args):
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        async with slots:
+            started = time.perf_counter()
+            await call(argument)
+            return time.perf_counter() - started
+
+    async def all_requests():
+        return await asyncio.gather(*(one() for _ in range(args.requests)))
+
+    return asyncio.run(all_requests())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    import httpx
+    import replicate
+    from app.core.config import settings
+    from app.services.http_client import download_to_file
+    from app.services.media_client import ReplicateClient
+
+    rows = []
+    with FakeReplicate() as fake, tempfile.TemporaryDirectory() as scratch:
+        settings.replicate_base_url = fake.url
+        settings.http2_enabled = False
+        pooled = ReplicateClient()
+        prediction_id = pooled.create_prediction("bench/model:1", {"prompt": "benchmark"})["id"]
+        default = replicate.Client(api_token=settings.replicate_api_token, base_url=settings.replicate_base_url)
+        output_url = fake.output_url(prediction_id)
+        target = os.path.join(scratch, "output.png")
+
+        def one_off_download(url):
+            with open(target, "wb") as f:
+                f.write(httpx.get(url).content)
+
+        cases = [
+            ("status", "default client per process", lambda: run_threads(default.predictions.get, prediction_id, args)),
+            ("status", "shared pool (sync)", lambda: run_threads(pooled.get_prediction, prediction_id, args)),
+            ("status", "shared pool (async)", lambda: run_async(pooled.async_get_prediction, prediction_id, args)),
+            ("download", "one-off request per download", lambda: run_threads(one_off_download, output_url, args)),
+            ("download", "shared pool (sync)",
+             lambda: run_threads(lambda url: download_to_file(url, target), output_url, args)),
+        ]
+        for call, name, case in cases:
+            connections = fake.stats["connections"]
+            started = time.perf_counter()
+            latencies = case()
+            elapsed = time.perf_counter() - started
+            rows.append([
+                call, name, f"{len(latencies) / elapsed:.0f}",
+                f"{common.percentile(latencies, 50) * 1000:.1f}", f"{common.percentile(latencies, 99) * 1000:.1f}",
+                fake.stats["connections"] - connections,
+            ])
+
+    print(f"{args.requests} calls per row, {args.concurrency} at a time")
+    print(common.table(rows, ["call", "client", "req/s", "p50 ms", "p99 ms", "connections"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Image serving load test: requests/s for full, conditional, range and variant GETs.
+
+Serves a stored image from uvicorn in a separate process and drives it with
+``--concurrency`` keep-alive connections, through both the API route
+(/api/v1/images) and the static mount (/images). Needs no database or Redis.
+
+    python -m benchmarks.image_serving
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import common
+
+
+def make_image(side: int) -> bytes:
+    """A noisy PNG of about ``side``² × 3 bytes, so it doesn't compress away."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (side, side), os.urandom(side * side * 3)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def serve(env):
+    """Start uvicorn serving the app on a free port. Returns the process and base URL."""
+    import httpx
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--lifespan", "off",
+         "--log-level", "warning", "--no-access-log"],
+        cwd=common.SERVICE_DIR, env=env,
+        start_new_session=True,  # so stop() also reaches the variant render pool
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            httpx.get(f"{base_url}/docs")
+            return process, base_url
+        except httpx.TransportError:
+            if time.monotonic() > deadline or process.poll() is not None:
+                stop(process)
+                sys.exit("uvicorn did not start")
+            time.sleep(0.1)
+
+
+def stop(process) -> None:
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait(10)
+    # Pool workers inherit uvicorn's SIGTERM handler and outlive it
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def load(base_url, path, headers, params, requests, concurrency, expected_status):
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies = []
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def worker(count):
+            for _ in range(count):
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers, params=params)
+                await response.aread()
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == expected_status, response.status_code
+
+        # Warm up connections and any variant render first
+        await client.get(path, headers=headers, params=params)
+        started = time.perf_counter()
+        share, extra = divmod(requests, concurrency)
+        await asyncio.gather(*(worker(share + (i < extra)) for i in range(concurrency)))
+        return latencies, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--side", type=int, default=256, help="image width and height in pixels")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="image-serving-bench-")
+    os.environ.update({"STORAGE_PATH": scratch, "STORAGE_BACKEND": "local", "TRACING_EXPORTER": "none"})
+    # One INFO line per request would drown the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    from app.core.config import settings
+    from app.services.storage import generated_dir
+
+    content = make_image(args.side)
+    filename = hashlib.sha256(content).hexdigest() + ".png"
+    generated_dir().mkdir(parents=True, exist_ok=True)
+    (generated_dir() / filename).write_bytes(content)
+    etag = f'"{filename}"'
+
+    server, base_url = serve(dict(os.environ))
+    cases = [
+        ("full", {}, None, 200),
+        ("If-None-Match", {"If-None-Match": etag}, None, 304),
+        ("Range 16 KB", {"Range": "bytes=0-16383"}, None, 206),
+        ("variant w=128", {}, {"w": 128, "fmt": "webp"}, 200),
+    ]
+    rows = []
+    for route, prefix in (("api", f"{settings.api_v1_prefix}/images"), ("mount", "/images")):
+        for name, headers, params, expected_status in cases:
+            if params and route == "mount":
+                continue  # variants are only served by the API route
+            latencies, elapsed = asyncio.run(load(
+                base_url, f"{prefix}/{filename}", headers, params, args.requests, args.concurrency, expected_status
+            ))
+            rows.append([route, name, f"{len(latencies) / elapsed:.0f}",
+                         f"{common.percentile(latencies, 50) * 1000:.1f}",
+                         f"{common.percentile(latencies, 99) * 1000:.1f}"])
+    stop(server)
+
+    print(f"{len(content) // 1024} KB PNG, {args.requests} requests per row over {args.concurrency} connections")
+    print(common.table(rows, ["route", "request", "req/s", "p50 ms", "p99 ms"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""In-flight predictions per Celery worker: blocking vs reconcile execution mode.
+
+Queues a backlog of jobs, starts one prefork worker per mode against a fake
+Replicate whose predictions take ``--hold`` seconds, and samples how many
+predictions are open upstream at once. A blocking worker keeps at most one
+prediction per process; a reconcile worker keeps every one it has submitted.
+
+    BENCH_DATABASE_URL=... BENCH_REDIS_URL=... python -m benchmarks.inflight_capacity
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import common
+
+sys.path.insert(0, common.SERVICE_DIR)
+from tests.fake_replicate import FakeReplicate  # noqa: E402
+
+
+def run(mode: str, args, env) -> list:
+    from sqlalchemy import func, select
+    from app.core.config import settings
+    from app.core.database import SyncSessionLocal
+    from app.models.job import Job
+    from app.services import outbox
+    from app.tasks import celery_tasks
+
+    common.reset()
+    with FakeReplicate(hold=args.hold) as fake, tempfile.TemporaryDirectory() as storage:
+        common.create_jobs(args.jobs)
+        settings.execution_mode = mode  # picks the entry task the relay publishes
+        outbox.drain(celery_tasks.publish_outbox_entries)
+
+        worker_env = dict(env, EXECUTION_MODE=mode, REPLICATE_BASE_URL=fake.url, STORAGE_PATH=storage)
+        worker = subprocess.Popen(
+            ["celery", "-A", "worker.celery_app", "worker", "-Q", "media_generation",
+             "-c", str(args.concurrency), "--loglevel", "WARNING",
+             "--without-gossip", "--without-mingle", "--without-heartbeat"],
+            cwd=common.SERVICE_DIR, env=worker_env, start_new_session=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        peak = 0
+        started = time.monotonic()
+        try:
+            while time.monotonic() - started < args.duration:
+                peak = max(peak, fake.open_predictions())
+                time.sleep(0.25)
+        finally:
+            os.killpg(worker.pid, signal.SIGKILL)
+            worker.wait()
+        with SyncSessionLocal() as db:
+            completed = db.scalar(select(func.count()).where(Job.status == "completed"))
+        return [mode, args.concurrency, peak, f"{peak / args.concurrency:.1f}",
+                fake.stats["created"], completed, f"{completed / args.duration:.2f}"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=4, help="worker processes")
+    parser.add_argument("--hold", type=float, default=30.0, help="seconds each prediction runs")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to run each mode")
+    parser.add_argument("--modes", default="blocking,reconcile")
+    args = parser.parse_args()
+
+    env = common.configure(
+        scheduler_enabled="false",
+        replicate_rate_limit="0",
+        admission_max_wait="0",
+        http2_enabled="false",
+        pregenerate_thumbnails="false",
+        job_stale_after="0",
+    )
+    rows = [run(mode, args, env) for mode in args.modes.split(",")]
+    print(f"{args.jobs} jobs queued, predictions take {args.hold:.0f}s, {args.duration:.0f}s per mode")
+    print(common.table(rows, ["mode", "processes", "peak in flight", "per process",
+                              "predictions created", "jobs completed", "jobs/s"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Artifact ingest throughput (MB/s) for large outputs from a local server.
+
+Downloads ``--files`` distinct outputs of each ``--sizes`` (MB) from a local
+fake Replicate into local storage, with the streaming ingest (sniff, SHA-256,
+size limit, spool and rename; sync and async) and with the download it
+replaced (8 KB chunks straight to disk, no checks). Each download has new
+content, so content addressing never skips a write. Needs no database or
+Redis.
+
+    python -m benchmarks.ingest
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from benchmarks import common
+
+sys.path.insert(0, common.SERVICE_DIR)
+from tests.fake_replicate import FakeReplicate  # noqa: E402
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def previous_download(url: str, directory: str) -> None:
+    """The download ingest replaced: requests, 8 KB chunks, no checks."""
+    import requests
+
+    response = requests.get(url, timeout=30, stream=True)
+    response.raise_for_status()
+    with open(os.path.join(directory, f"{uuid.uuid4().hex[:8]}.png"), "wb") as f:
+        for chunk in response.iter_content(chunk_size=8192):
+            f.write(chunk)
+
+
+def measure(fake, size, files, ingest):
+    """Seconds spent ingesting ``files`` fresh outputs of ``size`` bytes."""
+    elapsed = 0.0
+    for _ in range(files):
+        # PNG magic so the sniffer accepts it; random bytes so every file is new
+        fake.image = PNG_SIGNATURE + os.urandom(size - len(PNG_SIGNATURE))
+        started = time.perf_counter()
+        ingest()
+        elapsed += time.perf_counter() - started
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1,10,40", help="output sizes in MB")
+    parser.add_argument("--files", type=int, default=10, help="downloads per size and method")
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    from app.services import http_client
+    from app.services.artifacts import async_ingest_artifact, ingest_artifact
+    from app.services.storage import reset_storage
+
+    loop = asyncio.new_event_loop()
+    rows = []
+    with FakeReplicate() as fake, tempfile.TemporaryDirectory() as scratch:
+        settings.storage_backend = "local"
+        settings.storage_path = scratch
+        settings.pregenerate_thumbnails = False
+        settings.http2_enabled = False
+        reset_storage()
+        http_client.reset_http_clients()
+        url = fake.output_url("bench")
+
+        for size_mb in [float(size) for size in args.sizes.split(",")]:
+            size = int(size_mb * 1024 * 1024)
+            settings.max_artifact_bytes = max(settings.max_artifact_bytes, size)
+            methods = [
+                ("previous (8 KB chunks)", lambda: previous_download(url, scratch)),
+                ("ingest_artifact", lambda: ingest_artifact(url)),
+                ("async_ingest_artifact", lambda: loop.run_until_complete(async_ingest_artifact(url))),
+            ]
+            for name, ingest in methods:
+                elapsed = measure(fake, size, args.files, ingest)
+                rows.append([f"{size_mb:g}", name, f"{size_mb * args.files / elapsed:.0f}",
+                             f"{elapsed / args.files * 1000:.1f}"])
+        loop.run_until_complete(http_client.aclose_http_clients())
+
+    print(f"{args.files} distinct files per row, local server and local storage")
+    print(common.table(rows, ["MB", "method", "MB/s", "ms/file"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Job list page latency by depth: offset (``skip``) vs keyset (``after``) pagination.
+
+Seeds ``--jobs`` jobs (1M by default, about 70% completed) with one
+INSERT ... SELECT, then fetches pages of GET /jobs and GET /jobs/completed
+through the API in process at each ``--depths`` row offset, once with
+``skip`` and once with the equivalent ``after`` cursor.
+
+    BENCH_DATABASE_URL=... BENCH_REDIS_URL=... python -m benchmarks.list_depth
+"""
+import argparse
+import time
+
+from benchmarks import common
+
+SEED = """
+INSERT INTO jobs (id, prompt, model, parameters, status, created_at, updated_at, retry_count, version)
+SELECT md5('bench-' || i), 'benchmark ' || i, 'bench/model:1', '{}',
+       CASE WHEN i % 10 < 7 THEN 'completed' WHEN i % 10 < 9 THEN 'failed' ELSE 'pending' END,
+       now() - i * interval '1 second', now() - i * interval '1 second', 0, 0
+FROM generate_series(1, :count) AS i
+"""
+
+
+def seed(count: int) -> None:
+    from sqlalchemy import text
+    from app.core.database import sync_engine
+
+    with sync_engine.begin() as connection:
+        connection.execute(text(SEED), {"count": count})
+    with sync_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("VACUUM ANALYZE jobs"))
+
+
+def cursor_at(depth: int, completed_only: bool) -> str:
+    """The ``after`` cursor that starts the page ``skip=depth`` starts."""
+    from sqlalchemy import text
+    from app.core.database import sync_engine
+
+    where = "WHERE status = 'completed'" if completed_only else ""
+    with sync_engine.connect() as connection:
+        created_at, job_id = connection.execute(text(
+            f"SELECT created_at, id FROM jobs {where} ORDER BY created_at DESC, id DESC OFFSET :skip LIMIT 1"
+        ), {"skip": depth - 1}).one()
+    return f"{created_at.isoformat()},{job_id}"
+
+
+async def page_latency(client, path, params, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.get(path, params=params)
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.text
+    return common.percentile(latencies, 50)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=1_000_000)
+    parser.add_argument("--depths", default="0,1000,10000,100000,500000")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20, help="requests per measurement (median reported)")
+    args = parser.parse_args()
+
+    common.configure()
+    import httpx
+    from app.core.config import settings
+    from app.main import app
+
+    common.reset()
+    started = time.perf_counter()
+    seed(args.jobs)
+    print(f"seeded {args.jobs} jobs in {time.perf_counter() - started:.1f}s")
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+    rows = []
+    for path, completed_only in (("/jobs", False), ("/jobs/completed", True)):
+        url = settings.api_v1_prefix + path
+        for depth in [int(depth) for depth in args.depths.split(",")]:
+            if depth >= args.jobs * (0.7 if completed_only else 1):
+                continue
+            offset = common.run_async(page_latency(client, url, {"skip": depth, "limit": args.limit}, args.repeat))
+            keyset = offset
+            if depth:
+                keyset = common.run_async(page_latency(
+                    client, url, {"after": cursor_at(depth, completed_only), "limit": args.limit}, args.repeat
+                ))
+            rows.append([path, depth, f"{offset * 1000:.1f}", f"{keyset * 1000:.1f}"])
+    common.run_async(client.aclose())
+
+    print(f"pages of {args.limit}, median of {args.repeat} requests")
+    print(common.table(rows, ["endpoint", "depth", "skip ms", "after ms"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Metrics overhead: added cost per request and per SQL statement.
+
+Times a minimal ASGI app called in process with and without
+``MetricsMiddleware``, and ``SELECT 1`` on in-memory SQLite with and without
+``instrument_engine``, and reports the difference against ``--budget-us``.
+Exits non-zero if either is over budget. Needs no database or Redis.
+
+    python -m benchmarks.metrics_overhead
+"""
+import argparse
+import asyncio
+import sys
+import time
+from types import SimpleNamespace
+
+from benchmarks import common
+
+ROUTE = SimpleNamespace(path="/api/v1/status/{job_id}")
+
+
+async def endpoint(scope, receive, send):
+    # What the router does for a matched route, then a tiny JSON response
+    scope["route"] = ROUTE
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def time_requests(app, count: int) -> float:
+    """Seconds per request through ``app``."""
+    async def run():
+        for _ in range(count):
+            scope = {"type": "http", "method": "GET", "path": "/api/v1/status/abc", "headers": []}
+            await app(scope, receive, send)
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    return (time.perf_counter() - started) / count
+
+
+def time_statements(engine, count: int) -> float:
+    """Seconds per ``SELECT 1`` on ``engine``."""
+    from sqlalchemy import text
+
+    statement = text("SELECT 1")
+    with engine.connect() as connection:
+        started = time.perf_counter()
+        for _ in range(count):
+            connection.execute(statement)
+        return (time.perf_counter() - started) / count
+
+
+def best_of(repeat: int, measure, *args) -> float:
+    return min(measure(*args) for _ in range(repeat))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--statements", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case; the fastest counts")
+    parser.add_argument("--budget-us", type=float, default=20.0, help="allowed overhead per request or statement")
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine
+    from app.core import metrics
+
+    plain = best_of(args.repeat, time_requests, endpoint, args.requests)
+    measured = best_of(args.repeat, time_requests, metrics.MetricsMiddleware(endpoint), args.requests)
+
+    bare_engine = create_engine("sqlite://")
+    instrumented_engine = create_engine("sqlite://")
+    metrics.instrument_engine(instrumented_engine, "bench")
+    bare = best_of(args.repeat, time_statements, bare_engine, args.statements)
+    instrumented = best_of(args.repeat, time_statements, instrumented_engine, args.statements)
+
+    rows = []
+    over = False
+    for name, without, with_metrics in (("HTTP request", plain, measured), ("SQL statement", bare, instrumented)):
+        overhead = (with_metrics - without) * 1e6
+        over |= overhead > args.budget_us
+        rows.append([name, f"{without * 1e6:.1f}", f"{with_metrics * 1e6:.1f}", f"{overhead:.1f}",
+                     "ok" if overhead <= args.budget_us else "OVER"])
+
+    print(f"best of {args.repeat}, budget {args.budget_us:g} us")
+    print(common.table(rows, ["path", "without us", "with us", "overhead us", "budget"]))
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
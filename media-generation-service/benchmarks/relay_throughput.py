@@ -0,0 +1,63 @@
+"""Outbox relay throughput: entries relayed per second, first publish vs replay.
+
+Creates ``--jobs`` jobs with their outbox entries and drains the outbox into
+the scheduler lanes with the relay's publisher, at each of ``--batch-sizes``.
+The same entries are then put back, as if the relay had died before its
+commit, and drained again: the replay should leave the lanes as they were.
+
+    BENCH_DATABASE_URL=... BENCH_REDIS_URL=... python -m benchmarks.relay_throughput
+"""
+import argparse
+import logging
+import sys
+import time
+
+from benchmarks import common
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=20000)
+    parser.add_argument("--batch-sizes", default="100,500,2000")
+    args = parser.parse_args()
+
+    common.configure(scheduler_enabled="true")
+    # One line per replayed batch would drown the report
+    logging.getLogger("app.tasks").setLevel(logging.WARNING)
+    import redis
+    from sqlalchemy import insert, select
+    from app.core.config import settings
+    from app.core.database import sync_engine
+    from app.models.job import JobOutbox
+    from app.services import outbox, scheduler
+    from app.tasks.celery_tasks import publish_outbox_entries
+
+    client = redis.Redis.from_url(settings.redis_url)
+    rows = []
+    for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+        common.reset()
+        common.create_jobs(args.jobs)
+        with sync_engine.connect() as connection:
+            entries = [
+                {"job_id": job_id, "payload": payload}
+                for job_id, payload in connection.execute(select(JobOutbox.job_id, JobOutbox.payload))
+            ]
+
+        for run in ("first publish", "replay"):
+            if run == "replay":
+                with sync_engine.begin() as connection:
+                    connection.execute(insert(JobOutbox), entries)
+            started = time.perf_counter()
+            relayed = outbox.drain(publish_outbox_entries, batch_size)
+            elapsed = time.perf_counter() - started
+            queued = int(client.get(scheduler.QUEUED_KEY) or 0)
+            if relayed != args.jobs or queued != args.jobs:
+                sys.exit(f"{run}: relayed {relayed}, {queued} queued; expected {args.jobs}")
+            rows.append([batch_size, run, relayed, f"{relayed / elapsed:.0f}", queued])
+
+    print(f"{args.jobs} outbox entries per run")
+    print(common.table(rows, ["batch size", "run", "relayed", "entries/s", "queued after"]))
+
+
+if __name__ == "__main__":
+    main()
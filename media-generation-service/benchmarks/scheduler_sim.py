@@ -0,0 +1,121 @@
+"""Scheduler simulation: queue wait per tenant, one FIFO queue vs the fair lanes.
+
+Replays a mixed workload in simulated time against ``--workers`` job slots.
+Model latencies are stubbed (lognormal around each model's mean), so only
+the scheduling differs between the two runs:
+
+- FIFO: what the service did before the scheduler. Entry tasks go straight
+  onto the Celery queue and workers take them in arrival order.
+- fair lanes: the real ``scheduler.enqueue`` / ``dispatch`` / ``release`` on
+  fakeredis, with ``scheduler_max_inflight`` set to the worker count and the
+  configured ``tenant_max_inflight`` (``--tenant-cap``). The cap leaves
+  slots idle while only one tenant has work, which shows in the makespan.
+
+The workload: ``batch`` drops ``--burst`` slow-model jobs at once, while
+``app-a`` (fast model) and ``app-b`` (slow model) submit steadily for
+``--duration`` seconds. Queue wait is from submission to the job starting.
+Needs no database or Redis.
+
+    python -m benchmarks.scheduler_sim
+"""
+import argparse
+import collections
+import heapq
+import random
+
+from benchmarks import common
+
+# Stubbed mean run time per model, seconds
+MODEL_LATENCY = {"slow/model:1": 6.0, "fast/model:1": 1.0}
+
+
+def workload(args):
+    """Submitted jobs as ``(submitted_at, tenant, model, run_time)``, in submission order."""
+    rng = random.Random(args.seed)
+
+    def run_time(model):
+        return rng.lognormvariate(0, 0.3) * MODEL_LATENCY[model]
+
+    jobs = [(0.0, "batch", "slow/model:1", run_time("slow/model:1")) for _ in range(args.burst)]
+    for tenant, model, rate in (("app-a", "fast/model:1", args.rate), ("app-b", "slow/model:1", args.rate / 2)):
+        at = rng.expovariate(rate)
+        while at < args.duration:
+            jobs.append((at, tenant, model, run_time(model)))
+            at += rng.expovariate(rate)
+    return sorted(jobs, key=lambda job: job[0])
+
+
+def simulate(jobs, workers: int, fair: bool):
+    """Run ``jobs`` through ``workers`` slots. Returns queue waits by tenant and the makespan."""
+    from app.services import scheduler
+
+    waits = collections.defaultdict(list)
+    events = [(submitted_at, 0, i) for i, (submitted_at, *_) in enumerate(jobs)]  # (time, 0 submit | 1 finish, job)
+    heapq.heapify(events)
+    fifo = collections.deque()
+    running = 0
+    now = 0.0
+
+    def start(i):
+        nonlocal running
+        submitted_at, tenant, _, run_time = jobs[i]
+        waits[tenant].append(now - submitted_at)
+        running += 1
+        heapq.heappush(events, (now + run_time, 1, i))
+
+    while events:
+        now, kind, i = heapq.heappop(events)
+        submitted_at, tenant, model, _ = jobs[i]
+        if kind == 0 and fair:
+            scheduler.enqueue(str(i), model, tenant, {})
+        elif kind == 0:
+            fifo.append(i)
+        else:
+            running -= 1
+            if fair:
+                scheduler.release(str(i))
+        if fair:
+            while (job := scheduler.dispatch(now=now)) is not None:
+                start(int(job["job_id"]))
+        else:
+            while fifo and running < workers:
+                start(fifo.popleft())
+    return waits, now
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=16, help="job slots (worker processes)")
+    parser.add_argument("--burst", type=int, default=400, help="jobs the batch tenant submits at once")
+    parser.add_argument("--rate", type=float, default=1.0, help="app-a jobs per second (app-b submits half)")
+    parser.add_argument("--duration", type=float, default=120.0, help="seconds of steady submissions")
+    parser.add_argument("--tenant-cap", type=int, help="in-flight jobs per tenant (default TENANT_MAX_INFLIGHT)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    import fakeredis
+    from app.core.config import settings
+    from app.services import status_cache
+
+    settings.scheduler_max_inflight = args.workers
+    if args.tenant_cap is not None:
+        settings.tenant_max_inflight = args.tenant_cap
+    jobs = workload(args)
+    rows = []
+    for strategy, fair in (("FIFO", False), ("fair lanes", True)):
+        status_cache._redis = fakeredis.FakeRedis()
+        waits, makespan = simulate(jobs, args.workers, fair)
+        for tenant in sorted(waits):
+            rows.append([
+                strategy, tenant, len(waits[tenant]),
+                f"{common.percentile(waits[tenant], 50):.1f}", f"{common.percentile(waits[tenant], 99):.1f}",
+                f"{makespan:.0f}",
+            ])
+
+    print(f"{len(jobs)} jobs on {args.workers} slots, tenant cap {settings.tenant_max_inflight}, "
+          f"model means {', '.join(f'{model} {mean:g}s' for model, mean in MODEL_LATENCY.items())}")
+    print(common.table(rows, ["strategy", "tenant", "jobs", "p50 wait s", "p99 wait s", "makespan s"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""GET /status/{job_id} served from the Redis status cache vs from Postgres.
+
+Creates jobs, then polls random ones through the API in process (no network
+between client and app) with the cache on and off, and measures the
+versioned cache writes workers make on every transition.
+
+    BENCH_DATABASE_URL=... BENCH_REDIS_URL=... python -m benchmarks.status_reads
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks import common
+
+
+async def poll(client, prefix, job_ids, requests, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with slots:
+            started = time.perf_counter()
+            response = await client.get(f"{prefix}/status/{random.choice(job_ids)}")
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    common.configure()
+    common.reset()
+    import httpx
+    from app.core.config import settings
+    from app.core.database import SyncSessionLocal
+    from app.main import app
+    from app.models.job import Job
+    from app.services import status_cache
+
+    job_ids = common.create_jobs(args.jobs)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+    rows = []
+    for name, enabled in (("postgres (cache off)", False), ("redis cache", True)):
+        settings.status_cache_enabled = enabled
+        common.run_async(poll(client, settings.api_v1_prefix, job_ids, 500, args.concurrency))  # warm up
+        latencies, elapsed = common.run_async(
+            poll(client, settings.api_v1_prefix, job_ids, args.requests, args.concurrency)
+        )
+        rows.append([name, f"{len(latencies) / elapsed:.0f}",
+                     f"{common.percentile(latencies, 50) * 1000:.1f}",
+                     f"{common.percentile(latencies, 99) * 1000:.1f}"])
+    common.run_async(client.aclose())
+
+    with SyncSessionLocal() as db:
+        jobs = db.query(Job).limit(2000).all()
+    started = time.perf_counter()
+    for job in jobs:
+        job.version += 1
+        status_cache.cache_job_status(job)
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.requests} status reads over {args.jobs} jobs, {args.concurrency} at a time")
+    print(common.table(rows, ["served from", "req/s", "p50 ms", "p99 ms"]))
+    print(f"\nversioned cache writes (set-if-newer + publish): {len(jobs) / elapsed:.0f}/s, "
+          f"{elapsed / len(jobs) * 1e6:.0f} us each")
+
+
+if __name__ == "__main__":
+    main()
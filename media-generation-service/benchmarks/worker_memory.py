@@ -0,0 +1,115 @@
+"""Jobs in flight per GB of worker memory: Celery prefork vs the asyncio worker.
+
+Queues a backlog of blocking-mode jobs, then runs each kind of worker against
+a fake Replicate whose predictions take ``--hold`` seconds. While it runs,
+the worker's process tree is sampled for predictions open upstream and for
+memory (PSS, so pages a prefork pool shares with its parent count once).
+Jobs per GB is the peak in flight over the memory at that time.
+
+    BENCH_DATABASE_URL=... BENCH_REDIS_URL=... python -m benchmarks.worker_memory
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import common
+
+sys.path.insert(0, common.SERVICE_DIR)
+from tests.fake_replicate import FakeReplicate  # noqa: E402
+
+
+def tree_pss(pid: int) -> int:
+    """PSS in bytes of a process and all its children."""
+    import psutil
+
+    total = 0
+    try:
+        root = psutil.Process(pid)
+        processes = [root] + root.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return 0
+    for process in processes:
+        try:
+            total += process.memory_full_info().pss
+        except psutil.NoSuchProcess:
+            pass
+    return total
+
+
+def run(kind: str, command, args, env) -> list:
+    from sqlalchemy import func, select
+    from app.core.database import SyncSessionLocal
+    from app.models.job import Job
+    from app.services import outbox
+    from app.tasks import celery_tasks
+
+    common.reset()
+    with FakeReplicate(hold=args.hold) as fake, tempfile.TemporaryDirectory() as storage:
+        # The killed worker drops its connections mid-request; don't print each one
+        fake._server.handle_error = lambda request, client_address: None
+        common.create_jobs(args.jobs)
+        outbox.drain(celery_tasks.publish_outbox_entries)
+
+        worker = subprocess.Popen(
+            command, cwd=common.SERVICE_DIR, start_new_session=True,
+            env=dict(env, REPLICATE_BASE_URL=fake.url, STORAGE_PATH=storage),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        peak, peak_memory, max_memory = 0, 0, 0
+        started = time.monotonic()
+        try:
+            while time.monotonic() - started < args.duration:
+                in_flight, memory = fake.open_predictions(), tree_pss(worker.pid)
+                max_memory = max(max_memory, memory)
+                if in_flight > peak:
+                    peak, peak_memory = in_flight, memory
+                time.sleep(0.5)
+        finally:
+            os.killpg(worker.pid, signal.SIGKILL)
+            worker.wait()
+        with SyncSessionLocal() as db:
+            completed = db.scalar(select(func.count()).where(Job.status == "completed"))
+    return [
+        kind, peak, f"{peak_memory / 2 ** 20:.0f}", f"{max_memory / 2 ** 20:.0f}",
+        f"{peak / (peak_memory / 2 ** 30):.0f}" if peak_memory else "-",
+        completed, f"{completed / args.duration:.2f}",
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--prefork", type=int, default=8, help="Celery worker processes")
+    parser.add_argument("--async-concurrency", type=int, default=200, help="jobs per asyncio worker")
+    parser.add_argument("--hold", type=float, default=20.0, help="seconds each prediction runs")
+    parser.add_argument("--duration", type=float, default=45.0, help="seconds to run each worker")
+    args = parser.parse_args()
+
+    env = common.configure(
+        execution_mode="blocking",
+        scheduler_enabled="false",
+        replicate_rate_limit="0",
+        admission_max_wait="0",
+        http2_enabled="false",
+        pregenerate_thumbnails="false",
+        job_stale_after="0",
+    )
+    workers = [
+        (f"prefork -c {args.prefork}",
+         ["celery", "-A", "worker.celery_app", "worker", "-Q", "media_generation", "-c", str(args.prefork),
+          "--loglevel", "WARNING", "--without-gossip", "--without-mingle", "--without-heartbeat"]),
+        (f"asyncio -c {args.async_concurrency}",
+         [sys.executable, "-m", "worker.async_worker", "--concurrency", str(args.async_concurrency)]),
+    ]
+    rows = [run(kind, command, args, env) for kind, command in workers]
+    print(f"{args.jobs} jobs queued, predictions take {args.hold:g}s, {args.duration:g}s per worker")
+    print(common.table(rows, ["worker", "peak in flight", "PSS at peak MB", "max PSS MB", "jobs/GB",
+                              "jobs completed", "jobs/s"]))
+
+
+if __name__ == "__main__":
+    main()
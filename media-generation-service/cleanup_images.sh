@@ -1,35 +1,72 @@
 #!/bin/bash
 
 # Image cleanup script for media generation service
-# This script fixes incorrect image paths and removes jobs with missing images
+# Queues a maintenance run on the workers (fix legacy image paths, remove jobs
+# with missing images, reclaim unreferenced image files), follows it until it
+# finishes, then removes failed jobs. DRY_RUN=true only reports what would change.
 
 API_BASE="http://localhost:8000/api/v1"
+DRY_RUN="${DRY_RUN:-false}"
 
 echo "🧹 Starting image cleanup process..."
 
-echo "📁 Step 1: Fixing incorrect image paths..."
-FIXED_RESPONSE=$(curl -s -X POST "$API_BASE/jobs/fix-paths")
-FIXED_COUNT=$(echo "$FIXED_RESPONSE" | jq -r '.fixed_count // 0')
-echo "✅ Fixed $FIXED_COUNT jobs with incorrect paths"
+echo "🛠️  Step 1: Queueing maintenance run (dry run: $DRY_RUN)..."
+RUN_RESPONSE=$(curl -s -X POST "$API_BASE/maintenance/runs" \
+  -H "Content-Type: application/json" \
+  -d "{\"dry_run\": $DRY_RUN}")
+RUN_ID=$(echo "$RUN_RESPONSE" | jq -r '.run_id // empty')
+if [ -z "$RUN_ID" ]; then
+  echo "❌ Could not start maintenance run: $RUN_RESPONSE"
+  exit 1
+fi
+echo "✅ Queued run $RUN_ID"
 
-echo "🗑️  Step 2: Removing jobs with missing image files..."
-DELETED_RESPONSE=$(curl -s -X DELETE "$API_BASE/jobs/missing-images")
-DELETED_COUNT=$(echo "$DELETED_RESPONSE" | jq -r '.deleted_count // 0')
-echo "✅ Deleted $DELETED_COUNT jobs with missing images"
+echo "⏳ Step 2: Waiting for the run to finish..."
+while true; do
+  REPORT=$(curl -s "$API_BASE/maintenance/runs/$RUN_ID")
+  STATUS=$(echo "$REPORT" | jq -r '.status // "unknown"')
+  if [ "$STATUS" != "queued" ] && [ "$STATUS" != "running" ]; then
+    break
+  fi
+  echo "   $STATUS: $(echo "$REPORT" | jq -c '.results')"
+  sleep 2
+done
+if [ "$STATUS" != "completed" ]; then
+  echo "❌ Maintenance run $STATUS: $(echo "$REPORT" | jq -r '.error // empty')"
+  exit 1
+fi
+# A dry run reports what it found (matched/missing/orphaned) instead of what it changed
+if [ "$DRY_RUN" = "true" ]; then
+  FIXED_COUNT=$(echo "$REPORT" | jq -r '.results.fix_paths.matched // 0')
+  DELETED_COUNT=$(echo "$REPORT" | jq -r '.results.missing_artifacts.missing // 0')
+  RECLAIMED_COUNT=$(echo "$REPORT" | jq -r '.results.orphaned_files.orphaned // 0')
+else
+  FIXED_COUNT=$(echo "$REPORT" | jq -r '.results.fix_paths.fixed // 0')
+  DELETED_COUNT=$(echo "$REPORT" | jq -r '.results.missing_artifacts.deleted // 0')
+  RECLAIMED_COUNT=$(echo "$REPORT" | jq -r '.results.orphaned_files.deleted // 0')
+fi
+echo "✅ Fixed $FIXED_COUNT paths, deleted $DELETED_COUNT jobs with missing images, reclaimed $RECLAIMED_COUNT files"
 
-echo "🧽 Step 3: Removing failed jobs..."
-FAILED_RESPONSE=$(curl -s -X DELETE "$API_BASE/jobs/failed")
-FAILED_COUNT=$(echo "$FAILED_RESPONSE" | jq -r '.deleted_count // 0')
-echo "✅ Deleted $FAILED_COUNT failed jobs"
+FAILED_COUNT=0
+if [ "$DRY_RUN" != "true" ]; then
+  echo "🧽 Step 3: Removing failed jobs..."
+  FAILED_RESPONSE=$(curl -s -X DELETE "$API_BASE/jobs/failed")
+  FAILED_COUNT=$(echo "$FAILED_RESPONSE" | jq -r '.deleted_count // 0')
+  echo "✅ Deleted $FAILED_COUNT failed jobs"
+fi
 
 echo ""
 echo "🎉 Cleanup completed!"
 echo "   - Fixed paths: $FIXED_COUNT"
 echo "   - Removed missing: $DELETED_COUNT"
+echo "   - Reclaimed files: $RECLAIMED_COUNT"
 echo "   - Removed failed: $FAILED_COUNT"
+if [ "$DRY_RUN" = "true" ]; then
+  echo "   (dry run: counts are what would change, nothing was modified)"
+fi
 
 # Show current status
 echo ""
 echo "📊 Current job counts:"
-COMPLETED_COUNT=$(curl -s "$API_BASE/jobs/completed" | jq '. | length')
-echo "   - Completed jobs: $COMPLETED_COUNT"
\ No newline at end of file
+COMPLETED_COUNT=$(curl -s "$API_BASE/jobs/completed?limit=100" | jq '. | length')
+echo "   - Completed jobs (first page): $COMPLETED_COUNT"
@@ -9,7 +9,7 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from app.core.database import Base
-from app.models.job import Job  # Import all models here
+from app.models.job import Job, JobOutbox  # Import all models here
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
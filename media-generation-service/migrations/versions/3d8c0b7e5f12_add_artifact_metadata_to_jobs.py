@@ -0,0 +1,30 @@
+"""Add stored artifact metadata (size, mime type, digest) to jobs
+
+Revision ID: 3d8c0b7e5f12
+Revises: e2a6f81b0d94
+Create Date: 2026-10-17 15:48:10.455071
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d8c0b7e5f12'
+down_revision = 'e2a6f81b0d94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('jobs', sa.Column('byte_size', sa.BigInteger(), nullable=True))
+    op.add_column('jobs', sa.Column('mime_type', sa.String(), nullable=True))
+    op.add_column('jobs', sa.Column('content_sha256', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_jobs_content_sha256'), 'jobs', ['content_sha256'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_jobs_content_sha256'), table_name='jobs')
+    op.drop_column('jobs', 'content_sha256')
+    op.drop_column('jobs', 'mime_type')
+    op.drop_column('jobs', 'byte_size')
@@ -0,0 +1,23 @@
+"""Add index on jobs.replicate_prediction_id for webhook lookups
+
+Revision ID: 4f2a9c7d1e3b
+Revises: 10328c9ddc4a
+Create Date: 2026-10-17 09:12:44.318205
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '4f2a9c7d1e3b'
+down_revision = '10328c9ddc4a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_jobs_replicate_prediction_id'), 'jobs', ['replicate_prediction_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_jobs_replicate_prediction_id'), table_name='jobs')
@@ -0,0 +1,26 @@
+"""Add tenant_id to jobs for fair scheduling
+
+Revision ID: 5a1f7c3e9b04
+Revises: 3d8c0b7e5f12
+Create Date: 2026-10-17 17:20:41.208316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a1f7c3e9b04'
+down_revision = '3d8c0b7e5f12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('jobs', sa.Column('tenant_id', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_jobs_tenant_id'), 'jobs', ['tenant_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_jobs_tenant_id'), table_name='jobs')
+    op.drop_column('jobs', 'tenant_id')
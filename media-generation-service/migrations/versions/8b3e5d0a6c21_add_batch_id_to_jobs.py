@@ -0,0 +1,26 @@
+"""Add batch_id to jobs for batch submissions
+
+Revision ID: 8b3e5d0a6c21
+Revises: 4f2a9c7d1e3b
+Create Date: 2026-10-17 11:40:02.774190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3e5d0a6c21'
+down_revision = '4f2a9c7d1e3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('jobs', sa.Column('batch_id', sa.String(), nullable=True))
+    op.create_index(op.f('ix_jobs_batch_id'), 'jobs', ['batch_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_jobs_batch_id'), table_name='jobs')
+    op.drop_column('jobs', 'batch_id')
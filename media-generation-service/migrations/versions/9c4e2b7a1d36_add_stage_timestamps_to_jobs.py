@@ -0,0 +1,44 @@
+"""Add per-stage timestamps to jobs and an index for latency stats
+
+Revision ID: 9c4e2b7a1d36
+Revises: 5a1f7c3e9b04
+Create Date: 2026-10-17 18:05:12.731904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e2b7a1d36'
+down_revision = '5a1f7c3e9b04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('jobs', sa.Column('enqueued_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('jobs', sa.Column('started_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('jobs', sa.Column('prediction_created_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('jobs', sa.Column('prediction_finished_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('jobs', sa.Column('stored_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(
+        'ix_jobs_completed_stage_times',
+        'jobs',
+        ['created_at'],
+        unique=False,
+        postgresql_where=sa.text("status = 'completed'"),
+        postgresql_include=[
+            'model', 'enqueued_at', 'started_at', 'prediction_created_at',
+            'prediction_finished_at', 'stored_at', 'byte_size', 'retry_count',
+        ],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_completed_stage_times', table_name='jobs')
+    op.drop_column('jobs', 'stored_at')
+    op.drop_column('jobs', 'prediction_finished_at')
+    op.drop_column('jobs', 'prediction_created_at')
+    op.drop_column('jobs', 'started_at')
+    op.drop_column('jobs', 'enqueued_at')
@@ -0,0 +1,24 @@
+"""Add a version counter to jobs for ordering status cache writes
+
+Revision ID: a4d7e2c9f610
+Revises: f3b8e07c5d16
+Create Date: 2026-10-18 10:41:09.527318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d7e2c9f610'
+down_revision = 'f3b8e07c5d16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('jobs', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('jobs', 'version')
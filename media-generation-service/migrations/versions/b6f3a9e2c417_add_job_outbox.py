@@ -0,0 +1,49 @@
+"""Add the job outbox table and its insert notification
+
+Revision ID: b6f3a9e2c417
+Revises: 9c4e2b7a1d36
+Create Date: 2026-10-17 21:14:38.502117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6f3a9e2c417'
+down_revision = '9c4e2b7a1d36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'job_outbox',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('job_id', sa.String(), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['job_id'], ['jobs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # Wake the relay (LISTEN job_outbox) when an inserting transaction commits.
+    # One notification per statement; Postgres folds duplicates within a transaction.
+    op.execute("""
+        CREATE FUNCTION job_outbox_notify() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('job_outbox', '');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER job_outbox_notify
+        AFTER INSERT ON job_outbox
+        FOR EACH STATEMENT EXECUTE FUNCTION job_outbox_notify()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS job_outbox_notify ON job_outbox")
+    op.execute("DROP FUNCTION IF EXISTS job_outbox_notify()")
+    op.drop_table('job_outbox')
@@ -0,0 +1,26 @@
+"""Add request_hash to jobs for request deduplication
+
+Revision ID: c7d19e4f3a58
+Revises: 8b3e5d0a6c21
+Create Date: 2026-10-17 13:05:27.190336
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d19e4f3a58'
+down_revision = '8b3e5d0a6c21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('jobs', sa.Column('request_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_jobs_request_hash'), 'jobs', ['request_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_jobs_request_hash'), table_name='jobs')
+    op.drop_column('jobs', 'request_hash')
@@ -0,0 +1,24 @@
+"""Add the checkpointed prediction output URL to jobs
+
+Revision ID: d81c4f6a2b95
+Revises: b6f3a9e2c417
+Create Date: 2026-10-17 23:02:47.193650
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81c4f6a2b95'
+down_revision = 'b6f3a9e2c417'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('jobs', sa.Column('prediction_output_url', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('jobs', 'prediction_output_url')
@@ -0,0 +1,28 @@
+"""Add composite indexes for job listing and keyset pagination
+
+Revision ID: e2a6f81b0d94
+Revises: c7d19e4f3a58
+Create Date: 2026-10-17 14:21:53.602817
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a6f81b0d94'
+down_revision = 'c7d19e4f3a58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Built concurrently so existing deployments keep serving while indexing
+    with op.get_context().autocommit_block():
+        op.create_index('ix_jobs_created_at_id', 'jobs', ['created_at', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_jobs_status_created_at_id', 'jobs', ['status', 'created_at', 'id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_jobs_status_created_at_id', table_name='jobs', postgresql_concurrently=True)
+        op.drop_index('ix_jobs_created_at_id', table_name='jobs', postgresql_concurrently=True)
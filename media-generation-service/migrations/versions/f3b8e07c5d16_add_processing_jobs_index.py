@@ -0,0 +1,30 @@
+"""Add a partial index on processing jobs for the stuck-job reaper
+
+Revision ID: f3b8e07c5d16
+Revises: d81c4f6a2b95
+Create Date: 2026-10-18 00:41:09.562318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8e07c5d16'
+down_revision = 'd81c4f6a2b95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_jobs_processing_updated_at',
+        'jobs',
+        ['updated_at'],
+        unique=False,
+        postgresql_where=sa.text("status = 'processing'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_processing_updated_at', table_name='jobs')
@@ -0,0 +1,177 @@
+"""Shared fixtures.
+
+Tests run without Postgres, Redis, a Celery broker or Replicate: each test gets
+a fresh SQLite database, a fresh fakeredis server, and Celery publishes are
+recorded in ``sent`` instead of reaching a broker. The ``replicate`` fixture
+points the Replicate client at a local ``FakeReplicate`` server.
+"""
+import asyncio
+import contextlib
+import os
+import tempfile
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# Settings are read at import time, so the environment comes first
+_scratch = tempfile.mkdtemp(prefix="media-generation-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite+aiosqlite:///{_scratch}/unused.db",
+    "REDIS_URL": "redis://127.0.0.1:1/0",  # never contacted, see the redis fixture
+    "DEBUG": "false",
+    "STORAGE_PATH": os.path.join(_scratch, "storage"),
+    "REPLICATE_API_TOKEN": "test",
+    "REPLICATE_RATE_LIMIT": "0",
+    "WORKER_METRICS_PORT": "0",
+    "PREGENERATE_THUMBNAILS": "false",
+    "HTTP2_ENABLED": "false",
+    "TRACING_EXPORTER": "none",
+})
+
+import fakeredis  # noqa: E402
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+from celery.app.task import Task  # noqa: E402
+from celery.result import AsyncResult  # noqa: E402
+from sqlalchemy import BigInteger, create_engine, event  # noqa: E402
+from sqlalchemy.ext.compiler import compiles  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+from app.core import database  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.services import http_client, status_cache  # noqa: E402
+from app.services.media_client import replicate_client  # noqa: E402
+from tests.fake_replicate import FakeReplicate  # noqa: E402
+from worker.celery_app import celery_app  # noqa: E402
+
+
+@compiles(BigInteger, "sqlite")
+def _sqlite_bigint(type_, compiler, **kw):
+    # SQLite only autoincrements INTEGER PRIMARY KEY columns (job_outbox.id)
+    return "INTEGER"
+
+
+@pytest.fixture
+def loop():
+    """One event loop for the whole test: async clients stay bound to it."""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(autouse=True)
+def db(tmp_path):
+    """A fresh SQLite database behind both session factories. Yields a sync session."""
+    url = f"sqlite:///{tmp_path}/jobs.db"
+    sync_engine = create_engine(url, poolclass=NullPool, connect_args={"check_same_thread": False})
+    database.Base.metadata.create_all(sync_engine)
+    async_engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"), poolclass=NullPool)
+    database.SyncSessionLocal.configure(bind=sync_engine)
+    database.AsyncSessionLocal.configure(bind=async_engine)
+    with database.SyncSessionLocal() as session:
+        yield session
+    sync_engine.dispose()
+
+
+@pytest.fixture
+def statements(db):
+    """SQL statements sent to the database during the test, from either session factory."""
+    sent: List[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        sent.append(statement)
+
+    engines = [database.SyncSessionLocal.kw["bind"], database.AsyncSessionLocal.kw["bind"].sync_engine]
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+    yield sent
+    for engine in engines:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture(autouse=True)
+def redis(monkeypatch):
+    """A fresh fakeredis server behind the app's Redis clients. Yields a sync client."""
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server)
+    monkeypatch.setattr(status_cache, "_redis", client)
+    monkeypatch.setattr(status_cache, "_async_redis", fakeredis.FakeAsyncRedis(server=server))
+    yield client
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    """Drop pooled HTTP and Replicate clients so none outlive their event loop."""
+    http_client.reset_http_clients()
+    replicate_client.reset()
+    yield
+    http_client.reset_http_clients()
+    replicate_client.reset()
+
+
+@pytest.fixture
+def replicate(monkeypatch):
+    """A running FakeReplicate that the Replicate client talks to."""
+    with FakeReplicate() as fake:
+        monkeypatch.setattr(settings, "replicate_base_url", fake.url)
+        replicate_client.reset()
+        yield fake
+
+
+@dataclass
+class SentTask:
+    name: str
+    args: Tuple
+    kwargs: Dict[str, Any]
+    options: Dict[str, Any]
+
+    def run(self):
+        """Run the task in this process, as a worker would."""
+        return celery_app.tasks[self.name](*self.args, **self.kwargs)
+
+
+@dataclass
+class SentTasks:
+    tasks: List[SentTask] = field(default_factory=list)
+
+    def named(self, suffix: str) -> List[SentTask]:
+        return [task for task in self.tasks if task.name.endswith(suffix)]
+
+    def pop(self, suffix: Optional[str] = None) -> List[SentTask]:
+        """Remove and return the recorded tasks (only those named ``suffix`` if given)."""
+        taken = self.named(suffix) if suffix else list(self.tasks)
+        self.tasks = [task for task in self.tasks if task not in taken]
+        return taken
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+
+@pytest.fixture(autouse=True)
+def sent(monkeypatch):
+    """Celery tasks published during the test, instead of reaching the broker."""
+    recorded = SentTasks()
+
+    def apply_async(task, args=None, kwargs=None, **options):
+        recorded.tasks.append(SentTask(task.name, tuple(args or ()), dict(kwargs or {}), options))
+        return AsyncResult(options.get("task_id") or str(uuid.uuid4()), app=celery_app)
+
+    monkeypatch.setattr(Task, "apply_async", apply_async)
+    monkeypatch.setattr(celery_app, "producer_or_acquire", lambda producer=None: contextlib.nullcontext(producer))
+    return recorded
+
+
+@pytest.fixture
+def api(loop):
+    """Call the API in process: ``api("POST", "/generate", json=...)`` returns the httpx response."""
+    from app.main import app
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+    def call(method: str, path: str, **kwargs) -> httpx.Response:
+        return loop.run_until_complete(client.request(method, settings.api_v1_prefix + path, **kwargs))
+
+    yield call
+    loop.run_until_complete(client.aclose())
+
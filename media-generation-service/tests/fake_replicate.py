@@ -0,0 +1,236 @@
+import base64
+import hashlib
+import hmac
+import io
+import itertools
+import json
+import math
+import socket
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+
+def make_png(size: int = 64, color=(200, 30, 30)) -> bytes:
+    """A small PNG to serve as prediction output."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def sign_webhook(secret: str, webhook_id: str, timestamp: str, body: bytes) -> str:
+    """``webhook-signature`` header for ``body``, as Replicate signs it."""
+    key = base64.b64decode(secret.split("_", 1)[-1])
+    digest = hmac.new(key, f"{webhook_id}.{timestamp}.".encode() + body, hashlib.sha256).digest()
+    return f"v1,{base64.b64encode(digest).decode()}"
+
+
+class FakeReplicate:
+    """A local stand-in for the Replicate predictions API.
+
+    Predictions stay ``processing`` for ``hold`` seconds, then finish with
+    ``final_status``; succeeded ones point at a PNG served by the same server.
+    Predictions created with a webhook are POSTed to it, signed with
+    ``webhook_secret``, when they finish. With ``create_quota``, creates beyond
+    that many per second (bursts up to one second's worth) are answered 429
+    with a Retry-After. Point REPLICATE_BASE_URL at ``url``. Call counts are
+    kept in ``stats``.
+    """
+
+    def __init__(
+        self,
+        hold: float = 0.0,
+        final_status: str = "succeeded",
+        webhook_secret: Optional[str] = None,
+        create_quota: Optional[float] = None,
+        port: int = 0,
+    ):
+        self.hold = hold
+        self.final_status = final_status
+        self.webhook_secret = webhook_secret
+        self.create_quota = create_quota
+        self._quota_tokens = create_quota or 0.0
+        self._quota_at = time.monotonic()
+        self.image = make_png()
+        self.stats = {
+            "connections": 0, "created": 0, "gets": 0, "cancels": 0, "downloads": 0, "webhooks": 0, "max_open": 0,
+            "throttled": 0,
+        }
+        self.predictions: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._server.request_queue_size = 1024
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def output_url(self, prediction_id: str) -> str:
+        return f"{self.url}/files/{prediction_id}.png"
+
+    def start(self) -> "FakeReplicate":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeReplicate":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def open_predictions(self) -> int:
+        """Predictions created and not finished yet."""
+        with self._lock:
+            return sum(1 for prediction in self.predictions.values() if self._status(prediction) == "processing")
+
+    def _status(self, prediction: Dict[str, Any]) -> str:
+        if prediction["canceled"]:
+            return "canceled"
+        if time.time() - prediction["created_at"] < self.hold:
+            return "processing"
+        return self.final_status
+
+    def _body(self, prediction_id: str) -> Dict[str, Any]:
+        prediction = self.predictions[prediction_id]
+        status = self._status(prediction)
+        return {
+            "id": prediction_id,
+            "model": "fake/model",
+            "version": "fake",
+            "status": status,
+            "input": prediction["input"],
+            "output": [self.output_url(prediction_id)] if status == "succeeded" else None,
+            "error": "fake prediction failed" if status == "failed" else None,
+            "logs": "",
+            "urls": {},
+        }
+
+    def _throttle(self) -> Optional[int]:
+        """Take a create from the quota. Returns Retry-After seconds if there is none left."""
+        if not self.create_quota:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            self._quota_tokens = min(self.create_quota, self._quota_tokens + (now - self._quota_at) * self.create_quota)
+            self._quota_at = now
+            if self._quota_tokens >= 1:
+                self._quota_tokens -= 1
+                return None
+            self.stats["throttled"] += 1
+            return max(1, math.ceil((1 - self._quota_tokens) / self.create_quota))
+
+    def _create(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        prediction_id = f"fake-{next(self._ids)}"
+        with self._lock:
+            self.predictions[prediction_id] = {
+                "created_at": time.time(),
+                "input": payload.get("input") or {},
+                "webhook": payload.get("webhook"),
+                "canceled": False,
+            }
+            self.stats["created"] += 1
+            self.stats["max_open"] = max(
+                self.stats["max_open"],
+                sum(1 for prediction in self.predictions.values() if self._status(prediction) == "processing"),
+            )
+            body = self._body(prediction_id)
+        if payload.get("webhook"):
+            timer = threading.Timer(self.hold, self._deliver_webhook, args=(prediction_id,))
+            timer.daemon = True
+            timer.start()
+        return body
+
+    def _deliver_webhook(self, prediction_id: str) -> None:
+        with self._lock:
+            prediction = self.predictions[prediction_id]
+            body = json.dumps(self._body(prediction_id)).encode()
+        request = urllib.request.Request(prediction["webhook"], data=body, method="POST")
+        request.add_header("Content-Type", "application/json")
+        if self.webhook_secret:
+            webhook_id, timestamp = f"msg_{prediction_id}", str(int(time.time()))
+            request.add_header("webhook-id", webhook_id)
+            request.add_header("webhook-timestamp", timestamp)
+            request.add_header("webhook-signature", sign_webhook(self.webhook_secret, webhook_id, timestamp, body))
+        with urllib.request.urlopen(request, timeout=10):
+            pass
+        with self._lock:
+            self.stats["webhooks"] += 1
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with fake._lock:
+                    fake.stats["connections"] += 1
+
+            def _send(self, code: int, body: bytes, content_type: str = "application/json", headers=None) -> None:
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, code: int, payload: Any) -> None:
+                self._send(code, json.dumps(payload).encode())
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                path = self.path.rstrip("/")
+                if path == "/v1/predictions":
+                    retry_after = fake._throttle()
+                    if retry_after is not None:
+                        body = json.dumps({"detail": "Request was throttled."}).encode()
+                        return self._send(429, body, headers={"Retry-After": str(retry_after)})
+                    return self._json(201, fake._create(payload))
+                if path.startswith("/v1/predictions/") and path.endswith("/cancel"):
+                    prediction_id = path.split("/")[-2]
+                    with fake._lock:
+                        fake.stats["cancels"] += 1
+                        if prediction_id not in fake.predictions:
+                            return self._json(404, {"detail": "Not found."})
+                        if fake._status(fake.predictions[prediction_id]) == "processing":
+                            fake.predictions[prediction_id]["canceled"] = True
+                        body = fake._body(prediction_id)
+                    return self._json(200, body)
+                self._json(404, {"detail": "Not found."})
+
+            def do_GET(self):
+                path = self.path.rstrip("/")
+                if path.startswith("/files/"):
+                    with fake._lock:
+                        fake.stats["downloads"] += 1
+                    return self._send(200, fake.image, "image/png")
+                if path.startswith("/v1/predictions/"):
+                    prediction_id = path.rsplit("/", 1)[-1]
+                    with fake._lock:
+                        fake.stats["gets"] += 1
+                        if prediction_id not in fake.predictions:
+                            return self._json(404, {"detail": "Not found."})
+                        body = fake._body(prediction_id)
+                    return self._json(200, body)
+                self._json(404, {"detail": "Not found."})
+
+        return Handler
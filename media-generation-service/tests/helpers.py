@@ -0,0 +1,24 @@
+import uuid
+from typing import Optional
+
+from app.models.job import Job
+
+
+def make_job(db, **values) -> Job:
+    """Insert a job directly, without an outbox entry."""
+    values.setdefault("id", str(uuid.uuid4()))
+    values.setdefault("prompt", "a red square")
+    values.setdefault("model", "test/model:1")
+    values.setdefault("parameters", {})
+    values.setdefault("status", "pending")
+    values.setdefault("retry_count", 0)
+    job = Job(**values)
+    db.add(job)
+    db.commit()
+    return job
+
+
+def reload(db, job_id: str) -> Optional[Job]:
+    """The job as currently stored."""
+    db.expire_all()
+    return db.get(Job, job_id)
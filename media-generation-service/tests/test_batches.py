@@ -0,0 +1,60 @@
+from app.core.config import settings
+from app.models.job import Job, JobOutbox
+from app.services import status_cache
+from app.services.job_service import SyncJobService
+from tests.helpers import make_job
+
+
+def submit_batch(api, count):
+    response = api("POST", "/generate/batch", json={
+        "requests": [{"prompt": f"prompt {i}", "model": "test/model:1"} for i in range(count)]
+    })
+    assert response.status_code == 202, response.text
+    return response.json()
+
+
+def set_status(db, job_id, status, retry_count=0):
+    db.query(Job).filter(Job.id == job_id).update({"status": status, "retry_count": retry_count})
+    db.commit()
+
+
+def test_batch_creates_jobs_and_outbox_entries(db, api):
+    batch = submit_batch(api, 3)
+
+    jobs = db.query(Job).filter(Job.batch_id == batch["batch_id"]).all()
+    assert {job.id for job in jobs} == set(batch["job_ids"])
+    entries = db.query(JobOutbox).all()
+    assert sorted(entry.job_id for entry in entries) == sorted(batch["job_ids"])
+    assert all(entry.payload["model"] == "test/model:1" for entry in entries)
+    assert api("GET", f"/batches/{batch['batch_id']}").json() == {
+        "batch_id": batch["batch_id"], "total": 3, "counts": {"pending": 3}, "done": False,
+    }
+
+
+def test_batch_with_a_failed_job_awaiting_retry_is_not_done(db, api):
+    batch = submit_batch(api, 2)
+    first, second = batch["job_ids"]
+    set_status(db, first, "completed")
+    set_status(db, second, "failed", retry_count=1)
+
+    body = api("GET", f"/batches/{batch['batch_id']}").json()
+    assert body["counts"] == {"completed": 1, "failed": 1}
+    assert body["done"] is False
+
+    set_status(db, second, "failed", retry_count=settings.max_retries)
+    assert api("GET", f"/batches/{batch['batch_id']}").json()["done"] is True
+
+
+def test_unknown_batch_is_404(api):
+    assert api("GET", "/batches/nope").status_code == 404
+
+
+def test_failed_job_awaiting_retry_keeps_the_active_cache_ttl(db, redis):
+    job = make_job(db, status="processing")
+
+    SyncJobService.fail_job(db, job.id, "boom")
+    assert redis.ttl(status_cache._key(job.id)) > settings.status_cache_ttl
+
+    make_job(db, id="last", status="processing", retry_count=settings.max_retries - 1)
+    SyncJobService.fail_job(db, "last", "boom")
+    assert redis.ttl(status_cache._key("last")) <= settings.status_cache_ttl
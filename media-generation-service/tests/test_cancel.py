@@ -0,0 +1,97 @@
+import time
+
+from app.core.config import settings
+from app.services import cancellation, media_client, scheduler
+from app.services.media_client import ReplicateClient, replicate_client
+from tests.helpers import make_job, reload
+
+
+def running_job(db, replicate, **values):
+    """A processing job waiting on a prediction that is still running upstream."""
+    prediction_id = replicate_client.create_prediction("test/model:1", {"prompt": "a red square"})["id"]
+    return make_job(db, status="processing", replicate_prediction_id=prediction_id, **values)
+
+
+def upstream_status(prediction_id):
+    return replicate_client.get_prediction(prediction_id)["status"]
+
+
+def test_cancel_job_cancels_its_prediction_upstream(db, api, sent, replicate):
+    replicate.hold = 60
+    job = running_job(db, replicate)
+
+    response = api("POST", f"/jobs/{job.id}/cancel")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelled"
+    assert cancellation.requested(job.id)
+    [task] = sent.pop("cancel_predictions")
+    assert task.kwargs["prediction_ids"] == [job.replicate_prediction_id]
+    assert task.run() == 1
+    assert replicate.stats["cancels"] == 1
+    assert upstream_status(job.replicate_prediction_id) == "canceled"
+
+
+def test_bulk_cancel_works_in_chunks(db, api, sent, replicate, statements, monkeypatch):
+    monkeypatch.setattr(settings, "cancel_batch_size", 2)
+    replicate.hold = 60
+    jobs = [running_job(db, replicate, batch_id="batch") for _ in range(5)]
+    statements.clear()
+
+    response = api("POST", "/jobs/cancel", json={"batch_id": "batch"})
+
+    body = response.json()
+    assert body["cancelled"] == 5
+    assert sorted(body["job_ids"]) == sorted(job.id for job in jobs)
+    assert body["predictions_cancelled"] == 5
+    assert sum(statement.lstrip().upper().startswith("UPDATE") for statement in statements) == 3
+    tasks = sent.pop("cancel_predictions")
+    assert [len(task.kwargs["prediction_ids"]) for task in tasks] == [2, 2, 1]
+    assert sum(task.run() for task in tasks) == 5
+    assert all(upstream_status(job.replicate_prediction_id) == "canceled" for job in jobs)
+
+
+def test_bulk_cancel_leaves_finished_jobs_and_stored_outputs(db, api, sent, replicate):
+    replicate.hold = 60
+    running = running_job(db, replicate, batch_id="batch")
+    # Its prediction already succeeded; only the download is left
+    checkpointed = running_job(db, replicate, batch_id="batch", prediction_output_url="https://example.com/out.png")
+    completed = make_job(db, status="completed", batch_id="batch")
+
+    body = api("POST", "/jobs/cancel", json={"batch_id": "batch"}).json()
+
+    assert sorted(body["job_ids"]) == sorted([running.id, checkpointed.id])
+    assert reload(db, completed.id).status == "completed"
+    [task] = sent.pop("cancel_predictions")
+    assert task.kwargs["prediction_ids"] == [running.replicate_prediction_id]
+
+
+def test_bulk_cancel_takes_queued_jobs_out_of_their_lanes(db, api, sent, redis):
+    jobs = [make_job(db, batch_id="batch") for _ in range(3)]
+    for job in jobs:
+        scheduler.enqueue(job.id, job.model, "tenant", {})
+
+    body = api("POST", "/jobs/cancel", json={"batch_id": "batch"}).json()
+
+    assert body["cancelled"] == 3
+    assert body["predictions_cancelled"] == 0
+    assert not sent.named("cancel_predictions")
+    assert int(redis.get(scheduler.QUEUED_KEY)) == 0
+    assert scheduler.dispatch() is None
+
+
+def test_cancel_threads_share_one_client(replicate, monkeypatch):
+    replicate.hold = 60
+    prediction_ids = [replicate_client.create_prediction("test/model:1", {})["id"] for _ in range(8)]
+    built = []
+    client_class = media_client.replicate.Client
+
+    def slow_client(*args, **kwargs):
+        built.append(kwargs)
+        time.sleep(0.05)  # widen the window for a second thread to build one too
+        return client_class(*args, **kwargs)
+
+    monkeypatch.setattr(media_client.replicate, "Client", slow_client)
+
+    assert ReplicateClient().cancel_predictions(prediction_ids) == 8
+    assert len(built) == 1
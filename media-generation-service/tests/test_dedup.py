@@ -0,0 +1,62 @@
+from app.models.job import Job
+from app.services import dedup, rate_limit
+from tests.helpers import make_job
+
+REQUEST = {"prompt": "a red square", "model": "test/model:1", "dedupe": True}
+
+
+def request_hash():
+    return dedup.request_hash(REQUEST["model"], REQUEST["prompt"], None)
+
+
+def claim_owner(redis):
+    owner = redis.get(dedup.CLAIM_PREFIX + request_hash())
+    return owner.decode() if owner else None
+
+
+def test_completed_hit_returns_its_media_path(db, api):
+    job = make_job(db, status="completed", media_path="/images/a.png", request_hash=request_hash())
+
+    response = api("POST", "/generate", json=REQUEST)
+
+    assert response.status_code == 202
+    assert response.json()["job_id"] == job.id
+    assert response.json()["media_path"] == "/images/a.png"
+
+
+def test_identical_request_gets_the_uncommitted_owner(db, api, redis):
+    # The owner has claimed the hash but its transaction hasn't committed yet
+    redis.set(dedup.CLAIM_PREFIX + request_hash(), "owner-job")
+
+    response = api("POST", "/generate", json=REQUEST)
+
+    assert response.status_code == 202
+    assert response.json()["job_id"] == "owner-job"
+    assert response.json()["status"] == "pending"
+    assert db.query(Job).count() == 0
+
+
+def test_rejected_request_releases_its_claim(db, api, redis, monkeypatch):
+    retry_after = [5]
+
+    async def check_admission(new_jobs=1):
+        return retry_after[0]
+
+    monkeypatch.setattr(rate_limit, "check_admission", check_admission)
+    assert api("POST", "/generate", json=REQUEST).status_code == 429
+    assert claim_owner(redis) is None
+
+    retry_after[0] = None
+    response = api("POST", "/generate", json=REQUEST)
+
+    assert response.status_code == 202
+    assert db.query(Job).one().id == response.json()["job_id"]
+    assert claim_owner(redis) == response.json()["job_id"]
+
+
+def test_release_keeps_a_claim_held_by_another_job(redis, loop):
+    redis.set(dedup.CLAIM_PREFIX + request_hash(), "owner-job")
+
+    loop.run_until_complete(dedup.release(request_hash(), "other-job"))
+
+    assert claim_owner(redis) == "owner-job"
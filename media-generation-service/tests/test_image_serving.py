@@ -0,0 +1,147 @@
+import hashlib
+import io
+from email.utils import formatdate
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services.file_responses import IMMUTABLE_CACHE_CONTROL
+from app.services.storage import generated_dir
+from tests.fake_replicate import make_png
+
+
+@pytest.fixture(params=["api", "mount"])
+def fetch(request, loop):
+    """GET/HEAD a stored file through the API route or the /images static mount."""
+    from app.main import app
+
+    prefix = f"{settings.api_v1_prefix}/images" if request.param == "api" else "/images"
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+    def call(filename, method="GET", **kwargs):
+        return loop.run_until_complete(client.request(method, f"{prefix}/{filename}", **kwargs))
+
+    yield call
+    loop.run_until_complete(client.aclose())
+
+
+def store(content: bytes, extension: str = ".png") -> str:
+    """Write ``content`` the way ingest names it. Returns the filename."""
+    filename = hashlib.sha256(content).hexdigest() + extension
+    directory = generated_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / filename).write_bytes(content)
+    return filename
+
+
+@pytest.fixture
+def image():
+    content = make_png(256)
+    return store(content), content
+
+
+def test_full_response_is_immutable(fetch, image):
+    filename, content = image
+
+    response = fetch(filename)
+
+    assert response.status_code == 200
+    assert response.content == content
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["etag"] == f'"{filename}"'
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+def test_content_type_comes_from_the_stored_extension(fetch):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(buffer, "JPEG")
+    response = fetch(store(buffer.getvalue(), ".jpg"))
+
+    assert response.headers["content-type"] == "image/jpeg"
+
+
+def test_matching_etag_is_not_modified(fetch, image):
+    filename, _ = image
+    etag = fetch(filename).headers["etag"]
+
+    response = fetch(filename, headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert fetch(filename, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_if_modified_since(fetch, image):
+    filename, _ = image
+    last_modified = fetch(filename).headers["last-modified"]
+
+    assert fetch(filename, headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert fetch(filename, headers={"If-Modified-Since": formatdate(0, usegmt=True)}).status_code == 200
+
+
+@pytest.mark.parametrize("header, first, last", [
+    ("bytes=0-9", 0, 9),
+    ("bytes=10-", 10, -1),
+    ("bytes=-5", -5, -1),
+])
+def test_byte_ranges(fetch, image, header, first, last):
+    filename, content = image
+    start, end = first % len(content), last % len(content)
+
+    response = fetch(filename, headers={"Range": header})
+
+    assert response.status_code == 206
+    assert response.content == content[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(content)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+def test_unsatisfiable_range(fetch, image):
+    filename, content = image
+
+    response = fetch(filename, headers={"Range": f"bytes={len(content)}-"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(content)}"
+
+
+def test_stale_if_range_sends_the_whole_file(fetch, image):
+    filename, content = image
+
+    response = fetch(filename, headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+
+    assert response.status_code == 200
+    assert response.content == content
+
+
+def test_head_has_headers_and_no_body(fetch, image):
+    filename, content = image
+
+    response = fetch(filename, method="HEAD")
+
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == str(len(content))
+    assert response.headers["etag"] == f'"{filename}"'
+
+
+def test_missing_file(fetch):
+    assert fetch("0" * 64 + ".png").status_code == 404
+
+
+def test_variant_is_immutable_and_revalidates(api, image):
+    filename, _ = image
+
+    response = api("GET", f"/images/{filename}", params={"w": 64, "fmt": "webp"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    revalidated = api("GET", f"/images/{filename}", params={"w": 64, "fmt": "webp"},
+                      headers={"If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
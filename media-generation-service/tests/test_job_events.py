@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+from app.core.config import settings
+from app.services.job_events import iter_job_events
+
+
+def payload(job_id, status, version, retry_count=0):
+    return json.dumps({"id": job_id, "status": status, "version": version, "retry_count": retry_count}).encode()
+
+
+def stream(loop, snapshot, events, heartbeat=0.05, limit=20):
+    """Everything iter_job_events yields (None for keep-alives), stopping after ``limit`` items."""
+    queue = asyncio.Queue()
+    for event in events:
+        queue.put_nowait(event)
+
+    async def collect():
+        seen = []
+        async for item in iter_job_events(list(snapshot), queue, snapshot, heartbeat):
+            seen.append(json.loads(item) if item else None)
+            if len(seen) >= limit:
+                break
+        return seen
+
+    return loop.run_until_complete(collect())
+
+
+def test_failed_job_awaiting_retry_keeps_stream_open(loop):
+    events = [payload("a", "failed", 2, retry_count=1), payload("a", "processing", 3, retry_count=1),
+              payload("a", "completed", 4, retry_count=1)]
+
+    seen = stream(loop, {"a": payload("a", "processing", 1)}, events)
+
+    assert [event["status"] for event in seen] == ["processing", "failed", "processing", "completed"]
+
+
+def test_failed_job_without_retries_ends_stream(loop):
+    final = payload("a", "failed", 5, retry_count=settings.max_retries)
+
+    seen = stream(loop, {"a": payload("a", "processing", 4, retry_count=settings.max_retries - 1)}, [final])
+
+    assert [event["status"] for event in seen] == ["processing", "failed"]
+
+
+def test_stream_waits_for_every_job(loop):
+    snapshot = {"a": payload("a", "completed", 3), "b": payload("b", "pending", 0)}
+
+    seen = stream(loop, snapshot, [payload("b", "cancelled", 1)])
+
+    assert [(event["id"], event["status"]) for event in seen] == [("a", "completed"), ("b", "pending"), ("b", "cancelled")]
+
+
+def test_late_and_duplicate_events_are_skipped(loop):
+    events = [payload("a", "processing", 2), payload("a", "pending", 0), payload("a", "processing", 2),
+              payload("a", "completed", 3)]
+
+    seen = stream(loop, {"a": payload("a", "processing", 2)}, events)
+
+    assert [(event["status"], event["version"]) for event in seen] == [("processing", 2), ("completed", 3)]
+
+
+def test_idle_stream_yields_keepalives(loop):
+    seen = stream(loop, {"a": payload("a", "processing", 1)}, [], limit=3)
+
+    assert seen[1:] == [None, None]
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from tests.helpers import make_job
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def make_jobs(db, count, **values):
+    """Jobs created a second apart, oldest first."""
+    return [make_job(db, created_at=START + timedelta(seconds=i), **values) for i in range(count)]
+
+
+def walk(api, path, limit):
+    """Follow ``X-Next-Cursor`` until the last page. Returns the job IDs in order and the page count."""
+    response = api("GET", path, params={"limit": limit})
+    job_ids, pages = [], 0
+    while True:
+        assert response.status_code == 200
+        job_ids += [job["id"] for job in response.json()]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return job_ids, pages
+        response = api("GET", path, params={"limit": limit, "after": cursor})
+
+
+@pytest.mark.parametrize("path", ["/jobs", "/jobs/completed"])
+def test_zero_limit_returns_an_empty_page(db, api, path):
+    make_jobs(db, 2, status="completed")
+
+    response = api("GET", path, params={"limit": 0})
+
+    assert response.status_code == 200
+    assert response.json() == []
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_cursor_walks_every_job_once_newest_first(db, api):
+    jobs = make_jobs(db, 5)
+
+    job_ids, pages = walk(api, "/jobs", limit=2)
+
+    assert job_ids == [job.id for job in reversed(jobs)]
+    # Two full pages, then a short one without a cursor
+    assert pages == 3
+
+
+def test_cursor_walks_completed_jobs_only(db, api):
+    completed = make_jobs(db, 4, status="completed")
+    make_job(db, created_at=START + timedelta(seconds=2, milliseconds=500), status="pending")
+
+    job_ids, _ = walk(api, "/jobs/completed", limit=2)
+
+    assert job_ids == [job.id for job in reversed(completed)]
+
+
+def test_after_and_skip_together_is_rejected(db, api):
+    make_jobs(db, 3)
+    cursor = api("GET", "/jobs", params={"limit": 1}).headers["X-Next-Cursor"]
+
+    response = api("GET", "/jobs", params={"limit": 1, "after": cursor, "skip": 1})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "yesterday,some-id"])
+def test_bad_cursor_is_rejected(db, api, cursor):
+    response = api("GET", "/jobs", params={"after": cursor})
+
+    assert response.status_code == 400
+    assert "cursor" in response.json()["detail"]
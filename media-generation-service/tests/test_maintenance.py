@@ -0,0 +1,153 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.services import maintenance, storage
+from app.services.maintenance import LEGACY_PATH_PREFIX, LOCK_KEY
+from tests.helpers import make_job, reload
+
+OLD = time.time() - settings.maintenance_orphan_grace - 60
+LONG_AGO = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def artifacts(tmp_path, monkeypatch):
+    """An empty local artifact store for the test. Yields its root."""
+    monkeypatch.setattr(settings, "storage_path", str(tmp_path / "storage"))
+    storage.reset_storage()
+    yield tmp_path / "storage"
+    storage.reset_storage()
+
+
+def put(root, name, prefix=storage.GENERATED_PREFIX, modified_at=OLD):
+    """Store an artifact last modified at ``modified_at``. Returns its path."""
+    path = root / prefix / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"png")
+    os.utime(path, (modified_at, modified_at))
+    return path
+
+
+def completed(db, filename, **values):
+    values.setdefault("updated_at", LONG_AGO)
+    return make_job(db, status="completed", media_path=f"/images/{filename}", **values)
+
+
+def run(db, *operations, dry_run=False):
+    return maintenance.run_maintenance(db, None, list(operations) or None, dry_run)
+
+
+def test_dry_run_changes_nothing(db, artifacts):
+    put(artifacts, "kept.png")
+    orphan = put(artifacts, "orphan.png")
+    legacy = make_job(db, status="completed", media_path=f"{LEGACY_PATH_PREFIX}kept.png", updated_at=LONG_AGO)
+    missing = completed(db, "gone.png")
+
+    report = run(db, dry_run=True)
+
+    assert report["status"] == "completed"
+    assert report["results"]["fix_paths"] == {"matched": 1, "fixed": 0}
+    assert report["results"]["missing_artifacts"]["missing"] == 1
+    assert report["results"]["missing_artifacts"]["deleted"] == 0
+    assert report["results"]["orphaned_files"]["orphaned"] == 1
+    assert report["results"]["orphaned_files"]["deleted"] == 0
+    assert reload(db, legacy.id).media_path == f"{LEGACY_PATH_PREFIX}kept.png"
+    assert reload(db, missing.id) is not None
+    assert orphan.exists()
+
+
+def test_legacy_path_is_rewritten(db):
+    job = make_job(db, status="completed", media_path=f"{LEGACY_PATH_PREFIX}abc.png")
+    pending = make_job(db, media_path=f"{LEGACY_PATH_PREFIX}def.png")
+
+    report = run(db, "fix_paths")
+
+    assert report["results"]["fix_paths"] == {"matched": 1, "fixed": 1}
+    job = reload(db, job.id)
+    assert job.media_path == "/images/abc.png"
+    assert job.version == 1
+    assert reload(db, pending.id).media_path == f"{LEGACY_PATH_PREFIX}def.png"
+
+
+def test_missing_artifact_deletes_only_completed_jobs_older_than_the_listing(db, artifacts):
+    put(artifacts, "present.png")
+    gone = completed(db, "gone.png")
+    present = completed(db, "present.png")
+    # Completed after the listing started: its file may not have been listed
+    newer = completed(db, "new.png", updated_at=datetime.now(timezone.utc) + timedelta(hours=1))
+    failed = make_job(db, status="failed", media_path="/images/gone.png", updated_at=LONG_AGO)
+    remote = make_job(db, status="completed", media_path="https://example.com/gone.png", updated_at=LONG_AGO)
+
+    report = run(db, "missing_artifacts")
+
+    assert report["results"]["missing_artifacts"]["deleted"] == 1
+    assert reload(db, gone.id) is None
+    assert all(reload(db, job.id) is not None for job in (present, newer, failed, remote))
+
+
+def test_empty_listing_deletes_nothing(db):
+    job = completed(db, "gone.png")
+
+    report = run(db, "missing_artifacts")
+
+    assert report["results"]["missing_artifacts"]["skipped"] == "no artifacts in storage"
+    assert reload(db, job.id) is not None
+
+
+def test_orphans_are_reclaimed_after_the_grace_window(db, artifacts):
+    completed(db, "used.png")
+    used = put(artifacts, "used.png")
+    used_variant = put(artifacts, "used-w256.webp", prefix=storage.VARIANTS_PREFIX)
+    orphan = put(artifacts, "orphan.png")
+    orphan_variant = put(artifacts, "orphan-w256.webp", prefix=storage.VARIANTS_PREFIX)
+    # Just ingested, its job row not written yet
+    fresh = put(artifacts, "fresh.png", modified_at=time.time())
+
+    report = run(db, "orphaned_files")
+
+    assert report["results"]["orphaned_files"]["deleted"] == 2
+    assert not orphan.exists() and not orphan_variant.exists()
+    assert used.exists() and used_variant.exists() and fresh.exists()
+
+
+def test_shared_file_still_referenced_is_kept(db, artifacts, monkeypatch):
+    shared = put(artifacts, "shared.png")
+    list_keys = storage.LocalStorage.list_keys
+
+    def list_keys_during_ingest(self, prefix):
+        # An identical output is ingested while the run lists storage; its
+        # job points at the existing content-addressed file
+        if prefix == storage.GENERATED_PREFIX:
+            completed(db, "shared.png")
+        return list_keys(self, prefix)
+
+    monkeypatch.setattr(storage.LocalStorage, "list_keys", list_keys_during_ingest)
+
+    report = run(db, "orphaned_files")
+
+    assert report["results"]["orphaned_files"]["orphaned"] == 1
+    assert report["results"]["orphaned_files"]["deleted"] == 0
+    assert shared.exists()
+
+
+def test_overlapping_run_is_skipped(db, redis, artifacts):
+    orphan = put(artifacts, "orphan.png")
+    job = completed(db, "gone.png")
+    redis.set(LOCK_KEY, "other-run")
+
+    report = run(db)
+
+    assert report["status"] == "skipped"
+    assert "other-run" in report["error"]
+    assert report["results"] == {}
+    assert orphan.exists()
+    assert reload(db, job.id) is not None
+    assert redis.get(LOCK_KEY) == b"other-run"
+
+
+def test_lock_is_released_after_a_run(db, redis):
+    assert run(db, "fix_paths")["status"] == "completed"
+    assert redis.get(LOCK_KEY) is None
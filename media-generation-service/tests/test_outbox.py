@@ -0,0 +1,81 @@
+import pytest
+
+from app.models.job import JobOutbox
+from app.services import outbox, scheduler
+from app.tasks import celery_tasks
+
+
+def submit(api, count):
+    response = api("POST", "/generate/batch", json={
+        "requests": [{"prompt": f"prompt {i}", "model": "test/model:1"} for i in range(count)]
+    })
+    assert response.status_code == 202, response.text
+    return response.json()["job_ids"]
+
+
+def crash_after_publish(entries):
+    """A relay that dies after publishing, before its transaction commits."""
+    celery_tasks.publish_outbox_entries(entries)
+    raise RuntimeError("relay died")
+
+
+def dispatch_all():
+    jobs = []
+    while (job := scheduler.dispatch()) is not None:
+        jobs.append(job["job_id"])
+    return jobs
+
+
+def queued(redis) -> int:
+    return int(redis.get(scheduler.QUEUED_KEY) or 0)
+
+
+def test_crashed_relay_leaves_its_entries(db, api):
+    submit(api, 3)
+
+    with pytest.raises(RuntimeError):
+        outbox.drain(crash_after_publish)
+
+    assert db.query(JobOutbox).count() == 3
+
+
+def test_replay_while_queued_enqueues_each_job_once(db, api, redis, sent):
+    job_ids = submit(api, 3)
+    with pytest.raises(RuntimeError):
+        outbox.drain(crash_after_publish)
+    sent.pop()
+
+    assert outbox.drain(celery_tasks.publish_outbox_entries) == 3
+
+    assert db.query(JobOutbox).count() == 0
+    assert queued(redis) == 3
+    assert not sent.named("dispatch_jobs")
+    assert sorted(dispatch_all()) == sorted(job_ids)
+    assert queued(redis) == 0
+
+
+def test_replay_after_dispatch_is_not_dispatched_again(db, api, redis, sent):
+    job_ids = submit(api, 2)
+    with pytest.raises(RuntimeError):
+        outbox.drain(crash_after_publish)
+    celery_tasks.dispatch_jobs()
+    assert sorted(task.kwargs["job_id"] for task in sent.pop("process_media_generation")) == sorted(job_ids)
+    sent.pop()
+
+    outbox.drain(celery_tasks.publish_outbox_entries)
+
+    assert queued(redis) == 0
+    assert dispatch_all() == []
+    assert not sent.named("dispatch_jobs")
+
+
+def test_enqueue_is_idempotent_until_released(redis):
+    assert scheduler.enqueue("job", "test/model:1", "tenant", {})
+    assert not scheduler.enqueue("job", "test/model:1", "tenant", {})
+    assert dispatch_all() == ["job"]
+    assert not scheduler.enqueue("job", "test/model:1", "tenant", {})
+
+    scheduler.release("job")
+
+    assert scheduler.enqueue("job", "test/model:1", "tenant", {})
+    assert queued(redis) == 1
@@ -0,0 +1,74 @@
+from app.core.config import settings
+from app.models.schemas import JobStatus, JobUpdate
+from app.services.job_service import AsyncJobService, SyncJobService
+from app.tasks import celery_tasks
+from tests.helpers import make_job, reload
+
+
+def kinds(statements):
+    return [statement.split(None, 1)[0].upper() for statement in statements]
+
+
+def test_transition_is_one_statement(db, statements):
+    job_id = make_job(db).id
+    statements.clear()
+
+    SyncJobService.update_job(db, job_id, JobUpdate(status=JobStatus.PROCESSING), expected_status=[JobStatus.PENDING])
+    SyncJobService.increment_retry_count(db, job_id)
+    SyncJobService.fail_job(db, job_id, "boom")
+
+    assert kinds(statements) == ["UPDATE"] * 3
+    assert all("RETURNING" in statement for statement in statements)
+
+
+def test_guarded_transition_that_loses_writes_nothing(db, statements):
+    job_id = make_job(db, status="completed").id
+    statements.clear()
+
+    assert SyncJobService.update_job(
+        db, job_id, JobUpdate(status=JobStatus.PROCESSING), expected_status=[JobStatus.PENDING]
+    ) is None
+
+    assert kinds(statements) == ["UPDATE"]
+    assert reload(db, job_id).status == "completed"
+
+
+def test_async_transition_is_one_statement(db, statements, loop):
+    from app.core.database import AsyncSessionLocal
+
+    job_id = make_job(db).id
+    statements.clear()
+
+    async def transition():
+        async with AsyncSessionLocal() as session:
+            return await AsyncJobService.update_job(session, job_id, JobUpdate(status=JobStatus.PROCESSING))
+
+    assert loop.run_until_complete(transition()).status == "processing"
+    assert kinds(statements) == ["UPDATE"]
+
+
+def test_blocking_job_run(db, statements, replicate):
+    job = make_job(db)
+    kwargs = {"job_id": job.id, "model": job.model, "input_data": celery_tasks.job_input_data(job)}
+    statements.clear()
+
+    celery_tasks.process_media_generation(**kwargs, slot_reserved=True)
+
+    # Start, record the prediction, complete: one write each and no reads
+    assert kinds(statements) == ["UPDATE"] * 3
+    assert reload(db, job.id).status == "completed"
+
+
+def test_reconcile_job_run(db, statements, sent, replicate, monkeypatch):
+    monkeypatch.setattr(settings, "execution_mode", "reconcile")
+    monkeypatch.setattr(settings, "scheduler_enabled", False)
+    job = make_job(db)
+    kwargs = {"job_id": job.id, "model": job.model, "input_data": celery_tasks.job_input_data(job)}
+    statements.clear()
+
+    celery_tasks.submit_media_generation(**kwargs)
+    for reconcile in sent.pop("reconcile_prediction"):
+        reconcile.run()
+
+    assert kinds(statements) == ["UPDATE"] * 3
+    assert reload(db, job.id).status == "completed"
@@ -0,0 +1,150 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.models.job import Job
+from app.services import heartbeat
+from app.tasks import celery_tasks
+from tests.helpers import make_job, reload
+
+LONG_AGO = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def reconcile_mode(monkeypatch):
+    monkeypatch.setattr(settings, "execution_mode", "reconcile")
+
+
+def beat_at(redis, job_id, at):
+    redis.zadd(heartbeat.HEARTBEAT_KEY, {job_id: at})
+
+
+def untouched(db, job):
+    """Backdate the job row past the backstop's cutoff."""
+    db.query(Job).filter(Job.id == job.id).update({"updated_at": LONG_AGO})
+    db.commit()
+
+
+def reconcile_kwargs(job, prediction_id):
+    return {
+        "job_id": job.id, "prediction_id": prediction_id, "model": job.model,
+        "input_data": celery_tasks.job_input_data(job), "deadline": time.time() + 60,
+    }
+
+
+def test_stale_heartbeat_is_reaped_and_restarted(db, redis, sent):
+    job = make_job(db, status="processing")
+    beat_at(redis, job.id, time.time() - settings.job_stale_after - 1)
+
+    assert celery_tasks.reap_stuck_jobs() == 1
+
+    assert reload(db, job.id).status == "failed"
+    assert [task.kwargs["job_id"] for task in sent.pop("process_media_generation")] == [job.id]
+
+
+def test_fresh_heartbeat_is_left_alone(db, redis, sent):
+    job = make_job(db, status="processing")
+    beat_at(redis, job.id, time.time())
+
+    assert celery_tasks.reap_stuck_jobs() == 0
+    assert reload(db, job.id).status == "processing"
+
+
+def test_backstop_reaps_untouched_job_without_heartbeat(db, redis, sent):
+    job = make_job(db, status="processing")
+    untouched(db, job)
+
+    assert celery_tasks.reap_stuck_jobs() == 1
+
+
+def test_backstop_skips_untouched_job_with_fresh_heartbeat(db, redis, sent):
+    # A long reconcile-mode job: status checks beat, but never touch the row
+    job = make_job(db, status="processing")
+    untouched(db, job)
+    beat_at(redis, job.id, time.time())
+
+    assert celery_tasks.reap_stuck_jobs() == 0
+    assert reload(db, job.id).status == "processing"
+    assert not sent.named("process_media_generation")
+
+
+def test_reconcile_heartbeat_is_dated_at_the_next_check(db, redis, sent, replicate, reconcile_mode):
+    replicate.hold = 60
+    job = make_job(db, status="processing")
+    prediction_id = celery_tasks.replicate_client.create_prediction(job.model, {})["id"]
+    before = time.time()
+
+    celery_tasks.reconcile_prediction(**reconcile_kwargs(job, prediction_id))
+
+    [check] = sent.pop("reconcile_prediction")
+    assert redis.zscore(heartbeat.HEARTBEAT_KEY, job.id) >= before + check.options["countdown"]
+
+
+def test_late_check_records_its_lag(db, redis, sent, replicate, reconcile_mode):
+    replicate.hold = 60
+    job = make_job(db, status="processing")
+    prediction_id = celery_tasks.replicate_client.create_prediction(job.model, {})["id"]
+    eta = datetime.now(timezone.utc) - timedelta(seconds=90)
+
+    celery_tasks.reconcile_prediction.push_request(eta=eta.isoformat())
+    try:
+        celery_tasks.reconcile_prediction.run(**reconcile_kwargs(job, prediction_id))
+    finally:
+        celery_tasks.reconcile_prediction.pop_request()
+
+    assert heartbeat.reconcile_lag() == pytest.approx(90, abs=5)
+
+
+def test_reconcile_lag_extends_the_threshold(db, redis, sent, reconcile_mode):
+    job = make_job(db, status="processing")
+    # Its next check is overdue, but checks are running 60s late across the board
+    beat_at(redis, job.id, time.time() - settings.job_stale_after - 30)
+    heartbeat.beat_reconcile("other", time.time() + 10, lag=60)
+
+    assert celery_tasks.reap_stuck_jobs() == 0
+    assert reload(db, job.id).status == "processing"
+
+    redis.delete(heartbeat.LAG_KEY)
+    assert celery_tasks.reap_stuck_jobs() == 1
+
+
+def test_duplicate_attempt_leaves_the_winners_heartbeat(redis, loop):
+    winner_started, loser_done = asyncio.Event(), asyncio.Event()
+
+    async def winner():
+        async with heartbeat.async_track("job") as attempt:
+            attempt.started = True
+            winner_started.set()
+            await loser_done.wait()
+            assert "job" in heartbeat._tracked
+            assert redis.zscore(heartbeat.HEARTBEAT_KEY, "job") is not None
+
+    async def loser():
+        await winner_started.wait()
+        # A replayed delivery of the same job: it loses start_job and exits
+        async with heartbeat.async_track("job"):
+            pass
+        loser_done.set()
+
+    async def both():
+        await asyncio.gather(winner(), loser())
+
+    loop.run_until_complete(both())
+
+    assert "job" not in heartbeat._tracked
+    assert redis.zscore(heartbeat.HEARTBEAT_KEY, "job") is None
+
+
+def test_losing_attempt_does_not_clear_the_heartbeat(db, redis, sent, replicate):
+    job = make_job(db, status="processing")
+    beat_at(redis, job.id, 123)
+
+    celery_tasks.process_media_generation(
+        job_id=job.id, model=job.model, input_data=celery_tasks.job_input_data(job), slot_reserved=True
+    )
+
+    assert redis.zscore(heartbeat.HEARTBEAT_KEY, job.id) is not None
+    assert reload(db, job.id).status == "processing"
@@ -0,0 +1,96 @@
+"""Fault injection: a worker killed after any checkpoint costs no extra prediction."""
+import pytest
+
+from app.core.config import settings
+from app.services import heartbeat
+from app.tasks import async_tasks, celery_tasks
+from tests.helpers import make_job, reload
+
+# Each stage's checkpoint, in the order a job writes them
+CHECKPOINTS = ["start_job", "record_prediction_id", "checkpoint_prediction_output", "complete_job_from_prediction"]
+# The asyncio worker checkpoints the output through its generic guarded update
+ASYNC_CHECKPOINTS = ["start_job", "record_prediction_id", "update_processing_job", "complete_job_from_prediction"]
+
+
+class WorkerKilled(BaseException):
+    """Stands in for SIGKILL/OOM: not an Exception, so no handler in the task runs."""
+
+
+@pytest.fixture(autouse=True)
+def stored_outputs(monkeypatch):
+    # Download outputs into storage, so the output checkpoint is written
+    monkeypatch.setattr(settings, "debug", True)
+
+
+def kill_after(monkeypatch, module, name):
+    """Make the worker die right after the first call to ``module.name`` returns."""
+    checkpoint = getattr(module, name)
+    calls = []
+
+    def call(*args, **kwargs):
+        result = checkpoint(*args, **kwargs)
+        if not calls:
+            calls.append(name)
+            raise WorkerKilled(name)
+        return result
+
+    async def async_call(*args, **kwargs):
+        result = await checkpoint(*args, **kwargs)
+        if not calls:
+            calls.append(name)
+            raise WorkerKilled(name)
+        return result
+
+    monkeypatch.setattr(module, name, async_call if module is async_tasks else call)
+    return lambda: monkeypatch.setattr(module, name, checkpoint)
+
+
+def reap(db, redis, sent, job_id):
+    """Let the reaper find the dead worker's job. Returns the restart it published, if any."""
+    # A killed worker leaves its last heartbeat behind (the track() ``finally`` cleared it here)
+    if reload(db, job_id).status == "processing":
+        redis.zadd(heartbeat.HEARTBEAT_KEY, {job_id: 0})
+    celery_tasks.reap_stuck_jobs()
+    return sent.pop("process_media_generation")
+
+
+@pytest.mark.parametrize("checkpoint", CHECKPOINTS)
+def test_celery_worker_killed_after_checkpoint(db, redis, sent, replicate, monkeypatch, checkpoint):
+    job = make_job(db)
+    restore = kill_after(monkeypatch, celery_tasks, checkpoint)
+
+    with pytest.raises(WorkerKilled):
+        celery_tasks.process_media_generation(
+            job_id=job.id, model=job.model, input_data=celery_tasks.job_input_data(job), slot_reserved=True
+        )
+    restore()
+    restarts = reap(db, redis, sent, job.id)
+    assert len(restarts) == (checkpoint != "complete_job_from_prediction")
+    for restart in restarts:
+        restart.run()
+
+    job = reload(db, job.id)
+    assert job.status == "completed"
+    assert job.media_path.startswith("/images/")
+    assert replicate.stats["created"] == 1
+    assert job.retry_count == (0 if checkpoint == "complete_job_from_prediction" else 1)
+
+
+@pytest.mark.parametrize("checkpoint", ASYNC_CHECKPOINTS)
+def test_async_worker_killed_after_checkpoint(db, redis, sent, replicate, loop, monkeypatch, checkpoint):
+    job = make_job(db)
+    restore = kill_after(monkeypatch, async_tasks, checkpoint)
+
+    with pytest.raises(WorkerKilled):
+        loop.run_until_complete(async_tasks.process_media_generation(
+            job.id, job.model, celery_tasks.job_input_data(job), slot_reserved=True
+        ))
+    restore()
+    restarts = reap(db, redis, sent, job.id)
+    assert len(restarts) == (checkpoint != "complete_job_from_prediction")
+    for restart in restarts:
+        loop.run_until_complete(async_tasks.process_media_generation(**restart.kwargs))
+
+    job = reload(db, job.id)
+    assert job.status == "completed"
+    assert replicate.stats["created"] == 1
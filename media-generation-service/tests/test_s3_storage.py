@@ -0,0 +1,119 @@
+from urllib.parse import urlparse
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from app.core.config import settings
+from app.services import image_variants
+from app.services.artifacts import ingest_artifact
+from app.services.file_responses import IMMUTABLE_CACHE_CONTROL
+from app.services.storage import GENERATED_PREFIX, generated_key, get_storage, reset_storage, variant_key
+from app.tasks import celery_tasks
+from tests.helpers import make_job, reload
+
+BUCKET = "artifacts"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """STORAGE_BACKEND=s3 against an in-process moto S3. Yields the boto3 client."""
+    for name, value in {
+        "storage_backend": "s3", "s3_bucket": BUCKET, "s3_prefix": "media/", "s3_region": "us-east-1",
+        "s3_access_key_id": "test", "s3_secret_access_key": "test",
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        reset_storage()
+        yield client
+    reset_storage()
+
+
+def stored(s3, key):
+    return s3.head_object(Bucket=BUCKET, Key=f"media/{key}")
+
+
+def test_job_output_is_stored_in_the_bucket(db, s3, replicate):
+    job = make_job(db)
+
+    celery_tasks.process_media_generation(
+        job_id=job.id, model=job.model, input_data=celery_tasks.job_input_data(job), slot_reserved=True
+    )
+
+    job = reload(db, job.id)
+    assert job.status == "completed"
+    filename = f"{job.content_sha256}.png"
+    assert job.media_path == f"/images/{filename}"
+    head = stored(s3, generated_key(filename))
+    assert head["ContentType"] == "image/png"
+    assert head["CacheControl"] == IMMUTABLE_CACHE_CONTROL
+    assert head["ContentLength"] == job.byte_size == len(replicate.image)
+
+
+def test_large_outputs_are_uploaded_in_parts(s3, replicate, monkeypatch):
+    monkeypatch.setattr(settings, "s3_multipart_chunk_size", 5 * 1024 * 1024)
+    reset_storage()
+    replicate.image = b"\x89PNG\r\n\x1a\n" + bytes(12 * 1024 * 1024)
+
+    artifact = ingest_artifact(replicate.output_url("big"))
+
+    head = stored(s3, generated_key(artifact.filename))
+    assert head["ContentLength"] == len(replicate.image)
+    assert head["ETag"].endswith('-3"')  # three parts
+
+
+def test_identical_outputs_are_stored_once(s3, replicate):
+    first = ingest_artifact(replicate.output_url("a"))
+    second = ingest_artifact(replicate.output_url("b"))
+
+    assert first == second
+    listed = s3.list_objects_v2(Bucket=BUCKET, Prefix="media/")["Contents"]
+    assert [obj["Key"] for obj in listed] == [f"media/{generated_key(first.filename)}"]
+
+
+def test_image_route_redirects_to_a_presigned_url(s3, replicate, api):
+    artifact = ingest_artifact(replicate.output_url("a"))
+
+    response = api("GET", f"/images/{artifact.filename}")
+
+    assert response.status_code == 307
+    location = urlparse(response.headers["location"])
+    assert location.path.endswith(f"/media/{generated_key(artifact.filename)}")
+    assert "Signature=" in location.query or "X-Amz-Signature=" in location.query
+    assert response.headers["cache-control"] == f"private, max-age={settings.s3_presign_ttl // 2}"
+
+
+def test_public_base_url_redirect_is_immutable(s3, replicate, api, monkeypatch):
+    monkeypatch.setattr(settings, "s3_public_base_url", "https://cdn.example.com/")
+    artifact = ingest_artifact(replicate.output_url("a"))
+
+    response = api("GET", f"/images/{artifact.filename}")
+
+    assert response.status_code == 307
+    assert response.headers["location"] == f"https://cdn.example.com/media/{generated_key(artifact.filename)}"
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+
+
+def test_thumbnail_is_stored_and_preferred(s3, replicate, api, monkeypatch):
+    monkeypatch.setattr(settings, "pregenerate_thumbnails", True)
+    artifact = ingest_artifact(replicate.output_url("a"))
+    width = image_variants.normalize_width(settings.thumbnail_width)
+    fmt = image_variants.normalize_format(settings.thumbnail_format)
+    thumbnail = variant_key(image_variants.variant_filename(artifact.filename, width, fmt))
+    assert stored(s3, thumbnail)["ContentType"] == image_variants.variant_media_type(fmt)
+
+    response = api("GET", f"/images/{artifact.filename}", params={"w": width, "fmt": fmt})
+
+    assert urlparse(response.headers["location"]).path.endswith(f"/media/{thumbnail}")
+
+
+def test_list_and_delete(s3, replicate):
+    artifact = ingest_artifact(replicate.output_url("a"))
+    storage = get_storage()
+    key = generated_key(artifact.filename)
+
+    assert [listed for listed, _ in storage.list_keys(GENERATED_PREFIX)] == [key]
+    storage.delete(key)
+    assert not storage.exists(key)
@@ -0,0 +1,98 @@
+import pytest
+
+from app.models.job import Job
+from app.services import scheduler
+from app.services.media_client import replicate_client
+from app.tasks import async_tasks, celery_tasks
+from tests.helpers import make_job, reload
+
+
+def dispatched(db, **values) -> Job:
+    """A job that the scheduler has let through, so it holds an in-flight slot."""
+    job = make_job(db, **values)
+    scheduler.enqueue(job.id, job.model, "tenant", celery_tasks.job_input_data(job))
+    assert scheduler.dispatch()["job_id"] == job.id
+    return job
+
+
+def holds_slot(redis, job_id: str) -> bool:
+    return redis.zscore(scheduler.INFLIGHT_KEY, job_id) is not None
+
+
+def run(job):
+    celery_tasks.process_media_generation(
+        job_id=job.id, model=job.model, input_data=celery_tasks.job_input_data(job), slot_reserved=True
+    )
+
+
+def change_during_wait(monkeypatch, db, job_id: str, **values):
+    """Make the job move on (reaped, cancelled) while the worker waits for its prediction."""
+    wait = replicate_client.wait_for_prediction
+
+    def wait_then_change(prediction_id, **kwargs):
+        prediction = wait(prediction_id, **kwargs)
+        db.query(Job).filter(Job.id == job_id).update(values)
+        db.commit()
+        return prediction
+
+    monkeypatch.setattr(replicate_client, "wait_for_prediction", wait_then_change)
+
+
+def test_winning_attempt_frees_the_slot(db, redis, sent, replicate):
+    job = dispatched(db)
+
+    run(job)
+
+    assert reload(db, job.id).status == "completed"
+    assert not holds_slot(redis, job.id)
+    assert sent.named("dispatch_jobs")
+
+
+def test_duplicate_delivery_keeps_the_running_attempts_slot(db, redis, sent):
+    job = dispatched(db, status="processing")
+
+    run(job)
+
+    assert holds_slot(redis, job.id)
+    assert not sent.named("dispatch_jobs")
+
+
+def test_duplicate_delivery_of_a_finished_job_frees_its_slot(db, redis, sent):
+    job = dispatched(db, status="completed")
+
+    run(job)
+
+    assert not holds_slot(redis, job.id)
+    assert sent.named("dispatch_jobs")
+
+
+def test_lost_completion_keeps_the_slot_for_the_retry(db, redis, sent, replicate, monkeypatch):
+    job = dispatched(db)
+    # Reaped mid-wait: the restarted attempt runs in the same slot
+    change_during_wait(monkeypatch, db, job.id, status="failed", retry_count=1)
+
+    run(job)
+
+    assert reload(db, job.id).status == "failed"
+    assert holds_slot(redis, job.id)
+
+
+def test_lost_completion_of_a_cancelled_job_frees_the_slot(db, redis, sent, replicate, monkeypatch):
+    job = dispatched(db)
+    change_during_wait(monkeypatch, db, job.id, status="cancelled")
+
+    run(job)
+
+    assert reload(db, job.id).status == "cancelled"
+    assert not holds_slot(redis, job.id)
+
+
+@pytest.mark.parametrize("status, kept", [("processing", True), ("cancelled", False)])
+def test_async_worker_duplicate_delivery(db, redis, sent, loop, status, kept):
+    job = dispatched(db, status=status)
+
+    loop.run_until_complete(async_tasks.process_media_generation(
+        job.id, job.model, celery_tasks.job_input_data(job), slot_reserved=True
+    ))
+
+    assert holds_slot(redis, job.id) is kept
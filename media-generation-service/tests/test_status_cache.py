@@ -0,0 +1,81 @@
+import json
+
+from app.models.schemas import JobStatus, JobUpdate
+from app.services import status_cache
+from app.services.job_service import SyncJobService
+from tests.helpers import make_job, reload
+
+
+def snapshot(db, job_id):
+    """The job as stored now, detached so later updates don't refresh it."""
+    job = reload(db, job_id)
+    db.expunge(job)
+    return job
+
+
+def cached(redis, job_id):
+    payload = redis.get(status_cache._key(job_id))
+    return json.loads(payload) if payload else None
+
+
+def test_transitions_bump_the_version(db):
+    job = make_job(db)
+    assert job.version == 0
+
+    job = SyncJobService.update_job(db, job.id, JobUpdate(status=JobStatus.PROCESSING))
+    assert job.version == 1
+    job = SyncJobService.fail_job(db, job.id, "boom")
+    assert job.version == 2
+
+
+def test_older_write_does_not_replace_newer_status(db, redis, loop):
+    job = make_job(db)
+    stale = snapshot(db, job.id)
+    stale_payload = status_cache.serialize_job(stale)
+    SyncJobService.update_job(db, job.id, JobUpdate(status=JobStatus.PROCESSING))
+    SyncJobService.update_job(db, job.id, JobUpdate(status=JobStatus.COMPLETED, media_path="/images/a.png"))
+
+    # A read-through fill that read the row before both transitions lands last
+    loop.run_until_complete(status_cache.async_cache_job_status(stale, stale_payload))
+    status_cache.cache_job_status(stale)
+
+    assert cached(redis, job.id)["status"] == "completed"
+    assert cached(redis, job.id)["version"] == 2
+
+
+def test_writer_still_publishes_when_a_fill_cached_its_version_first(db, redis, loop):
+    job = make_job(db)
+    pubsub = redis.pubsub()
+    pubsub.subscribe(status_cache.event_channel(job.id))
+    pubsub.get_message(timeout=1)  # subscribe confirmation
+
+    job = SyncJobService.update_job(db, job.id, JobUpdate(status=JobStatus.PROCESSING), expected_status=None)
+    loop.run_until_complete(status_cache.async_cache_job_status(job))  # fill of the same version
+    status_cache.cache_job_status(job)
+
+    messages = [pubsub.get_message(timeout=1) for _ in range(3)]
+    published = [json.loads(message["data"]) for message in messages if message]
+    assert [event["version"] for event in published] == [1, 1]
+
+
+def test_stale_transition_is_not_published(db, redis):
+    job = make_job(db)
+    stale = snapshot(db, job.id)
+    SyncJobService.update_job(db, job.id, JobUpdate(status=JobStatus.PROCESSING))
+    pubsub = redis.pubsub()
+    pubsub.subscribe(status_cache.event_channel(job.id))
+    pubsub.get_message(timeout=1)
+
+    status_cache.cache_job_status(stale)
+
+    assert pubsub.get_message(timeout=0.2) is None
+    assert cached(redis, job.id)["status"] == "processing"
+
+
+def test_unversioned_payload_is_replaced(db, redis):
+    job = make_job(db, status="processing", version=3)
+    redis.set(status_cache._key(job.id), json.dumps({"id": job.id, "status": "pending"}))
+
+    status_cache.cache_job_status(job)
+
+    assert cached(redis, job.id)["version"] == 3
@@ -0,0 +1,122 @@
+import base64
+import json
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+
+from app.core.config import settings
+from app.tasks import celery_tasks
+from tests.fake_replicate import sign_webhook
+from tests.helpers import make_job, reload
+
+SECRET = "whsec_" + base64.b64encode(b"test webhook signing key").decode()
+
+
+def wait_for(condition, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def live_api(monkeypatch):
+    """The API served over HTTP on a local port, so FakeReplicate can call it back."""
+    from app.main import app
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    base_url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+    monkeypatch.setattr(settings, "public_base_url", base_url)
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    wait_for(lambda: server.started)
+    yield base_url
+    server.should_exit = True
+    thread.join(10)
+    sock.close()
+
+
+@pytest.fixture
+def webhook_mode(monkeypatch):
+    monkeypatch.setattr(settings, "execution_mode", "webhook")
+    monkeypatch.setattr(settings, "scheduler_enabled", False)
+    monkeypatch.setattr(settings, "replicate_webhook_secret", SECRET)
+
+
+def submit(job):
+    celery_tasks.submit_media_generation(
+        job_id=job.id, model=job.model, input_data=celery_tasks.job_input_data(job)
+    )
+
+
+def test_signed_callback_completes_job(db, sent, replicate, webhook_mode, live_api):
+    replicate.hold = 0.2
+    replicate.webhook_secret = SECRET
+    job = make_job(db)
+
+    submit(job)
+    wait_for(lambda: replicate.stats["webhooks"] == 1)
+
+    [finalize] = sent.pop("finalize_prediction")
+    assert finalize.kwargs["job_id"] == job.id
+    finalize.run()
+
+    job = reload(db, job.id)
+    assert job.status == "completed"
+    assert job.media_path == replicate.output_url(job.replicate_prediction_id)
+    assert (replicate.stats["created"], replicate.stats["gets"]) == (1, 1)
+
+
+def test_unsigned_callback_is_rejected(db, sent, api, replicate, webhook_mode):
+    job = make_job(db, status="processing", replicate_prediction_id="fake-1")
+    body = {"id": "fake-1", "status": "succeeded", "output": ["http://127.0.0.1:9/forged.png"]}
+
+    assert api("POST", "/webhooks/replicate", json=body).status_code == 401
+
+    payload = json.dumps(body).encode()
+    headers = {"webhook-id": "msg_1", "webhook-timestamp": str(int(time.time()))}
+    headers["webhook-signature"] = sign_webhook("whsec_" + base64.b64encode(b"wrong key").decode(),
+                                                headers["webhook-id"], headers["webhook-timestamp"], payload)
+    assert api("POST", "/webhooks/replicate", content=payload, headers=headers).status_code == 401
+    assert not sent.named("finalize_prediction")
+    assert reload(db, job.id).status == "processing"
+
+
+def test_callbacks_are_rejected_without_a_secret(db, sent, api, monkeypatch):
+    monkeypatch.setattr(settings, "replicate_webhook_secret", None)
+    make_job(db, status="processing", replicate_prediction_id="fake-1")
+
+    response = api("POST", "/webhooks/replicate", json={"id": "fake-1", "status": "succeeded", "output": []})
+
+    assert response.status_code == 401
+    assert not sent.named("finalize_prediction")
+
+
+def test_finalize_uses_the_prediction_from_replicate_not_the_callback(db, replicate, webhook_mode):
+    replicate.hold = 60
+    job = make_job(db)
+    submit(job)
+    prediction_id = reload(db, job.id).replicate_prediction_id
+    forged = {"id": prediction_id, "status": "succeeded", "output": ["http://127.0.0.1:9/forged.png"], "error": None}
+
+    celery_tasks.finalize_prediction(job_id=job.id, prediction=forged)
+
+    job = reload(db, job.id)
+    assert job.status == "processing"
+    assert job.media_path is None
+    assert replicate.stats["gets"] == 1
+
+
+def test_webhook_mode_refuses_to_start_without_a_secret(monkeypatch, loop):
+    from app.main import startup_event
+
+    monkeypatch.setattr(settings, "execution_mode", "webhook")
+    monkeypatch.setattr(settings, "replicate_webhook_secret", None)
+
+    with pytest.raises(RuntimeError, match="REPLICATE_WEBHOOK_SECRET"):
+        loop.run_until_complete(startup_event())
@@ -0,0 +1,247 @@
+"""Asyncio worker: runs many blocking-mode jobs per process.
+
+    python -m worker.async_worker --concurrency 200
+
+Consumes the same queue as the Celery worker (``media_generation``) and runs
+each ``process_media_generation`` message as a coroutine (app/tasks/async_tasks.py),
+so a job waiting on Replicate costs a coroutine instead of a whole prefork
+process. Both kinds of worker can consume the queue side by side. Only
+EXECUTION_MODE=blocking is handled; the other modes already keep workers free
+while predictions run. Periodic and housekeeping tasks (``default`` queue)
+still need a Celery worker.
+
+A kombu consumer thread fetches messages (at most ``--concurrency`` unacked,
+like Celery's prefetch) and hands them to the event loop; acknowledgements go
+back through the same thread, since kombu channels are not thread-safe. A
+message is acked once its job has finished or been handed on (retry,
+requeue). On SIGTERM/SIGINT the worker stops fetching, lets running jobs
+finish for up to ``ASYNC_WORKER_DRAIN_TIMEOUT`` seconds, then cancels the rest;
+cancelled jobs go back to pending and their unacked messages are returned to
+the queue when the connection closes.
+"""
+import argparse
+import asyncio
+import logging
+import queue
+import signal
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+from app.core import metrics, tracing
+from app.core.config import settings
+from app.core.database import async_engine
+from app.services import status_cache
+from app.services.http_client import aclose_http_clients
+from app.tasks.async_tasks import TASKS
+from app.tasks.celery_tasks import TRACE_HEADERS
+from worker.celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+POLL_TIMEOUT = 0.5  # seconds the consumer thread blocks on the broker between acks
+RECONNECT_DELAY = 5.0  # seconds before reconnecting after a broker error
+UNKNOWN_TASK_DELAY = 5.0  # seconds before handing back a message this worker can't run
+
+
+def _eta(headers: Dict[str, Any]) -> Optional[float]:
+    """Unix time a countdown/ETA message may run at, or None to run now."""
+    eta = headers.get("eta")
+    if not eta:
+        return None
+    eta_time = datetime.fromisoformat(eta)
+    if eta_time.tzinfo is None:
+        eta_time = eta_time.replace(tzinfo=timezone.utc)
+    return eta_time.timestamp()
+
+
+class AsyncWorker:
+    def __init__(self, queues: List[str], concurrency: int, drain_timeout: float):
+        self.queues = queues
+        self.concurrency = concurrency
+        self.drain_timeout = drain_timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._running: Set[asyncio.Task] = set()  # holding a slot, i.e. started their job
+        # Requests from the event loop to the consumer thread: ("ack"|"requeue", message) or ("qos", delta)
+        self._requests: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._stop_consuming = threading.Event()
+        self._release_connection = threading.Event()
+        self._consumer = None
+        self._prefetch = concurrency
+
+    # Consumer thread
+
+    def _consume(self) -> None:
+        while not self._stop_consuming.is_set():
+            try:
+                with celery_app.connection_for_read() as connection:
+                    self._consume_from(connection)
+                    if self._stop_consuming.is_set():
+                        # Keep the channel open to ack jobs finishing during the drain;
+                        # closing it returns whatever is still unacked to the queue
+                        while not self._release_connection.wait(POLL_TIMEOUT):
+                            self._apply_requests()
+                        self._apply_requests()
+                    return
+            except Exception as e:
+                logger.error(f"Broker connection failed, reconnecting in {RECONNECT_DELAY}s: {e}", exc_info=True)
+                self._stop_consuming.wait(RECONNECT_DELAY)
+
+    def _consume_from(self, connection) -> None:
+        broker_queues = [celery_app.amqp.queues[name] for name in self.queues]
+        with connection.Consumer(
+            broker_queues, callbacks=[self._on_message], accept=["json"], prefetch_count=self._prefetch
+        ) as consumer:
+            self._consumer = consumer
+            logger.info(f"Consuming from {', '.join(self.queues)} (concurrency {self.concurrency})")
+            while not self._stop_consuming.is_set():
+                self._apply_requests()
+                try:
+                    connection.drain_events(timeout=POLL_TIMEOUT)
+                except socket.timeout:
+                    pass
+        self._consumer = None
+
+    def _apply_requests(self) -> None:
+        while True:
+            try:
+                action, item = self._requests.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                if action == "ack":
+                    item.ack()
+                elif action == "requeue":
+                    item.reject(requeue=True)
+                elif action == "qos" and self._consumer is not None:
+                    self._prefetch += item
+                    self._consumer.qos(prefetch_count=self._prefetch)
+            except Exception as e:
+                logger.error(f"Failed to {action} message: {e}")
+
+    def _on_message(self, body, message) -> None:
+        eta = _eta(message.headers or {})
+        if eta is not None and self._consumer is not None:
+            # Like Celery: a message waiting for its ETA doesn't take a slot from new work
+            self._prefetch += 1
+            self._consumer.qos(prefetch_count=self._prefetch)
+        self._loop.call_soon_threadsafe(self._spawn, body, message, eta)
+
+    # Event loop
+
+    def _spawn(self, body, message, eta: Optional[float]) -> None:
+        task = self._loop.create_task(self._handle(body, message, eta))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _handle(self, body, message, eta: Optional[float]) -> None:
+        headers = message.headers or {}
+        name = headers.get("task")
+        handler = TASKS.get(name)
+        if handler is None:
+            logger.error(f"No coroutine for task {name}, returning the message to the queue")
+            await asyncio.sleep(UNKNOWN_TASK_DELAY)
+            self._requests.put(("requeue", message))
+            return
+        args, kwargs, _ = body
+
+        if eta is not None:
+            await asyncio.sleep(max(0.0, eta - time.time()))
+            self._requests.put(("qos", -1))
+
+        async with self._slots:
+            task = asyncio.current_task()
+            self._running.add(task)
+            try:
+                await self._run(name, handler, headers, args, kwargs)
+            except asyncio.CancelledError:
+                raise  # left unacked, returned to the queue when the connection closes
+            except Exception as e:
+                logger.error(f"Task {name}[{headers.get('id')}] failed: {e}", exc_info=True)
+            finally:
+                self._running.discard(task)
+        self._requests.put(("ack", message))
+
+    async def _run(self, name: str, handler, headers: Dict[str, Any], args, kwargs) -> None:
+        """Run one task, continuing the trace from its message like the Celery task signals do."""
+        carrier = {key: headers[key] for key in TRACE_HEADERS if headers.get(key)}
+        attributes = dict(
+            job_id=kwargs.get("job_id"),
+            model=kwargs.get("model"),
+            **{"celery.task": name, "celery.retries": headers.get("retries") or 0}
+        )
+        short_name = name.rsplit(".", 1)[-1]
+        with tracing.use_context(carrier):
+            if headers.get("published_at"):
+                tracing.record_interval(f"celery.queue {short_name}", headers["published_at"], **attributes)
+            with tracing.span(f"celery.run {short_name}", tracing.SpanKind.CONSUMER, **attributes):
+                await handler(*args, **kwargs)
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self._loop.add_signal_handler(signum, stop.set)
+
+        consumer = threading.Thread(target=self._consume, name="async-worker-consumer", daemon=True)
+        consumer.start()
+        try:
+            await stop.wait()
+            self._stop_consuming.set()
+
+            # Jobs not started yet (waiting for an ETA or a slot) go straight back to the queue
+            for task in self._tasks - self._running:
+                task.cancel()
+            running = set(self._running)
+            logger.info(f"Stopping: waiting up to {self.drain_timeout}s for {len(running)} running jobs")
+            if running:
+                _, unfinished = await asyncio.wait(running, timeout=self.drain_timeout)
+                if unfinished:
+                    logger.warning(f"Cancelling {len(unfinished)} jobs still running")
+                    for task in unfinished:
+                        task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        finally:
+            self._release_connection.set()
+            await asyncio.to_thread(consumer.join)
+            await aclose_http_clients()
+            await status_cache.aclose()
+            await async_engine.dispose()
+            logger.info("Asyncio worker stopped")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-c", "--concurrency", type=int, default=settings.async_worker_concurrency,
+                        help="jobs in progress at once")
+    parser.add_argument("-Q", "--queues", default="media_generation",
+                        help="comma-separated queues to consume")
+    options = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if settings.execution_mode != "blocking":
+        logger.error(f"The asyncio worker only runs EXECUTION_MODE=blocking jobs (configured: {settings.execution_mode})")
+        sys.exit(1)
+
+    tracing.setup_tracing("media-generation-async-worker")
+    if settings.worker_metrics_port:
+        metrics.start_metrics_server(settings.worker_metrics_port)
+
+    worker = AsyncWorker(
+        queues=[name.strip() for name in options.queues.split(",") if name.strip()],
+        concurrency=options.concurrency,
+        drain_timeout=settings.async_worker_drain_timeout,
+    )
+    try:
+        asyncio.run(worker.run())
+    finally:
+        tracing.shutdown_tracing()
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,9 @@ celery_app.conf.update(
     worker_max_tasks_per_child=1000,
     task_routes={
         "app.tasks.celery_tasks.process_media_generation": {"queue": "media_generation"},
+        "app.tasks.celery_tasks.submit_media_generation": {"queue": "media_generation"},
+        "app.tasks.celery_tasks.reconcile_prediction": {"queue": "media_generation"},
+        "app.tasks.celery_tasks.finalize_prediction": {"queue": "media_generation"},
     },
     task_default_queue="default",
     task_default_exchange="default",
@@ -33,21 +36,63 @@ celery_app.conf.update(
     task_default_routing_key="default",
 )
 
+# Periodic tasks (run with `celery -A worker.celery_app beat`)
+celery_app.conf.beat_schedule = {
+    "sweep-stale-predictions": {
+        "task": "app.tasks.celery_tasks.sweep_stale_predictions",
+        "schedule": settings.webhook_sweep_interval,
+    },
+    # Fair scheduler safety net: dispatch normally runs whenever jobs are
+    # enqueued or finish, this catches slots freed by expired in-flight entries
+    "dispatch-jobs": {
+        "task": "app.tasks.celery_tasks.dispatch_jobs",
+        "schedule": settings.scheduler_dispatch_interval,
+    },
+}
+# Outbox safety net: the relay process publishes new jobs as they commit, this
+# publishes any it missed (or all of them where no relay process runs)
+if settings.outbox_sweep_interval > 0:
+    celery_app.conf.beat_schedule["relay-outbox"] = {
+        "task": "app.tasks.celery_tasks.relay_outbox",
+        "schedule": settings.outbox_sweep_interval,
+    }
+# Stuck-job reaper: retries processing jobs whose worker stopped heartbeating
+if settings.job_stale_after > 0 and settings.reaper_interval > 0:
+    celery_app.conf.beat_schedule["reap-stuck-jobs"] = {
+        "task": "app.tasks.celery_tasks.reap_stuck_jobs",
+        "schedule": settings.reaper_interval,
+    }
+if settings.maintenance_interval > 0:
+    celery_app.conf.beat_schedule["maintenance"] = {
+        "task": "app.tasks.celery_tasks.run_maintenance",
+        "schedule": settings.maintenance_interval,
+    }
+
 # Configure retry settings
+# Note: "*" is applied after the per-task entries and overrides them, so options
+# are set per task. Replicate throttling is not done here: Celery rate limits are
+# per worker, so entry tasks reserve slots in the shared Redis token bucket
+# (app/services/rate_limit.py) instead.
 celery_app.conf.task_annotations = {
     "*": {
-        "rate_limit": "10/s",
         "time_limit": 30 * 60,
         "soft_time_limit": 25 * 60,
     },
     "app.tasks.celery_tasks.process_media_generation": {
-        "rate_limit": "5/s",
         "max_retries": settings.max_retries,
         "default_retry_delay": 60,
         "retry_backoff": True,
         "retry_backoff_max": 600,
         "retry_jitter": True,
-    }
+    },
+    "app.tasks.celery_tasks.submit_media_generation": {
+        "max_retries": settings.max_retries,
+    },
+    # Full scans of large tables and buckets; the run's lock expires with this limit
+    "app.tasks.celery_tasks.run_maintenance": {
+        "time_limit": 2 * 60 * 60,
+        "soft_time_limit": 2 * 60 * 60 - 300,
+    },
 }
 
 if __name__ == "__main__":
@@ -0,0 +1,35 @@
+"""Outbox relay: publishes newly committed jobs to the scheduler or Celery.
+
+    python -m worker.relay
+
+Several relays may run at once; they split the outbox between them. See
+app/services/outbox.py.
+"""
+import logging
+import signal
+import threading
+from app.core import tracing
+from app.services import outbox
+from app.tasks.celery_tasks import publish_outbox_entries
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    tracing.setup_tracing("media-generation-relay")
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    logger.info("Outbox relay started")
+    try:
+        outbox.run_relay(publish_outbox_entries, stop)
+    finally:
+        tracing.shutdown_tracing()
+        logger.info("Outbox relay stopped")
+
+
+if __name__ == "__main__":
+    main()